@@ -0,0 +1,61 @@
+"""
+Environnement Alembic : URL lue dans DATABASE_URL (settings), métadonnées des
+modèles pour l'autogénération.
+
+``api.core.migrations.upgrade_database`` passe sa propre connexion dans
+``config.attributes["connection"]`` ; la ligne de commande (``alembic upgrade
+head``) ouvre la sienne.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from api.core.config import settings
+import api.models  # noqa: F401  (enregistre toutes les tables)
+from api.models.base import Base
+
+config = context.config
+
+# Journalisation d'alembic.ini seulement en ligne de commande
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or settings.database_url
+
+
+def run_migrations_offline() -> None:
+    """Génère le SQL sans connexion (``alembic upgrade head --sql``)"""
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
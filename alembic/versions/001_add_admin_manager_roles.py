@@ -0,0 +1,26 @@
+"""Add admin and manager user roles (placeholder for the lost revision)
+
+Revision ID: add_roles_001_add_admin_manager_roles
+Revises:
+Create Date: 2025-08-28 12:00:00.000000
+
+Le script d'origine n'a pas été conservé, mais 002 en dépend et des bases sont
+enregistrées à cette révision. Sans effet : les rôles ADMIN / MANAGER font
+partie du schéma créé par ``create_all`` (voir api/core/migrations.py), seul
+chemin de création d'une base vide.
+"""
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_roles_001_add_admin_manager_roles'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
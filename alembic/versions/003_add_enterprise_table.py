@@ -1,7 +1,7 @@
 """Add enterprise table
 
 Revision ID: 003_add_enterprise_table
-Revises: 
+Revises: 002_rename_title_to_name
 Create Date: 2025-09-02 10:00:00.000000
 
 """
@@ -11,7 +11,7 @@ from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision = '003_add_enterprise_table'
-down_revision = None
+down_revision = '002_rename_title_to_name'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,36 @@
+"""Add updated_at to cleaning_logs for conditional GET validators
+
+Revision ID: 004_cleaning_logs_updated_at
+Revises: 003_add_enterprise_table
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_cleaning_logs_updated_at'
+down_revision = '003_add_enterprise_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'cleaning_logs',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True)
+    )
+    # Les logs existants héritent de leur date de création
+    op.execute("UPDATE cleaning_logs SET updated_at = created_at")
+    op.create_index(
+        'ix_cleaning_logs_session_id_updated_at',
+        'cleaning_logs',
+        ['session_id', 'updated_at'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cleaning_logs_session_id_updated_at', table_name='cleaning_logs')
+    op.drop_column('cleaning_logs', 'updated_at')
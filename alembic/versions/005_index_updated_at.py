@@ -0,0 +1,37 @@
+"""Index updated_at columns for delta sync
+
+Revision ID: 005_index_updated_at
+Revises: 004_cleaning_logs_updated_at
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '005_index_updated_at'
+down_revision = '004_cleaning_logs_updated_at'
+branch_labels = None
+depends_on = None
+
+# Tables héritant de TimestampedModel
+TABLES = (
+    'users',
+    'enterprises',
+    'rooms',
+    'task_templates',
+    'assigned_tasks',
+    'performers',
+    'cleaning_sessions',
+    'cleaning_logs',
+)
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
@@ -0,0 +1,53 @@
+"""Add per-session log status counters
+
+Revision ID: 006_session_status_counters
+Revises: 005_index_updated_at
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_session_status_counters'
+down_revision = '005_index_updated_at'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ('fait_count', 'partiel_count', 'reporte_count', 'impossible_count', 'total_count')
+
+
+def upgrade() -> None:
+    for column in COUNTERS:
+        op.add_column(
+            'cleaning_sessions',
+            sa.Column(column, sa.Integer(), server_default='0', nullable=False)
+        )
+
+    # Initialisation depuis les logs existants
+    op.execute("""
+        UPDATE cleaning_sessions AS s SET
+            fait_count = c.fait,
+            partiel_count = c.partiel,
+            reporte_count = c.reporte,
+            impossible_count = c.impossible,
+            total_count = c.total
+        FROM (
+            SELECT
+                session_id,
+                count(*) FILTER (WHERE status = 'FAIT') AS fait,
+                count(*) FILTER (WHERE status = 'PARTIEL') AS partiel,
+                count(*) FILTER (WHERE status = 'REPORTE') AS reporte,
+                count(*) FILTER (WHERE status = 'IMPOSSIBLE') AS impossible,
+                count(*) AS total
+            FROM cleaning_logs
+            GROUP BY session_id
+        ) AS c
+        WHERE c.session_id = s.id
+    """)
+
+
+def downgrade() -> None:
+    for column in reversed(COUNTERS):
+        op.drop_column('cleaning_sessions', column)
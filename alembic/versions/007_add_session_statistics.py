@@ -0,0 +1,25 @@
+"""Persist statistics of completed sessions
+
+Revision ID: 007_session_statistics
+Revises: 006_session_status_counters
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_session_statistics'
+down_revision = '006_session_status_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Rempli au premier accès aux statistiques d'une session complétée
+    op.add_column('cleaning_sessions', sa.Column('statistics', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('cleaning_sessions', 'statistics')
@@ -0,0 +1,97 @@
+"""Partition cleaning_logs by month on a denormalized session_date
+
+Revision ID: 008_partition_cleaning_logs
+Revises: 007_session_statistics
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_partition_cleaning_logs'
+down_revision = '007_session_statistics'
+branch_labels = None
+depends_on = None
+
+# Partitions créées à l'avance (la tâche de fond des workers prend ensuite le relais, y compris
+# pour les mois rangés entre-temps dans la partition DEFAULT)
+MONTHS_AHEAD = 3
+
+FOREIGN_KEYS = (
+    ('session_id', 'cleaning_sessions'),
+    ('assigned_task_id', 'assigned_tasks'),
+    ('performed_by_id', 'performers'),
+    ('recorded_by_id', 'users'),
+)
+INDEXES = (
+    ('ix_cleaning_logs_session_id', ['session_id']),
+    ('ix_cleaning_logs_performed_by_id', ['performed_by_id']),
+    ('ix_cleaning_logs_updated_at', ['updated_at']),
+    ('ix_cleaning_logs_session_id_updated_at', ['session_id', 'updated_at']),
+    ('ix_cleaning_logs_session_date', ['session_date']),
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _replace_table(partitioned: bool) -> None:
+    """
+    Recrée cleaning_logs (partitionnée ou non) : copie des lignes dans une
+    nouvelle table de même structure, puis contraintes et index sous leurs noms.
+    """
+    partition_clause = ' PARTITION BY RANGE (session_date)' if partitioned else ''
+    op.execute(f'CREATE TABLE cleaning_logs_new (LIKE cleaning_logs INCLUDING DEFAULTS){partition_clause}')
+
+    if partitioned:
+        bind = op.get_bind()
+        first_day = bind.execute(sa.text('SELECT min(session_date) FROM cleaning_logs')).scalar()
+        month = (first_day or date.today()).replace(day=1)
+        last_month = _add_months(date.today().replace(day=1), MONTHS_AHEAD)
+        while month <= last_month:
+            op.execute(
+                f"CREATE TABLE cleaning_logs_y{month.year}m{month.month:02d} PARTITION OF cleaning_logs_new "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+            month = _add_months(month, 1)
+        # Logs hors des mois créés (session ancienne ou lointaine) : rangés ici
+        # plutôt que refusés, jusqu'à ce que la tâche de fond crée leur partition
+        op.execute('CREATE TABLE cleaning_logs_default PARTITION OF cleaning_logs_new DEFAULT')
+
+    op.execute('INSERT INTO cleaning_logs_new SELECT * FROM cleaning_logs')
+    op.execute('DROP TABLE cleaning_logs')
+    op.rename_table('cleaning_logs_new', 'cleaning_logs')
+
+    primary_key = ['id', 'session_date'] if partitioned else ['id']
+    op.create_primary_key('cleaning_logs_pkey', 'cleaning_logs', primary_key)
+    for column, referred_table in FOREIGN_KEYS:
+        op.create_foreign_key(
+            f'cleaning_logs_{column}_fkey', 'cleaning_logs', referred_table, [column], ['id']
+        )
+    for name, columns in INDEXES:
+        if partitioned or name != 'ix_cleaning_logs_session_date':
+            op.create_index(name, 'cleaning_logs', columns, unique=False)
+
+
+def upgrade() -> None:
+    op.add_column('cleaning_logs', sa.Column('session_date', sa.Date(), nullable=True))
+    op.execute("""
+        UPDATE cleaning_logs AS l SET session_date = s.date
+        FROM cleaning_sessions AS s WHERE s.id = l.session_id
+    """)
+    # Logs sans session : rangés dans le mois de leur création
+    op.execute("UPDATE cleaning_logs SET session_date = created_at::date WHERE session_date IS NULL")
+    op.alter_column('cleaning_logs', 'session_date', nullable=False)
+
+    _replace_table(partitioned=True)
+
+
+def downgrade() -> None:
+    _replace_table(partitioned=False)
+    op.drop_column('cleaning_logs', 'session_date')
@@ -0,0 +1,303 @@
+"""
+Contrôle d'admission et délestage par priorité de route.
+
+Chaque worker traite au plus ``admission_max_concurrency`` requêtes à la fois.
+Au-delà, les requêtes attendent dans une file ordonnée par priorité :
+
+- ``CRITICAL`` : écritures du personnel de terrain (logs, sessions, photos, sync) ;
+- ``NORMAL`` : lectures et écritures d'administration ;
+- ``LOW`` : exports et tableaux de bord (analytique).
+
+Chaque classe a un délai d'attente cible (``admission_max_wait_*``). Une
+requête dont la classe est déjà en retard sur sa cible (délai d'attente
+estimé supérieur) est refusée immédiatement, sinon elle attend au plus sa
+cible : au-delà, 503 avec ``Retry-After``. Les requêtes ``LOW`` n'occupent
+en outre jamais plus de ``admission_low_priority_share`` des places, pour
+qu'une rafale d'exports ne bloque pas le terrain.
+
+Les sondes, le scrape et les flux longue durée (SSE de progression des
+sessions) ne sont jamais mis en file : une connexion ouverte pendant des
+heures occuperait une place pour rien.
+
+Les décisions (admise, mise en file, délestée, expirée), le délai d'attente
+et les requêtes en cours par classe sont exposés sur ``/metrics``.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import re
+import time
+from enum import IntEnum
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.core.config import settings
+from api.core.metrics import registry
+
+# Routes jamais mises en file (sondes, scrape)
+ADMISSION_EXEMPT_PATHS: FrozenSet[str] = frozenset(["/health", "/metrics"])
+
+# Flux longue durée, exemptés aussi : ils garderaient leur place tant que le client reste connecté
+ADMISSION_EXEMPT_PATTERNS: Tuple["re.Pattern[str]", ...] = tuple(
+    re.compile(pattern) for pattern in (
+        r"^/sessions/[^/]+/events$",
+    )
+)
+
+WRITE_METHODS = frozenset(["POST", "PUT", "PATCH", "DELETE"])
+
+
+class Priority(IntEnum):
+    """Classe de priorité d'une route (plus petit = servi en premier)"""
+    CRITICAL = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# (méthodes, chemin, priorité), première correspondance ; les autres routes : NORMAL
+ROUTE_PRIORITIES: Tuple[Tuple[FrozenSet[str], "re.Pattern[str]", Priority], ...] = tuple(
+    (methods, re.compile(pattern), priority) for methods, pattern, priority in (
+        (WRITE_METHODS, r"^/(logs|sessions|uploads|sync)(/|$)", Priority.CRITICAL),
+        (frozenset(["GET", "POST"]), r"^/(exports|dashboard)(/|$)", Priority.LOW),
+    )
+)
+
+
+def is_exempt(path: str) -> bool:
+    return path in ADMISSION_EXEMPT_PATHS or any(pattern.match(path) for pattern in ADMISSION_EXEMPT_PATTERNS)
+
+
+def route_priority(method: str, path: str) -> Priority:
+    for methods, pattern, priority in ROUTE_PRIORITIES:
+        if method in methods and pattern.match(path):
+            return priority
+    return Priority.NORMAL
+
+
+# ===== MÉTRIQUES =====
+
+admission_decisions = registry.counter(
+    "admission_decisions_total",
+    "Décisions du contrôle d'admission par priorité (admitted/queued/shed/timeout)",
+    ("priority", "decision")
+)
+admission_queue_delay = registry.histogram(
+    "admission_queue_delay_seconds",
+    "Attente dans la file d'admission des requêtes admises",
+    ("priority",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+admission_in_flight = registry.gauge(
+    "admission_in_flight",
+    "Requêtes admises en cours de traitement par priorité",
+    ("priority",)
+)
+admission_queued = registry.gauge(
+    "admission_queued",
+    "Requêtes en attente d'admission par priorité",
+    ("priority",)
+)
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée par le contrôle d'admission"""
+
+    def __init__(self, priority: Priority, reason: str, retry_after: int):
+        super().__init__(f"{priority.name.lower()}: {reason}")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Places de traitement d'un worker et file d'attente par priorité.
+    Utilisé depuis la boucle asyncio du worker uniquement (pas de verrou).
+    """
+
+    # Poids des nouvelles mesures dans la moyenne du délai d'attente
+    SMOOTHING = 0.2
+    # Constante de temps de l'oubli de cette moyenne (secondes sans mesure)
+    DECAY_SECONDS = 1.0
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_wait: Dict[Priority, float],
+        low_priority_share: float = 0.5,
+        retry_after: int = 2
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.low_priority_limit = max(1, int(max_concurrency * low_priority_share))
+        self.retry_after = retry_after
+        self.in_flight: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        # Moyenne glissante du délai d'attente et instant de la dernière mesure
+        self._queue_delay: Dict[Priority, Tuple[float, float]] = {priority: (0.0, 0.0) for priority in Priority}
+        # (priorité, ordre d'arrivée, arrivée, future) ; les futures annulées sont ignorées
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def active(self) -> int:
+        return sum(self.in_flight.values())
+
+    def queued(self) -> Dict[Priority, int]:
+        counts = {priority: 0 for priority in Priority}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                counts[Priority(priority)] += 1
+        return counts
+
+    def queue_delay(self, priority: Priority) -> float:
+        """Moyenne glissante du délai d'attente, qui s'efface faute de nouvelles mesures"""
+        delay, measured_at = self._queue_delay[priority]
+        return delay * math.exp(-(time.perf_counter() - measured_at) / self.DECAY_SECONDS)
+
+    def _measure_delay(self, priority: Priority, delay: float):
+        current = self.queue_delay(priority)
+        self._queue_delay[priority] = (current + self.SMOOTHING * (delay - current), time.perf_counter())
+
+    def estimated_delay(self, priority: Priority) -> float:
+        """Délai d'attente prévisible : moyenne récente, ou attente du plus ancien en file"""
+        now = time.perf_counter()
+        oldest = max(
+            (now - enqueued_at for waiter_priority, _, enqueued_at, future in self._waiters
+             if waiter_priority <= priority and not future.done()),
+            default=0.0
+        )
+        return max(self.queue_delay(priority), oldest)
+
+    def _can_start(self, priority: Priority) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        return priority != Priority.LOW or self.in_flight[Priority.LOW] < self.low_priority_limit
+
+    def _has_waiters_before(self, priority: Priority) -> bool:
+        return any(
+            waiter_priority <= priority and not future.done()
+            for waiter_priority, _, _, future in self._waiters
+        )
+
+    def _admitted(self, priority: Priority, delay: float):
+        self._measure_delay(priority, delay)
+        admission_queue_delay.observe(delay, priority=priority.name.lower())
+
+    def _reject(self, priority: Priority, reason: str) -> AdmissionRejected:
+        admission_decisions.inc(priority=priority.name.lower(), decision=reason)
+        delay = self.estimated_delay(priority)
+        return AdmissionRejected(priority, reason, max(self.retry_after, math.ceil(delay)))
+
+    async def acquire(self, priority: Priority):
+        """Attend une place de traitement ; lève AdmissionRejected si la cible d'attente est dépassée"""
+        label = priority.name.lower()
+        if self._can_start(priority) and not self._has_waiters_before(priority):
+            admission_decisions.inc(priority=label, decision="admitted")
+            self.in_flight[priority] += 1
+            self._admitted(priority, 0.0)
+            return
+
+        max_wait = self.max_wait[priority]
+        if self.estimated_delay(priority) > max_wait:
+            raise self._reject(priority, "shed")
+
+        admission_decisions.inc(priority=label, decision="queued")
+        enqueued_at = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), enqueued_at, future))
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            if not (future.done() and not future.cancelled()):
+                # Attente trop longue : compte dans le délai estimé des suivants
+                self._measure_delay(priority, max_wait)
+                raise self._reject(priority, "timeout")
+            # Place attribuée au moment même de l'expiration : la garder
+        except asyncio.CancelledError:
+            # Place attribuée juste avant l'annulation (déconnexion client) : la rendre
+            if future.done() and not future.cancelled():
+                self.release(priority)
+            raise
+        # La place a été réservée par _wake_waiters() au moment du réveil
+        self._admitted(priority, time.perf_counter() - enqueued_at)
+
+    def release(self, priority: Priority):
+        """Libère une place et la donne aux requêtes en attente les plus prioritaires"""
+        self.in_flight[priority] -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        skipped = []
+        while self._waiters and self.active < self.max_concurrency:
+            waiter = heapq.heappop(self._waiters)
+            waiter_priority, _, _, future = waiter
+            if future.done():
+                continue
+            if not self._can_start(Priority(waiter_priority)):
+                # Quota LOW atteint : laisser passer les requêtes suivantes
+                skipped.append(waiter)
+                continue
+            # Place réservée dès maintenant pour la requête réveillée
+            self.in_flight[Priority(waiter_priority)] += 1
+            future.set_result(None)
+        for waiter in skipped:
+            heapq.heappush(self._waiters, waiter)
+
+
+def _build_controller() -> AdmissionController:
+    return AdmissionController(
+        max_concurrency=settings.admission_max_concurrency,
+        max_wait={
+            Priority.CRITICAL: settings.admission_max_wait_critical,
+            Priority.NORMAL: settings.admission_max_wait_normal,
+            Priority.LOW: settings.admission_max_wait_low,
+        },
+        low_priority_share=settings.admission_low_priority_share,
+        retry_after=settings.admission_retry_after
+    )
+
+
+# Instance globale (un contrôleur par worker)
+admission_controller = _build_controller()
+
+admission_in_flight.set_function(lambda: {
+    (priority.name.lower(),): count for priority, count in admission_controller.in_flight.items()
+})
+admission_queued.set_function(lambda: {
+    (priority.name.lower(),): count for priority, count in admission_controller.queued().items()
+})
+
+
+class AdmissionControlMiddleware:
+    """Met en file ou refuse (503 + Retry-After) les requêtes selon la priorité de leur route"""
+
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or is_exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        priority = route_priority(scope["method"], scope["path"])
+        try:
+            await self.controller.acquire(priority)
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Serveur surchargé, réessayez plus tard", "priority": e.priority.name.lower()},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(priority)
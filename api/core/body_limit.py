@@ -0,0 +1,110 @@
+"""
+Taille maximale des bodies de requête, appliquée en ASGI avant tout parsing.
+
+Chaque route a une limite (``BODY_LIMIT_ROUTES``, sinon
+``settings.max_request_body_size``). Un ``Content-Length`` supérieur est
+refusé (413) sans lire le body ; un body transmis en chunks est compté au fil
+de la lecture et la requête est interrompue dès que la limite est dépassée.
+"""
+
+import re
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+
+# Marge d'un body multipart (boundaries, champs de formulaire) au-delà des fichiers
+MULTIPART_OVERHEAD = 64 * 1024
+# Fichiers acceptés par POST /uploads/photos
+MAX_PHOTOS_PER_UPLOAD = 10
+
+# (méthode, chemin, limite en octets) ; les autres routes : max_request_body_size
+BODY_LIMIT_ROUTES: Tuple[Tuple[str, "re.Pattern[str]", Callable[[], int]], ...] = tuple(
+    (method, re.compile(pattern), limit) for method, pattern, limit in (
+        ("POST", r"^/sessions/[^/]+/finalize$", lambda: settings.finalize_max_body_size),
+        ("POST", r"^/uploads/photo$", lambda: settings.max_file_size + MULTIPART_OVERHEAD),
+        ("POST", r"^/uploads/photos$", lambda: MAX_PHOTOS_PER_UPLOAD * settings.max_file_size + MULTIPART_OVERHEAD),
+        ("POST", r"^/logs/[^/]+/photos$", lambda: settings.max_file_size + MULTIPART_OVERHEAD),
+    )
+)
+
+
+def body_limit(method: str, path: str) -> int:
+    for route_method, pattern, limit in BODY_LIMIT_ROUTES:
+        if method == route_method and pattern.match(path):
+            return limit()
+    return settings.max_request_body_size
+
+
+class RequestBodyTooLarge(HTTPException):
+    """Levée pendant la lecture d'un body qui dépasse la limite de sa route"""
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Body de requête trop volumineux (maximum {limit} octets)"
+        )
+
+
+class BodyLimitMiddleware:
+    """Refuse (413) les bodies qui dépassent la limite de leur route"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS", "DELETE"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = body_limit(scope["method"], scope["path"])
+        content_length = self._content_length(scope)
+        if content_length is not None and content_length > limit:
+            await self._too_large(limit)(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestBodyTooLarge(limit)
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except RequestBodyTooLarge:
+            # Levée hors d'une route (middleware lisant le body) : réponse ici
+            if response_started:
+                raise
+            await self._too_large(limit)(scope, receive, send)
+
+    @staticmethod
+    def _content_length(scope: Scope) -> Optional[int]:
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    def _too_large(limit: int) -> JSONResponse:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"Body de requête trop volumineux (maximum {limit} octets)"}
+        )
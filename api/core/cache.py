@@ -1,92 +1,566 @@
 """
 Système de cache avec Redis pour améliorer les performances
+
+Les données de référence (pièces, tâches, exécutants...) sont servies en
+cache-aside sous des clés versionnées par namespace : invalider un namespace
+revient à incrémenter sa version (un seul INCR), les anciennes clés expirent
+d'elles-mêmes via leur TTL. L'invalidation est déclenchée automatiquement au
+commit des sessions SQLAlchemy qui ont modifié les tables concernées : sur la
+boucle d'événements, l'INCR + PUBLISH part dans une tâche (client
+``redis.asyncio``) et le namespace est servi sans cache par ce worker tant
+qu'elle n'a pas abouti ; hors boucle (handler synchrone, script), le client
+synchrone est utilisé directement.
+
+Le cache est à deux niveaux : un LRU en mémoire par worker (TTL court) devant
+Redis. Chaque invalidation est diffusée sur un canal pub/sub Redis pour que
+tous les workers oublient leurs entrées locales du namespace. Le niveau local
+n'est utilisé que lorsque l'abonnement pub/sub est actif.
 """
 
+import asyncio
 import json
+import time
 import redis
-from typing import Optional, Any
+import redis.asyncio as aioredis
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
 from datetime import timedelta
 from functools import wraps
 import logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from api.core.config import settings
+from api.core.metrics import cache_requests
 
 logger = logging.getLogger(__name__)
 
+class CacheNamespace:
+    """Namespaces de cache des données de référence"""
+    ROOMS = "rooms"
+    TASK_TEMPLATES = "task_templates"
+    ASSIGNED_TASKS = "assigned_tasks"
+    PERFORMERS = "performers"
+    ENTERPRISE = "enterprise"
+    SESSIONS = "sessions"
+
+# Table modifiée -> namespaces à invalider (les tâches assignées embarquent
+# pièce, modèle de tâche et exécutant dans leur réponse)
+TABLE_NAMESPACES: Dict[str, Tuple[str, ...]] = {
+    "rooms": (CacheNamespace.ROOMS, CacheNamespace.ASSIGNED_TASKS),
+    "task_templates": (CacheNamespace.TASK_TEMPLATES, CacheNamespace.ASSIGNED_TASKS),
+    "assigned_tasks": (CacheNamespace.ASSIGNED_TASKS,),
+    "performers": (CacheNamespace.PERFORMERS, CacheNamespace.ASSIGNED_TASKS),
+    "enterprises": (CacheNamespace.ENTERPRISE,),
+    "cleaning_sessions": (CacheNamespace.SESSIONS,),
+    "cleaning_logs": (CacheNamespace.SESSIONS,),
+}
+
+# Délai avant de retenter une connexion Redis en échec
+RECONNECT_DELAY = 30
+UNLINK_BATCH_SIZE = 500
+INVALIDATION_CHANNEL = "cache:invalidations"
+
+_MISSING = object()
+
+class LocalLRUCache:
+    """Cache LRU borné en mémoire, avec TTL par entrée (un par worker)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        """Retourne la valeur ou ``_MISSING`` si absente/expirée"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str):
+        self._data.pop(key, None)
+
+    def clear_namespace(self, namespace: str):
+        prefix = f"{namespace}:"
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
 class RedisCache:
-    """Gestionnaire de cache Redis"""
-    
+    """Gestionnaire de cache Redis à deux niveaux (LRU local + Redis)"""
+
     def __init__(self):
-        self.redis_url = getattr(settings, 'redis_url', 'redis://localhost:6379/0')
+        self.redis_url = getattr(settings, 'redis_url', None)
         self._client = None
-    
+        self._async_client = None
+        self._retry_at = 0.0
+        self._async_retry_at = 0.0
+        self.local = LocalLRUCache(settings.cache_local_maxsize, settings.cache_local_ttl)
+        # Versions de namespace connues localement, tenues à jour par pub/sub
+        self._versions: Dict[str, int] = {}
+        self._listening = False
+        # Namespaces dont l'invalidation (tâche async) n'a pas encore abouti
+        self._pending: Dict[str, int] = {}
+        self._background: Set[asyncio.Task] = set()
+
     @property
     def client(self):
-        """Lazy loading du client Redis"""
-        if self._client is None:
+        """Lazy loading du client Redis (sans retenter à chaque appel si indisponible)"""
+        if self._client is None and self.redis_url and time.monotonic() >= self._retry_at:
             try:
-                self._client = redis.from_url(self.redis_url, decode_responses=True)
-                self._client.ping()
+                client = redis.from_url(self.redis_url, decode_responses=True)
+                client.ping()
+                self._client = client
                 logger.info("✅ Connexion Redis établie")
             except Exception as e:
                 logger.warning(f"⚠️ Redis non disponible: {e}")
-                self._client = None
+                self._retry_at = time.monotonic() + RECONNECT_DELAY
         return self._client
-    
+
+    @property
+    def async_client(self):
+        """Client ``redis.asyncio`` pour les lectures/écritures dans les handlers async"""
+        if self._async_client is None and self.redis_url and time.monotonic() >= self._async_retry_at:
+            self._async_client = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._async_client
+
+    def mark_async_unavailable(self, e: Exception):
+        """
+        Écarte le client async après une erreur Redis (ici ou chez un appelant
+        qui l'utilise directement) : ``async_client`` vaut None jusqu'au
+        prochain essai de reconnexion.
+        """
+        logger.warning(f"⚠️ Redis (async) non disponible: {e}")
+        self._async_retry_at = time.monotonic() + RECONNECT_DELAY
+        self._async_client = None
+
+    @property
+    def local_enabled(self) -> bool:
+        """Le niveau local n'est sûr que si les invalidations nous parviennent"""
+        return self._listening
+
     def get(self, key: str) -> Optional[Any]:
         """Récupère une valeur du cache"""
+        if self.local_enabled:
+            value = self.local.get(key)
+            if value is not _MISSING:
+                cache_requests.inc(result="hit")
+                return value
+
         if not self.client:
             return None
-        
+
         try:
             value = self.client.get(key)
             if value:
-                return json.loads(value)
+                cache_requests.inc(result="hit")
+                decoded = json.loads(value)
+                if self.local_enabled:
+                    self.local.set(key, decoded)
+                return decoded
         except Exception as e:
             logger.error(f"Erreur lecture cache: {e}")
+        cache_requests.inc(result="miss")
         return None
-    
+
     def set(self, key: str, value: Any, expire: int = 300):
         """Stocke une valeur dans le cache"""
+        if self.local_enabled:
+            self.local.set(key, value, expire)
+
         if not self.client:
             return
-        
+
         try:
             self.client.set(
-                key, 
-                json.dumps(value, default=str), 
+                key,
+                json.dumps(value, default=str),
                 ex=expire
             )
         except Exception as e:
             logger.error(f"Erreur écriture cache: {e}")
-    
+
     def delete(self, key: str):
         """Supprime une clé du cache"""
+        self.local.pop(key)
         if not self.client:
             return
-        
+
         try:
             self.client.delete(key)
         except Exception as e:
             logger.error(f"Erreur suppression cache: {e}")
-    
+
     def clear_pattern(self, pattern: str):
-        """Supprime toutes les clés correspondant au pattern"""
+        """Supprime toutes les clés correspondant au pattern (UNLINK par lots pipelinés)"""
+        self.local.clear()
         if not self.client:
             return
-        
+
         try:
-            for key in self.client.scan_iter(match=pattern):
-                self.client.delete(key)
+            batch = []
+            for key in self.client.scan_iter(match=pattern, count=UNLINK_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= UNLINK_BATCH_SIZE:
+                    self._unlink(batch)
+                    batch = []
+            if batch:
+                self._unlink(batch)
         except Exception as e:
             logger.error(f"Erreur suppression pattern cache: {e}")
 
+    def _unlink(self, keys: Iterable[str]):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.unlink(key)
+        pipe.execute()
+
+    # ===== NAMESPACES VERSIONNÉS =====
+
+    @staticmethod
+    def _version_key(namespace: str) -> str:
+        return f"ns:{namespace}:version"
+
+    def namespace_version(self, namespace: str) -> int:
+        """Version courante d'un namespace (0 si jamais invalidé)"""
+        if self.local_enabled and namespace in self._versions:
+            return self._versions[namespace]
+        if not self.client:
+            return 0
+
+        try:
+            version = int(self.client.get(self._version_key(namespace)) or 0)
+        except Exception as e:
+            logger.error(f"Erreur lecture version cache: {e}")
+            return 0
+        if self.local_enabled:
+            return self._remember_version(namespace, version)
+        return version
+
+    @staticmethod
+    def _build_key(namespace: str, version: int, parts: Tuple[Any, ...]) -> str:
+        key = f"{namespace}:v{version}"
+        if parts:
+            key += ":" + ":".join(str(part) for part in parts)
+        return key
+
+    def namespaced_key(self, namespace: str, *parts: Any) -> str:
+        """Clé versionnée : ``<namespace>:v<version>:<parts...>``"""
+        return self._build_key(namespace, self.namespace_version(namespace), parts)
+
+    def invalidate(self, *namespaces: str):
+        """Invalide des namespaces en incrémentant leur version (sans scan ni suppression)"""
+        if not namespaces:
+            return
+        for namespace in namespaces:
+            self._forget_namespace(namespace)
+        if not self.client:
+            return
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for namespace in namespaces:
+                pipe.incr(self._version_key(namespace))
+            versions = pipe.execute()
+            self._broadcast(self.client, namespaces, versions)
+            logger.debug(f"Cache invalidé: {', '.join(namespaces)}")
+        except Exception as e:
+            logger.error(f"Erreur invalidation cache: {e}")
+
+    def invalidate_soon(self, *namespaces: str):
+        """
+        Invalidation depuis un hook synchrone (``after_commit``). Sur la boucle
+        d'événements : entrées locales oubliées tout de suite, INCR + PUBLISH
+        envoyés par le client async dans une tâche, sans bloquer la boucle.
+        Hors boucle (threadpool, script) : ``invalidate`` synchrone.
+        """
+        if not namespaces:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or not self.redis_url:
+            self.invalidate(*namespaces)
+            return
+
+        for namespace in namespaces:
+            self._forget_namespace(namespace)
+            self._pending[namespace] = self._pending.get(namespace, 0) + 1
+        task = loop.create_task(self._ainvalidate_pending(namespaces))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _ainvalidate_pending(self, namespaces: Tuple[str, ...]):
+        try:
+            await self.ainvalidate(*namespaces)
+        finally:
+            for namespace in namespaces:
+                remaining = self._pending.get(namespace, 0) - 1
+                if remaining > 0:
+                    self._pending[namespace] = remaining
+                else:
+                    self._pending.pop(namespace, None)
+
+    def invalidation_pending(self, namespace: str) -> bool:
+        """Vrai tant que l'invalidation d'un commit de ce worker n'a pas atteint Redis"""
+        return namespace in self._pending
+
+    async def drain(self):
+        """Attend les invalidations en cours (arrêt du worker, tests)"""
+        while self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def get_or_set(
+        self,
+        namespace: str,
+        parts: Tuple[Any, ...],
+        loader: Callable[[], Any],
+        expire: Optional[int] = None
+    ) -> Any:
+        """
+        Cache-aside : retourne la valeur en cache ou la calcule via ``loader``
+        (qui doit retourner une valeur sérialisable en JSON) puis la stocke.
+        Pendant une invalidation en cours, ``loader`` est appelé sans cache.
+        """
+        if self.invalidation_pending(namespace):
+            return loader()
+        expire = expire or settings.cache_reference_ttl
+        key = self.namespaced_key(namespace, *parts)
+        cached_value = self.get(key)
+        if cached_value is not None:
+            return cached_value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value, expire)
+        return value
+
+    # ===== API ASYNCHRONE (redis.asyncio) =====
+
+    async def aget(self, key: str, local: bool = True) -> Optional[Any]:
+        """
+        Version async de ``get`` : ne bloque pas la boucle sur l'I/O Redis.
+        ``local=False`` lit directement Redis (valeurs partagées entre workers).
+        """
+        local = local and self.local_enabled
+        if local:
+            value = self.local.get(key)
+            if value is not _MISSING:
+                cache_requests.inc(result="hit")
+                return value
+
+        client = self.async_client
+        if not client:
+            return None
+
+        try:
+            value = await client.get(key)
+            if value:
+                cache_requests.inc(result="hit")
+                decoded = json.loads(value)
+                if local:
+                    self.local.set(key, decoded)
+                return decoded
+        except Exception as e:
+            self.mark_async_unavailable(e)
+        cache_requests.inc(result="miss")
+        return None
+
+    async def aset(self, key: str, value: Any, expire: int = 300, local: bool = True):
+        """Version async de ``set``"""
+        if local and self.local_enabled:
+            self.local.set(key, value, expire)
+
+        client = self.async_client
+        if not client:
+            return
+
+        try:
+            await client.set(key, json.dumps(value, default=str), ex=expire)
+        except Exception as e:
+            self.mark_async_unavailable(e)
+
+    async def anamespace_version(self, namespace: str) -> int:
+        """Version async de ``namespace_version``"""
+        if self.local_enabled and namespace in self._versions:
+            return self._versions[namespace]
+
+        client = self.async_client
+        if not client:
+            return 0
+
+        try:
+            version = int(await client.get(self._version_key(namespace)) or 0)
+        except Exception as e:
+            self.mark_async_unavailable(e)
+            return 0
+        if self.local_enabled:
+            return self._remember_version(namespace, version)
+        return version
+
+    async def ainvalidate(self, *namespaces: str):
+        """Version async de ``invalidate``"""
+        if not namespaces:
+            return
+        for namespace in namespaces:
+            self._forget_namespace(namespace)
+
+        client = self.async_client
+        if not client:
+            return
+
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for namespace in namespaces:
+                    pipe.incr(self._version_key(namespace))
+                versions = await pipe.execute()
+                for namespace, version in zip(namespaces, versions):
+                    pipe.publish(INVALIDATION_CHANNEL, f"{namespace}:{version}")
+                await pipe.execute()
+        except Exception as e:
+            self.mark_async_unavailable(e)
+            return
+        if self.local_enabled:
+            for namespace, version in zip(namespaces, versions):
+                self._remember_version(namespace, version)
+
+    async def aget_or_set(
+        self,
+        namespace: str,
+        parts: Tuple[Any, ...],
+        loader: Callable[[], Any],
+        expire: Optional[int] = None
+    ) -> Any:
+        """Version async de ``get_or_set`` (le loader reste synchrone)"""
+        if self.invalidation_pending(namespace):
+            return loader()
+        expire = expire or settings.cache_reference_ttl
+        key = self._build_key(namespace, await self.anamespace_version(namespace), parts)
+        cached_value = await self.aget(key)
+        if cached_value is not None:
+            return cached_value
+
+        value = loader()
+        if value is not None:
+            await self.aset(key, value, expire)
+        return value
+
+    # ===== INVALIDATION INTER-WORKERS (PUB/SUB) =====
+
+    def _remember_version(self, namespace: str, version: int) -> int:
+        """
+        Mémorise une version sans jamais revenir en arrière : une lecture Redis
+        ou un message pub/sub plus ancien qu'une invalidation déjà reçue
+        (concurrente de l'``await``, ou publiée dans le désordre) est ignoré.
+        """
+        current = self._versions.get(namespace)
+        if current is None or version > current:
+            self._versions[namespace] = version
+            return version
+        return current
+
+    def _forget_namespace(self, namespace: str):
+        self._versions.pop(namespace, None)
+        self.local.clear_namespace(namespace)
+
+    @staticmethod
+    def _broadcast(client, namespaces: Tuple[str, ...], versions):
+        pipe = client.pipeline(transaction=False)
+        for namespace, version in zip(namespaces, versions):
+            pipe.publish(INVALIDATION_CHANNEL, f"{namespace}:{version}")
+        pipe.execute()
+
+    def _apply_invalidation(self, message: str):
+        namespace, _, version = message.rpartition(":")
+        self.local.clear_namespace(namespace)
+        try:
+            self._remember_version(namespace, int(version))
+        except ValueError:
+            self._versions.pop(namespace, None)
+
+    async def listen_for_invalidations(self):
+        """
+        Boucle d'abonnement au canal d'invalidation (à lancer au démarrage).
+        Tant qu'elle est abonnée, le niveau local est actif.
+        """
+        while True:
+            client = self.async_client
+            if client is None:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self._listening = True
+                logger.info("✅ Abonné aux invalidations de cache")
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.mark_async_unavailable(e)
+            finally:
+                # Sans abonnement, le niveau local pourrait servir des données périmées
+                self._listening = False
+                self.local.clear()
+                self._versions.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(RECONNECT_DELAY)
+
 # Instance globale
 cache = RedisCache()
 
+# ===== INVALIDATION PILOTÉE PAR LES COMMITS =====
+
+def _collect_touched_namespaces(session: Session, flush_context):
+    touched: Set[str] = session.info.setdefault("cache_namespaces", set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        touched.update(TABLE_NAMESPACES.get(table, ()))
+
+def _invalidate_after_commit(session: Session):
+    touched = session.info.pop("cache_namespaces", None)
+    if touched:
+        cache.invalidate_soon(*sorted(touched))
+
+def _discard_after_rollback(session: Session):
+    session.info.pop("cache_namespaces", None)
+
+def setup_cache_invalidation(session_class=Session):
+    """Invalide les namespaces concernés après chaque commit modifiant leurs tables"""
+    if event.contains(session_class, "after_flush", _collect_touched_namespaces):
+        return
+    event.listen(session_class, "after_flush", _collect_touched_namespaces)
+    event.listen(session_class, "after_commit", _invalidate_after_commit)
+    event.listen(session_class, "after_rollback", _discard_after_rollback)
+
 def cached(expire: int = 300, key_prefix: str = ""):
     """
     Décorateur pour mettre en cache les résultats de fonction
-    
+
     Usage:
         @cached(expire=600, key_prefix="rooms")
         async def get_rooms():
@@ -101,19 +575,19 @@ def cached(expire: int = 300, key_prefix: str = ""):
                 cache_key += f":{':'.join(str(arg) for arg in args)}"
             if kwargs:
                 cache_key += f":{':'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))}"
-            
+
             # Vérifier le cache
             cached_value = cache.get(cache_key)
             if cached_value is not None:
                 logger.debug(f"Cache hit: {cache_key}")
                 return cached_value
-            
+
             # Exécuter la fonction
             result = await func(*args, **kwargs)
-            
+
             # Mettre en cache
             cache.set(cache_key, result, expire)
-            
+
             return result
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,286 @@
+"""
+Annulation du travail des requêtes abandonnées : client déconnecté ou délai
+de traitement dépassé.
+
+Sur les routes longues (``CANCELLABLE_ROUTES``), ``RequestCancellationMiddleware``
+associe à la requête un ``CancellationToken`` (ContextVar, propagé aux threads
+du threadpool) et surveille la déconnexion du client et le délai de la route.
+À l'annulation :
+
+- la requête SQL en cours sur la connexion est annulée côté serveur
+  (``cancel()`` de psycopg2, l'équivalent de ``pg_cancel_backend`` pour ce
+  backend ; ``interrupt()`` pour SQLite) et toute nouvelle requête est refusée ;
+- le code long (rendu PDF...) s'arrête à son prochain ``check_cancelled()`` ;
+- les attentes asynchrones passées par ``cancellable()`` sont interrompues.
+
+L'annulation est coopérative : le middleware attend que le handler se termine
+(les sessions et fichiers sont libérés normalement) et ignore ses réponses.
+Un délai dépassé répond 504 immédiatement ; un client parti ne reçoit rien.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+from api.core.metrics import registry, route_label
+
+logger = logging.getLogger(__name__)
+
+# (méthode, chemin, délai maximal en secondes) des routes surveillées
+CANCELLABLE_ROUTES: Tuple[Tuple[str, "re.Pattern[str]", Callable[[], float]], ...] = tuple(
+    (method, re.compile(pattern), timeout) for method, pattern, timeout in (
+        ("POST", r"^/exports/pdf/[^/]+/download$", lambda: settings.export_request_timeout),
+        ("GET", r"^/dashboard(/metrics)?$", lambda: settings.dashboard_request_timeout),
+    )
+)
+
+
+def request_timeout(method: str, path: str) -> Optional[float]:
+    """Délai de la route, ``None`` si elle n'est pas surveillée"""
+    for route_method, pattern, timeout in CANCELLABLE_ROUTES:
+        if method == route_method and pattern.match(path):
+            return timeout()
+    return None
+
+
+requests_cancelled = registry.counter(
+    "http_requests_cancelled_total",
+    "Requêtes dont le travail a été annulé (disconnect/timeout)",
+    ("route", "reason")
+)
+
+
+class RequestCancelled(Exception):
+    """Levée dans le travail d'une requête annulée"""
+
+    def __init__(self, reason: Optional[str] = None):
+        super().__init__(f"Requête annulée ({reason or 'cancelled'})")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Signal d'annulation partagé entre la boucle asyncio et les threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.cancelled = False
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Marque le token annulé et exécute les callbacks enregistrés (une seule fois)"""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Callback d'annulation en erreur: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Appelé à l'annulation (tout de suite si elle a déjà eu lieu)"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+    async def wait(self):
+        """Attend l'annulation (depuis la boucle asyncio)"""
+        loop = asyncio.get_running_loop()
+        cancelled = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: cancelled.done() or cancelled.set_result(None))
+
+        self.add_callback(wake)
+        try:
+            await cancelled
+        finally:
+            self.remove_callback(wake)
+
+
+# Token de la requête en cours (None hors des routes surveillées)
+current_token: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+def check_cancelled():
+    """Point d'arrêt du code long : lève RequestCancelled si la requête est annulée"""
+    token = current_token.get()
+    if token is not None:
+        token.check()
+
+
+async def cancellable(awaitable: Awaitable[Any]) -> Any:
+    """Attend ``awaitable``, ou lève RequestCancelled dès l'annulation de la requête"""
+    token = current_token.get()
+    if token is None:
+        return await awaitable
+
+    work = asyncio.ensure_future(awaitable)
+    cancelled = asyncio.ensure_future(token.wait())
+    try:
+        await asyncio.wait({work, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        cancelled.cancel()
+    if work.done():
+        return work.result()
+    work.cancel()
+    raise RequestCancelled(token.reason)
+
+
+# ===== ANNULATION DES REQUÊTES SQL =====
+
+_CALLBACK_KEY = "cancellation_callback"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    token = current_token.get()
+    if token is None:
+        return
+    token.check()
+    dbapi_connection = conn.connection.dbapi_connection
+    # psycopg2 : requête d'annulation au backend ; sqlite3 : interruption
+    cancel = getattr(dbapi_connection, "cancel", None) or getattr(dbapi_connection, "interrupt", None)
+    if cancel is not None:
+        conn.info[_CALLBACK_KEY] = (token, token.add_callback(cancel))
+
+
+def _unregister(conn):
+    registered = conn.info.pop(_CALLBACK_KEY, None)
+    if registered is not None:
+        token, callback = registered
+        token.remove_callback(callback)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _unregister(conn)
+
+
+def _handle_error(exception_context):
+    if exception_context.connection is not None:
+        _unregister(exception_context.connection)
+
+
+def install_query_cancellation(engine: Engine):
+    """Branche l'annulation des requêtes SQL sur un engine (idempotent)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ===== MIDDLEWARE =====
+
+class RequestCancellationMiddleware:
+    """Annule le travail des routes longues à la déconnexion du client ou au délai dépassé"""
+
+    def __init__(self, app: ASGIApp, engine: Optional[Engine] = None):
+        self.app = app
+        if engine is None:
+            from api.core.database import engine
+        install_query_cancellation(engine)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        timeout = request_timeout(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = CancellationToken()
+        # Seul lecteur de ``receive`` : le body est transmis à l'app, la déconnexion annule
+        messages: asyncio.Queue = asyncio.Queue()
+        response_started = response_complete = False
+
+        async def listen():
+            while True:
+                try:
+                    message = await receive()
+                except Exception as e:
+                    messages.put_nowait(e)
+                    return
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    # Les serveurs signalent aussi la déconnexion après une réponse complète
+                    if not response_complete:
+                        token.cancel("disconnect")
+                    return
+
+        async def app_receive() -> Message:
+            message = await messages.get()
+            if isinstance(message, Exception):
+                raise message
+            if message["type"] == "http.disconnect":
+                messages.put_nowait(message)
+            return message
+
+        async def app_send(message: Message):
+            nonlocal response_started, response_complete
+            if token.cancelled:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        reset = current_token.set(token)
+        try:
+            work = asyncio.ensure_future(self.app(scope, app_receive, app_send))
+        finally:
+            current_token.reset(reset)
+        listener = asyncio.ensure_future(listen())
+
+        try:
+            done, _ = await asyncio.wait({work}, timeout=timeout)
+            if not done:
+                token.cancel("timeout")
+                if not response_started:
+                    response = JSONResponse(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        content={"detail": f"Délai de traitement dépassé ({timeout:g} s)"}
+                    )
+                    await response(scope, receive, send)
+            # Fin coopérative du handler (sessions fermées, fichiers supprimés)
+            await asyncio.wait({work})
+        except asyncio.CancelledError:
+            token.cancel("shutdown")
+            work.cancel()
+            raise
+        finally:
+            listener.cancel()
+
+        if token.cancelled:
+            requests_cancelled.inc(route=route_label(scope), reason=token.reason)
+            logger.info(f"Requête annulée ({token.reason}): {scope['method']} {scope['path']}")
+            if not work.cancelled() and work.exception() is not None:
+                logger.debug(f"Handler annulé terminé en erreur: {work.exception()!r}")
+            return
+        work.result()
@@ -0,0 +1,94 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match / 304) sur les lectures.
+
+Le validateur est dérivé d'une seule requête SQL légère — nombre de lignes et
+``max(updated_at)`` de chaque table source — exécutée avant tout chargement :
+un client qui interroge périodiquement une liste inchangée reçoit un 304 sans
+qu'aucune ligne ne soit chargée ni sérialisée.
+
+JSON et MessagePack sont deux représentations de la même URL : l'ETag porte
+le format négocié (suffixe ``-msgpack``) et les 304 portent ``Vary: Accept``,
+pour qu'un cache partagé ne serve jamais l'une à la place de l'autre.
+
+Usage:
+    etag = resource_etag(db, Room)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+"""
+
+import hashlib
+from typing import Any, Optional, Tuple, Type, Union
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from api.core.negotiation import negotiated_format
+
+# Une source : un modèle (toute la table) ou (modèle, critère, ...)
+ValidatorSource = Union[Type[Any], Tuple[Any, ...]]
+
+# Les clients doivent revalider à chaque fois (réponse 304 si inchangée)
+CACHE_CONTROL = "private, no-cache"
+
+
+def _source_columns(source: ValidatorSource):
+    if isinstance(source, tuple):
+        model, *criteria = source
+    else:
+        model, criteria = source, []
+    count = select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+    last_update = select(func.max(model.updated_at)).where(*criteria).scalar_subquery()
+    return count, last_update
+
+
+def resource_etag(db: Session, *sources: ValidatorSource) -> str:
+    """
+    ETag faible calculé en une requête à partir de ``count(*)`` et
+    ``max(updated_at)`` des sources (les suppressions changent le nombre de
+    lignes, les modifications le ``updated_at``).
+    """
+    columns = [column for source in sources for column in _source_columns(source)]
+    row = db.execute(select(*columns)).one()
+    digest = hashlib.blake2b(repr(tuple(row)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible (RFC 9110) d'un ETag avec un header If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    expected = _opaque(etag)
+    return any(_opaque(tag) == expected for tag in if_none_match.split(","))
+
+
+def representation_etag(etag: str) -> str:
+    """ETag propre au format de réponse négocié (inchangé pour JSON)"""
+    response_format = negotiated_format()
+    if response_format == "json":
+        return etag
+    weak = etag.startswith("W/")
+    opaque = _opaque(etag).strip('"')
+    return f'{"W/" if weak else ""}"{opaque}-{response_format}"'
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Pose l'ETag (propre au format négocié) sur la réponse complète ; retourne
+    une réponse 304 vide si le client possède déjà cette version (le handler
+    doit alors la retourner).
+    """
+    etag = representation_etag(etag)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "Vary": "Accept"})
+    response.headers.update(headers)
+    return None
@@ -12,6 +12,28 @@ class Settings(BaseSettings):
     
     # Redis (optionnel)
     redis_url: Optional[str] = None
+    cache_reference_ttl: int = 600  # TTL des données de référence en cache (secondes)
+    cache_local_maxsize: int = 1024  # Entrées du cache LRU en mémoire (par worker)
+    cache_local_ttl: int = 30  # TTL max d'une entrée du cache local (secondes)
+    aggregate_fresh_ttl: int = 15  # Âge au-delà duquel un agrégat est recalculé en arrière-plan
+    aggregate_stale_ttl: int = 3600  # Durée de conservation d'un agrégat périmé (secondes)
+    aggregate_lock_ttl: int = 30  # Durée max du verrou de calcul inter-workers (secondes)
+    
+    # Synchronisation mobile
+    sync_overlap_seconds: int = 5  # Recouvrement appliqué au jeton ?since= (transactions longues)
+    
+    # Progression en direct (Server-Sent Events)
+    sse_heartbeat_interval: int = 15  # Secondes entre deux heartbeats sur un flux inactif
+    sse_queue_size: int = 100  # Événements en attente par abonné avant d'écarter les plus anciens
+    
+    # Taille des bodies de requête (413 au-delà, avant tout parsing)
+    max_request_body_size: int = 1048576  # 1 Mo, routes sans limite propre
+    finalize_max_body_size: int = 16777216  # 16 Mo, POST /sessions/{id}/finalize
+    finalize_stream_threshold: int = 262144  # Au-delà (ou sans Content-Length), statuts lus au fil de l'eau
+    
+    # Idempotence des mutations (header Idempotency-Key)
+    idempotency_ttl: int = 86400  # Conservation des réponses rejouables (secondes)
+    idempotency_lock_ttl: int = 60  # Attente max d'un doublon concurrent / durée du verrou (secondes)
     
     # Firebase
     firebase_credentials_path: Optional[str] = None
@@ -43,8 +65,51 @@ class Settings(BaseSettings):
     default_page_size: int = 20
     max_page_size: int = 100
     
-    # Scheduled tasks
-    enable_scheduler: bool = True
+    # Démarrage : vérification de la révision Alembic de la base (aucun DDL)
+    startup_schema_check: str = "warn"  # warn | strict (refuse de démarrer) | off
+    
+    # Scheduled tasks : à activer dans un seul processus (chaque worker qui
+    # l'active exécute toutes les tâches, sessions quotidiennes comprises)
+    enable_scheduler: bool = False
+    log_partition_months_ahead: int = 3  # Partitions mensuelles de cleaning_logs créées à l'avance
+    log_partition_check_interval: float = 21600.0  # Vérification des partitions (s), dans chaque worker ; 0 = jamais
+    
+    # Archivage à froid des sessions anciennes (NDJSON compressé par mois) :
+    # chemin absolu sur un volume persistant (les lignes archivées sont
+    # supprimées des tables) ; sans lui, l'archivage est refusé
+    archive_dir: Optional[str] = None
+    archive_retention_days: int = 730  # Sessions plus anciennes déplacées hors des tables
+    
+    # Profilage SQL par requête (Server-Timing + détection N+1)
+    query_profiler_enabled: bool = False
+    query_profiler_repeat_threshold: int = 5
+    orm_strict_loading: bool = False  # Chargement implicite (lazy) d'une relation = erreur (tests)
+    
+    # Métriques Prometheus (/metrics)
+    metrics_enabled: bool = True
+    metrics_token: Optional[str] = None
+    
+    # Contrôle d'admission par worker (file par priorité, délestage 503)
+    admission_control_enabled: bool = True
+    admission_max_concurrency: int = 32  # Requêtes traitées simultanément
+    admission_max_wait_critical: float = 10.0  # Attente cible (s) : écritures terrain
+    admission_max_wait_normal: float = 2.0  # Attente cible (s) : lectures
+    admission_max_wait_low: float = 0.25  # Attente cible (s) : exports, tableaux de bord
+    admission_low_priority_share: float = 0.5  # Part maximale des places pour les exports
+    admission_retry_after: int = 2  # Retry-After minimal des 503 (s)
+    
+    # Délais de traitement des routes longues (504 et annulation du travail au-delà)
+    export_request_timeout: float = 120.0  # POST /exports/pdf/{id}/download
+    dashboard_request_timeout: float = 30.0  # GET /dashboard, /dashboard/metrics
+    
+    # Profilage CPU et mémoire en production (/debug/profile, /debug/memory,
+    # administrateurs) : à activer le temps d'un diagnostic seulement
+    profiling_enabled: bool = False
+    profiling_max_seconds: float = 60.0
+    
+    # Diagnostic mémoire : relevé RSS/GC (/metrics) et snapshots tracemalloc (/debug/memory)
+    memory_sample_interval: float = 15.0  # Période du relevé (s), 0 = désactivé
+    memory_trace_frames: int = 25  # Profondeur de pile par défaut de tracemalloc
     
     # Email (pour futures notifications)
     smtp_host: Optional[str] = None
@@ -0,0 +1,212 @@
+"""
+Diffusion en direct de la progression des sessions (Server-Sent Events).
+
+Les changements de statut des logs et les compteurs mis à jour sont publiés
+après chaque commit. Avec Redis, la publication passe par un canal pub/sub
+que chaque worker écoute pour alimenter ses abonnés locaux ; sans Redis (ou
+tant que l'abonnement n'est pas actif), le broker en mémoire livre
+directement aux abonnés du worker.
+
+La publication est appelée depuis ``after_commit`` : sur la boucle
+d'événements, le PUBLISH part dans une tâche (client ``redis.asyncio``, ordre
+des commits conservé) ; hors boucle (handler synchrone, script), le client
+synchrone est utilisé directement.
+
+Chaque abonné a une file bornée : un client trop lent perd les événements les
+plus anciens (chaque événement porte l'état complet des compteurs, le dernier
+suffit), sans jamais ralentir la publication.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "session-events:"
+RECONNECT_DELAY = 30
+
+
+def format_sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode un message au format text/event-stream"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, default=str)}\n\n"
+
+
+class SessionEventBroker:
+    """Broker d'événements par session : abonnés locaux + fan-out Redis"""
+
+    def __init__(self, queue_size: Optional[int] = None):
+        self.queue_size = queue_size or settings.sse_queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listening = False
+        # Publications Redis en vol, envoyées une à une dans l'ordre des commits
+        self._background: Set[asyncio.Task] = set()
+        self._publish_lock: Optional[asyncio.Lock] = None
+        self._publish_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    # ===== ABONNEMENTS =====
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(session_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[session_id]
+
+    async def stream(self, session_id: str, snapshot: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Flux SSE d'une session : état initial, puis événements ; un commentaire
+        de heartbeat est envoyé après chaque période d'inactivité.
+        """
+        queue = self.subscribe(session_id)
+        try:
+            yield f"retry: {settings.sse_heartbeat_interval * 1000}\n\n"
+            if snapshot is not None:
+                yield format_sse(snapshot, event="snapshot")
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.sse_heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(data, event="progress")
+        finally:
+            self.unsubscribe(session_id, queue)
+
+    # ===== PUBLICATION =====
+
+    def _deliver(self, session_id: str, data: Dict[str, Any]):
+        """Livre aux abonnés locaux (boucle asyncio) ; file pleine : on jette le plus ancien"""
+        for queue in self._subscribers.get(session_id, ()):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(data)
+
+    def _deliver_threadsafe(self, session_id: str, data: Dict[str, Any]):
+        loop = self._loop
+        if loop is None or loop.is_closed() or session_id not in self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(session_id, data)
+        else:
+            loop.call_soon_threadsafe(self._deliver, session_id, data)
+
+    def publish(self, session_id: str, data: Dict[str, Any]):
+        """
+        Publie un événement (appelable depuis du code synchrone, ex. après un
+        commit) : via Redis si disponible, localement sinon. Ne bloque jamais
+        la boucle d'événements sur un aller-retour Redis.
+        """
+        from api.core.cache import cache
+
+        if not self._listening:
+            self._deliver_threadsafe(session_id, data)
+        if not cache.redis_url:
+            return
+
+        message = json.dumps(data, default=str)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self._publish_sync(session_id, message)
+            return
+
+        if self._publish_lock is None or self._publish_loop is not loop:
+            self._publish_lock, self._publish_loop = asyncio.Lock(), loop
+        task = loop.create_task(self._apublish(self._publish_lock, session_id, message))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _publish_sync(self, session_id: str, message: str):
+        from api.core.cache import cache
+
+        client = cache.client
+        if client is None:
+            return
+        try:
+            client.publish(CHANNEL_PREFIX + session_id, message)
+        except Exception as e:
+            logger.error(f"Erreur publication événement session: {e}")
+
+    async def _apublish(self, lock: asyncio.Lock, session_id: str, message: str):
+        from api.core.cache import cache
+
+        # Verrou équitable : les tâches le prennent dans l'ordre de création
+        async with lock:
+            client = cache.async_client
+            if client is None:
+                return
+            try:
+                await client.publish(CHANNEL_PREFIX + session_id, message)
+            except Exception as e:
+                logger.error(f"Erreur publication événement session: {e}")
+
+    async def drain(self):
+        """Attend les publications en cours (arrêt du worker, tests)"""
+        while self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    # ===== FAN-OUT INTER-WORKERS (PUB/SUB) =====
+
+    async def listen(self):
+        """Boucle d'abonnement Redis (à lancer au démarrage) alimentant les abonnés locaux"""
+        from api.core.cache import cache
+
+        self._loop = asyncio.get_running_loop()
+        while True:
+            client = cache.async_client
+            if client is None:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                self._listening = True
+                logger.info("✅ Abonné aux événements de session")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    session_id = message["channel"][len(CHANNEL_PREFIX):]
+                    if session_id in self._subscribers:
+                        self._deliver(session_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Abonnement aux événements de session interrompu: {e}")
+            finally:
+                self._listening = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+# Instance globale (une par worker)
+session_events = SessionEventBroker()
@@ -0,0 +1,380 @@
+"""
+Clés d'idempotence (header ``Idempotency-Key``) pour les mutations rejouées.
+
+Sur les routes listées dans ``IDEMPOTENT_ROUTES``, la première requête portant
+une clé est exécutée et sa réponse (statut, headers, body) conservée avec une
+TTL ; une nouvelle tentative avec la même clé reçoit exactement les mêmes
+octets, sans réexécuter le traitement. Un doublon concurrent attend le
+résultat de la requête en cours au lieu de recalculer.
+
+Les réponses 5xx ne sont pas conservées (la nouvelle tentative est exécutée).
+Réutiliser une clé avec un autre body renvoie 422 ; pour un body multipart,
+le boundary (tiré au hasard à chaque envoi) est exclu de l'empreinte. Le body
+est haché au fil de sa lecture par la route, jamais mis en mémoire : les
+finalisations volumineuses restent lues en streaming.
+
+Les clés sont cloisonnées par utilisateur : claim ``sub`` du token vérifié,
+stable d'un rafraîchissement du token Firebase à l'autre. Une requête dont le
+token ne peut être vérifié est traitée sans idempotence (l'authentification
+de la route la refusera). Le token n'est vérifié qu'une fois par requête :
+ses claims sont transmis à l'authentification de la route (``get_current_user``).
+
+Stockage : Redis si disponible (partagé entre workers), sinon mémoire du worker,
+y compris pendant une indisponibilité de Redis.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+
+# (méthode, chemin) des routes qui honorent Idempotency-Key
+IDEMPOTENT_ROUTES: Tuple[Tuple[str, "re.Pattern[str]"], ...] = tuple(
+    (method, re.compile(pattern)) for method, pattern in (
+        ("POST", r"^/sessions/today$"),
+        ("POST", r"^/sessions/[^/]+/finalize$"),
+        ("PATCH", r"^/sessions/[^/]+/logs$"),
+        ("POST", r"^/uploads/photos?$"),
+        ("POST", r"^/logs/[^/]+/(complete|quick-complete)$"),
+    )
+)
+
+# Intervalle de scrutation pendant qu'un doublon est en cours de traitement
+POLL_INTERVAL = 0.1
+
+PENDING = "pending"
+DONE = "done"
+
+# Appelant d'une requête sans header Authorization
+ANONYMOUS = "anonymous"
+
+_BOUNDARY = re.compile(rb'boundary="?([^";]+)"?', re.IGNORECASE)
+_BOUNDARY_PLACEHOLDER = b"<boundary>"
+
+
+def is_idempotent_route(method: str, path: str) -> bool:
+    return any(method == route_method and pattern.match(path) for route_method, pattern in IDEMPOTENT_ROUTES)
+
+
+def multipart_boundary(content_type: bytes) -> Optional[bytes]:
+    """Boundary d'un body ``multipart/*``, ``None`` pour les autres types"""
+    if not content_type.lower().startswith(b"multipart/"):
+        return None
+    match = _BOUNDARY.search(content_type)
+    return match.group(1).strip() if match else None
+
+
+class BodyFingerprint:
+    """
+    Empreinte SHA-256 d'un body, alimentée chunk par chunk. Les occurrences
+    du boundary multipart sont remplacées par un marqueur fixe (en gardant de
+    quoi reconnaître un boundary coupé entre deux chunks).
+    """
+
+    def __init__(self, content_type: bytes = b""):
+        self._hash = hashlib.sha256()
+        self._boundary = multipart_boundary(content_type)
+        self._tail = b""
+
+    def update(self, chunk: bytes):
+        if not self._boundary:
+            self._hash.update(chunk)
+            return
+        data = (self._tail + chunk).replace(self._boundary, _BOUNDARY_PLACEHOLDER)
+        cut = max(len(data) - (len(self._boundary) - 1), 0)
+        self._hash.update(data[:cut])
+        self._tail = data[cut:]
+
+    def hexdigest(self) -> str:
+        self._hash.update(self._tail)
+        self._tail = b""
+        return self._hash.hexdigest()
+
+
+class MemoryIdempotencyStore:
+    """Stockage en mémoire (un worker), utilisé sans Redis"""
+
+    def __init__(self):
+        self._records: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def _purge(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._records.items() if expires_at < now]:
+            del self._records[key]
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        self._purge()
+        entry = self._records.get(key)
+        return entry[1] if entry else None
+
+    async def acquire(self, key: str, record: Dict[str, Any], ttl: int) -> bool:
+        self._purge()
+        if key in self._records:
+            return False
+        self._records[key] = (time.monotonic() + ttl, record)
+        return True
+
+    async def save(self, key: str, record: Dict[str, Any], ttl: int):
+        self._records[key] = (time.monotonic() + ttl, record)
+
+    async def release(self, key: str):
+        self._records.pop(key, None)
+
+
+class RedisIdempotencyStore:
+    """Stockage Redis partagé entre workers (SET NX pour le verrou)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self.client.get(key)
+        return json.loads(value) if value else None
+
+    async def acquire(self, key: str, record: Dict[str, Any], ttl: int) -> bool:
+        return bool(await self.client.set(key, json.dumps(record), nx=True, ex=ttl))
+
+    async def save(self, key: str, record: Dict[str, Any], ttl: int):
+        await self.client.set(key, json.dumps(record), ex=ttl)
+
+    async def release(self, key: str):
+        await self.client.delete(key)
+
+
+_memory_store = MemoryIdempotencyStore()
+
+
+def get_store():
+    """Redis, ou la mémoire du worker si Redis n'est pas configuré ou marqué indisponible"""
+    from api.core.cache import cache
+
+    client = cache.async_client
+    return RedisIdempotencyStore(client) if client is not None else _memory_store
+
+
+def _store_failed(store, e: Exception):
+    """Marque Redis indisponible : les requêtes suivantes passent par la mémoire du worker"""
+    if isinstance(store, RedisIdempotencyStore):
+        from api.core.cache import cache
+
+        cache.mark_async_unavailable(e)
+
+
+class IdempotencyMiddleware:
+    """Rejoue la réponse conservée d'une requête déjà traitée avec la même clé"""
+
+    def __init__(self, app: ASGIApp, store=None, verify_token=None):
+        self.app = app
+        self.store = store
+        self.verify_token = verify_token
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not is_idempotent_route(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        caller = await self._caller(headers)
+        if caller is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._storage_key(scope, caller, idempotency_key)
+        store = self.store or get_store()
+        try:
+            try:
+                record = await self._acquire_or_wait(store, key)
+            except Exception as e:
+                if not isinstance(store, RedisIdempotencyStore):
+                    raise
+                logger.warning(f"Idempotence : Redis indisponible, repli en mémoire: {e}")
+                _store_failed(store, e)
+                store = _memory_store
+                record = await self._acquire_or_wait(store, key)
+        except Exception as e:
+            # Stockage indisponible : traiter la requête normalement
+            logger.warning(f"Idempotence indisponible: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        # Le body n'est jamais conservé : haché au fil de la lecture (par l'app,
+        # ou ici sans la réexécuter), la mémoire reste bornée pour les gros envois
+        fingerprint = BodyFingerprint(headers.get(b"content-type", b""))
+        if record is None:
+            await self._execute(scope, receive, send, store, key, fingerprint)
+            return
+
+        if record["state"] == DONE and await self._consume_body(receive, fingerprint):
+            if record.get("fingerprint") != fingerprint.hexdigest():
+                response = JSONResponse(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    content={"detail": "Idempotency-Key déjà utilisée pour une requête différente"}
+                )
+            else:
+                await self._replay(record, send)
+                return
+        else:
+            response = JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"detail": "Requête identique toujours en cours de traitement"},
+                headers={"Retry-After": "1"}
+            )
+        await response(scope, receive, send)
+
+    # ===== EXÉCUTION ET CAPTURE =====
+
+    async def _execute(self, scope, receive, send, store, key, fingerprint: BodyFingerprint):
+        response_start: Optional[Message] = None
+        chunks: List[bytes] = []
+        body_complete = False
+
+        async def hashing_receive() -> Message:
+            nonlocal body_complete
+            message = await receive()
+            if message["type"] == "http.request" and not body_complete:
+                fingerprint.update(message.get("body", b""))
+                body_complete = not message.get("more_body", False)
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal response_start, body_complete
+            if message["type"] == "http.response.start":
+                response_start = message
+                if not body_complete:
+                    # Body non lu (ou pas entièrement) par l'app : l'empreinte le couvre quand même
+                    body_complete = await self._consume_body(receive, fingerprint)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, send_wrapper)
+        except BaseException:
+            await self._safe_release(store, key)
+            raise
+
+        if response_start is None or response_start["status"] >= 500 or not body_complete:
+            await self._safe_release(store, key)
+            return
+
+        record = {
+            "state": DONE,
+            "fingerprint": fingerprint.hexdigest(),
+            "status": response_start["status"],
+            "headers": [
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in response_start.get("headers", [])
+            ],
+            "body": base64.b64encode(b"".join(chunks)).decode("ascii"),
+        }
+        try:
+            await store.save(key, record, settings.idempotency_ttl)
+        except Exception as e:
+            logger.warning(f"Réponse idempotente non conservée: {e}")
+            _store_failed(store, e)
+
+    async def _acquire_or_wait(self, store, key: str) -> Optional[Dict[str, Any]]:
+        """
+        ``None`` si cette requête doit être exécutée (verrou obtenu), sinon
+        l'enregistrement existant (terminé, ou toujours en cours après attente).
+        """
+        pending = {"state": PENDING}
+        deadline = time.monotonic() + settings.idempotency_lock_ttl
+        while True:
+            if await store.acquire(key, pending, settings.idempotency_lock_ttl):
+                return None
+            record = await store.get(key)
+            if record is None:
+                # Verrou libéré entre-temps (échec du premier traitement) : retenter
+                continue
+            if record["state"] == DONE or time.monotonic() >= deadline:
+                return record
+            await asyncio.sleep(POLL_INTERVAL)
+
+    @staticmethod
+    async def _safe_release(store, key: str):
+        try:
+            await store.release(key)
+        except Exception as e:
+            logger.warning(f"Verrou d'idempotence non libéré: {e}")
+
+    @staticmethod
+    async def _consume_body(receive: Receive, fingerprint: BodyFingerprint) -> bool:
+        """Lit le reste du body sans le conserver ; False si le client s'est déconnecté avant la fin"""
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return False
+            fingerprint.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                return True
+
+    @staticmethod
+    async def _replay(record: Dict[str, Any], send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": record["status"],
+            "headers": [
+                *((name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]),
+                REPLAYED_HEADER,
+            ],
+        })
+        await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+    # ===== REQUÊTE =====
+
+    async def _caller(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        """
+        Identifiant stable de l'appelant : ``sub`` du token vérifié (inchangé
+        quand le token est rafraîchi), ``None`` si le token est invalide.
+        Vérifié et non simplement décodé : une réponse rejouée ne doit
+        parvenir qu'à son propriétaire. Les claims sont mémorisés pour la
+        requête : la route ne revérifie pas le token.
+        """
+        from api.core.security import remember_verified_token
+
+        authorization = headers.get(b"authorization")
+        if not authorization:
+            return ANONYMOUS
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            return None
+        verify_token = self.verify_token
+        if verify_token is None:
+            from api.core.security import verify_id_token as verify_token
+        token = token.strip()
+        try:
+            claims = await run_in_threadpool(verify_token, token)
+        except Exception as e:
+            logger.debug(f"Idempotence ignorée, token non vérifié: {e}")
+            return None
+        remember_verified_token(token, claims)
+        subject = claims.get("sub") or claims.get("user_id") or claims.get("uid")
+        return hashlib.sha256(str(subject).encode()).hexdigest()[:16] if subject else None
+
+    @staticmethod
+    def _storage_key(scope: Scope, caller: str, idempotency_key: bytes) -> str:
+        # Clés cloisonnées par utilisateur et par route
+        raw_key = idempotency_key.decode("latin-1")[:255]
+        return f"idempotency:{caller}:{scope['method']}:{scope['path']}:{raw_key}"
@@ -0,0 +1,279 @@
+"""
+Diagnostic mémoire des workers : échantillonneur RSS/GC et snapshots tracemalloc.
+
+``MemorySampler`` relève périodiquement (``memory_sample_interval``) la
+mémoire résidente du worker, les compteurs du ramasse-miettes et la mémoire
+suivie par tracemalloc, exposés sur ``/metrics`` : la croissance du RSS au
+fil de la journée se lit directement dans Prometheus.
+
+``MemoryTracer`` pilote tracemalloc à la demande (endpoints ``/debug/memory``,
+administrateurs) : démarrage avec un snapshot de référence, puis snapshots
+successifs comparés au précédent ou à la référence. Les écarts sont regroupés
+par fichier/ligne d'allocation et par route : une allocation est attribuée à
+la route dont le endpoint apparaît dans sa pile (il faut donc assez de frames,
+``memory_trace_frames``). tracemalloc ralentit les allocations tant qu'il est
+actif : l'arrêter une fois le diagnostic terminé.
+"""
+
+import asyncio
+import gc
+import inspect
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.core.metrics import registry
+from api.core.sampling_profiler import short_filename
+
+logger = logging.getLogger(__name__)
+
+UNATTRIBUTED = "(non attribué)"
+
+# Allocations du diagnostic lui-même, exclues des snapshots
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# ===== MÉTRIQUES =====
+
+process_resident_memory = registry.gauge(
+    "process_resident_memory_bytes",
+    "Mémoire résidente (RSS) du worker"
+)
+process_resident_memory_peak = registry.gauge(
+    "process_resident_memory_peak_bytes",
+    "RSS maximale atteinte par le worker depuis son démarrage"
+)
+gc_objects_tracked = registry.gauge(
+    "python_gc_objects_tracked",
+    "Allocations en attente de collecte par génération (gc.get_count)",
+    ("generation",)
+)
+gc_collections = registry.counter(
+    "python_gc_collections_total",
+    "Collectes du ramasse-miettes par génération",
+    ("generation",)
+)
+gc_objects_collected = registry.counter(
+    "python_gc_objects_collected_total",
+    "Objets libérés par le ramasse-miettes par génération",
+    ("generation",)
+)
+gc_objects_uncollectable = registry.counter(
+    "python_gc_objects_uncollectable_total",
+    "Objets non libérables trouvés par le ramasse-miettes par génération",
+    ("generation",)
+)
+gc_garbage = registry.gauge(
+    "python_gc_garbage_objects",
+    "Objets non libérables conservés dans gc.garbage"
+)
+tracemalloc_traced = registry.gauge(
+    "python_tracemalloc_traced_bytes",
+    "Mémoire suivie par tracemalloc (0 s'il est inactif)"
+)
+
+
+def resident_memory() -> Optional[int]:
+    """RSS courante en octets (Linux : /proc/self/statm), None si indisponible"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_resident_memory() -> Optional[int]:
+    """RSS maximale en octets (getrusage), None si indisponible"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilo-octets sous Linux, octets sous macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class MemorySampler:
+    """Relevé périodique RSS / GC / tracemalloc vers les métriques"""
+
+    def __init__(self):
+        self._gc_stats: Optional[List[Dict[str, int]]] = None
+
+    def sample(self) -> Dict[str, Any]:
+        """Met à jour les métriques et retourne les valeurs relevées"""
+        rss = resident_memory()
+        peak = peak_resident_memory()
+        if rss is not None:
+            process_resident_memory.set(rss)
+        if peak is not None:
+            process_resident_memory_peak.set(peak)
+
+        counts = gc.get_count()
+        for generation, count in enumerate(counts):
+            gc_objects_tracked.set(count, generation=generation)
+
+        # gc.get_stats() est cumulatif : les compteurs avancent de l'écart au relevé précédent
+        stats = gc.get_stats()
+        previous = self._gc_stats or [{"collections": 0, "collected": 0, "uncollectable": 0}] * len(stats)
+        for generation, (current, before) in enumerate(zip(stats, previous)):
+            gc_collections.inc(current["collections"] - before["collections"], generation=generation)
+            gc_objects_collected.inc(current["collected"] - before["collected"], generation=generation)
+            gc_objects_uncollectable.inc(current["uncollectable"] - before["uncollectable"], generation=generation)
+        self._gc_stats = stats
+        gc_garbage.set(len(gc.garbage))
+
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc_traced.set(traced)
+        return {
+            "rss_bytes": rss,
+            "rss_peak_bytes": peak,
+            "gc_counts": list(counts),
+            "gc_garbage": len(gc.garbage),
+            "tracemalloc": {"tracing": tracemalloc.is_tracing(), "current_bytes": traced, "peak_bytes": traced_peak},
+        }
+
+    async def run(self, interval: float):
+        """Boucle de relevé (tâche de fond du lifespan)"""
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Relevé mémoire impossible: {e}")
+            await asyncio.sleep(interval)
+
+
+# Instance globale (une par worker)
+memory_sampler = MemorySampler()
+
+
+# ===== TRACEMALLOC =====
+
+class MemoryTracingError(RuntimeError):
+    """tracemalloc déjà actif, ou inactif alors qu'un snapshot est demandé"""
+
+
+EndpointRange = Tuple[int, int, str]
+
+
+def endpoint_ranges(routes: Iterable[Any]) -> Dict[str, List[EndpointRange]]:
+    """Par fichier : (première ligne, dernière ligne, ``METHODES /route``) de chaque endpoint"""
+    ranges: Dict[str, List[EndpointRange]] = defaultdict(list)
+    for route in routes:
+        endpoint = getattr(route, "endpoint", None)
+        code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint else None
+        if code is None:
+            continue
+        lines = [line for _, _, line in code.co_lines() if line is not None]
+        methods = ",".join(sorted(getattr(route, "methods", None) or ()))
+        label = f"{methods} {route.path}".strip()
+        ranges[code.co_filename].append((code.co_firstlineno, max(lines, default=code.co_firstlineno), label))
+    return ranges
+
+
+def _route_of(traceback: tracemalloc.Traceback, ranges: Dict[str, List[EndpointRange]]) -> str:
+    for frame in traceback:
+        for first, last, label in ranges.get(frame.filename, ()):
+            if first <= frame.lineno <= last:
+                return label
+    return UNATTRIBUTED
+
+
+class MemoryTracer:
+    """Session tracemalloc : snapshot de référence et snapshots successifs"""
+
+    def __init__(self):
+        self.frames = 0
+        self.started_at: Optional[float] = None
+        self.snapshots = 0
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing() and self._baseline is not None
+
+    @staticmethod
+    def _take_snapshot(collect: bool) -> tracemalloc.Snapshot:
+        if collect:
+            # Ne comparer que la mémoire réellement retenue
+            gc.collect()
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def start(self, frames: int):
+        if tracemalloc.is_tracing():
+            raise MemoryTracingError("tracemalloc est déjà actif sur ce worker")
+        tracemalloc.start(frames)
+        self.frames = frames
+        self.started_at = time.time()
+        self.snapshots = 0
+        self._baseline = self._previous = self._take_snapshot(collect=True)
+
+    def stop(self):
+        tracemalloc.stop()
+        self._baseline = self._previous = None
+        self.started_at = None
+
+    def snapshot(
+        self,
+        routes: Iterable[Any],
+        compare_to: str = "previous",
+        limit: int = 20,
+        collect: bool = True
+    ) -> Dict[str, Any]:
+        """Écarts d'allocation depuis le snapshot précédent (ou la référence)"""
+        if not self.tracing:
+            raise MemoryTracingError("tracemalloc n'est pas actif : POST /debug/memory/start")
+
+        reference = self._baseline if compare_to == "start" else self._previous
+        current = self._take_snapshot(collect)
+        self._previous = current
+        self.snapshots += 1
+
+        top_lines = []
+        for diff in current.compare_to(reference, "lineno")[:limit]:
+            frame = diff.traceback[0]
+            top_lines.append({
+                "file": short_filename(frame.filename),
+                "line": frame.lineno,
+                "size_diff": diff.size_diff,
+                "size": diff.size,
+                "count_diff": diff.count_diff,
+                "count": diff.count,
+            })
+
+        ranges = endpoint_ranges(routes)
+        by_route: Dict[str, Dict[str, int]] = defaultdict(lambda: {"size_diff": 0, "size": 0, "count_diff": 0})
+        for diff in current.compare_to(reference, "traceback"):
+            totals = by_route[_route_of(diff.traceback, ranges)]
+            totals["size_diff"] += diff.size_diff
+            totals["size"] += diff.size
+            totals["count_diff"] += diff.count_diff
+        top_routes = [
+            {"route": route, **totals}
+            for route, totals in sorted(by_route.items(), key=lambda item: -item[1]["size_diff"])[:limit]
+        ]
+
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        return {
+            "snapshot": self.snapshots,
+            "compared_to": "start" if compare_to == "start" or self.snapshots == 1 else f"snapshot {self.snapshots - 1}",
+            "tracing_seconds": round(time.time() - self.started_at, 1),
+            "frames": self.frames,
+            "traced_bytes": traced,
+            "traced_peak_bytes": traced_peak,
+            "rss_bytes": resident_memory(),
+            "top_lines": top_lines,
+            "top_routes": top_routes,
+        }
+
+
+# Instance globale (une par worker)
+memory_tracer = MemoryTracer()
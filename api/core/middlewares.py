@@ -1,121 +1,221 @@
+"""
+Middlewares HTTP de l'API.
+
+Tous les middlewares sont implémentés en ASGI pur : les headers sont injectés
+dans le message ``http.response.start`` au lieu de passer par
+``BaseHTTPMiddleware``, ce qui évite une tâche et un stream intermédiaires par
+requête et préserve les réponses en streaming (FileResponse, SSE...).
+"""
+
 import time
 import uuid
 import json
-from datetime import datetime
-from typing import Callable
-from fastapi import Request, Response, status
+from contextvars import ContextVar
+from typing import Iterable, List, Optional, Tuple
+from fastapi import FastAPI, Response, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 from api.core.config import settings
+from api.core.body_limit import BodyLimitMiddleware
+from api.core.cancellation import RequestCancellationMiddleware
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+RawHeaders = List[Tuple[bytes, bytes]]
+
+# Routes sans accès base de données ni CSP applicative
+DOCUMENTATION_PATHS = ("/docs", "/redoc", "/openapi.json")
+NO_DB_PATHS = frozenset(["/health", "/docs", "/redoc", "/openapi.json"])
+
+# Scope de la requête en cours (posé par RequestIDMiddleware) : permet de rattacher
+# à sa route du code qui n'a pas accès à la requête (profileur par échantillonnage)
+current_request_scope: ContextVar[Optional[Scope]] = ContextVar("current_request_scope", default=None)
+
+
+def append_headers(message: Message, headers: Iterable[Tuple[bytes, bytes]]) -> None:
+    """Ajoute des headers bruts à un message ``http.response.start``"""
+    message["headers"] = [*message.get("headers", ()), *headers]
+
+
+def get_request_id(scope: Scope) -> str:
+    """Retourne l'ID de requête posé par RequestIDMiddleware (``request.state.request_id``)"""
+    return scope.get("state", {}).get("request_id", "unknown")
+
+
+class RequestIDMiddleware:
     """Ajoute un ID unique à chaque requête pour le suivi"""
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
+        # scope["state"] est le stockage de request.state côté Starlette
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (b"x-request-id", request_id.encode("latin-1"))
 
-class TimingMiddleware(BaseHTTPMiddleware):
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                append_headers(message, (header,))
+            await send(message)
+
+        token = current_request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_scope.reset(token)
+
+class TimingMiddleware:
     """Mesure le temps de traitement des requêtes"""
-    
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        response = await call_next(request)
-        
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        # Log les requêtes lentes (>1s)
-        if process_time > 1.0:
-            logger.warning(
-                f"Slow request: {request.method} {request.url.path} "
-                f"took {process_time:.2f}s"
-            )
-        
-        return response
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app: ASGIApp, slow_threshold: float = 1.0):
+        self.app = app
+        self.slow_threshold = slow_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                # Temps jusqu'à l'envoi des headers (le body peut être streamé)
+                process_time = time.perf_counter() - start_time
+                append_headers(message, ((b"x-process-time", str(process_time).encode("latin-1")),))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            process_time = time.perf_counter() - start_time
+            # Log les requêtes lentes (>1s)
+            if process_time > self.slow_threshold:
+                logger.warning(
+                    f"Slow request: {scope['method']} {scope['path']} "
+                    f"took {process_time:.2f}s"
+                )
+
+class LoggingMiddleware:
     """Logging structuré des requêtes HTTP"""
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Récupérer l'ID de requête
-        request_id = getattr(request.state, "request_id", "unknown")
-        
+        request_id = get_request_id(scope)
+        method = scope["method"]
+        path = scope["path"]
+        client = scope.get("client")
+
         # Log de la requête entrante
         logger.info(
-            f"Request started",
+            "Request started",
             extra={
                 "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "query_params": dict(request.query_params),
-                "client_host": request.client.host if request.client else None,
+                "method": method,
+                "path": path,
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "client_host": client[0] if client else None,
             }
         )
-        
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         # Traiter la requête
-        response = await call_next(request)
-        
+        await self.app(scope, receive, send_wrapper)
+
         # Log de la réponse
         logger.info(
-            f"Request completed",
+            "Request completed",
             extra={
                 "request_id": request_id,
-                "status_code": response.status_code,
-                "method": request.method,
-                "path": request.url.path,
+                "status_code": status_code,
+                "method": method,
+                "path": path,
             }
         )
-        
-        return response
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
+class ErrorHandlingMiddleware:
     """Gestion centralisée des erreurs"""
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
-        except ValueError as e:
-            logger.error(f"ValueError: {str(e)}", exc_info=True)
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            # Impossible de remplacer une réponse dont les headers sont partis
+            if response_started:
+                logger.error(f"Exception after response start: {str(e)}", exc_info=True)
+                raise
+            response = self._build_error_response(scope, e)
+            await response(scope, receive, send)
+
+    @staticmethod
+    def _build_error_response(scope: Scope, exc: Exception) -> JSONResponse:
+        request_id = get_request_id(scope)
+
+        if isinstance(exc, ValueError):
+            logger.error(f"ValueError: {str(exc)}", exc_info=exc)
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "error": "Bad Request",
-                    "message": str(e),
-                    "request_id": getattr(request.state, "request_id", "unknown")
+                    "message": str(exc),
+                    "request_id": request_id
                 }
             )
-        except PermissionError as e:
-            logger.error(f"PermissionError: {str(e)}", exc_info=True)
+        if isinstance(exc, PermissionError):
+            logger.error(f"PermissionError: {str(exc)}", exc_info=exc)
             return JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={
                     "error": "Forbidden",
                     "message": "Vous n'avez pas les permissions nécessaires",
-                    "request_id": getattr(request.state, "request_id", "unknown")
-                }
-            )
-        except Exception as e:
-            logger.error(f"Unhandled exception: {str(e)}", exc_info=True)
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={
-                    "error": "Internal Server Error",
-                    "message": "Une erreur inattendue s'est produite" if settings.environment == "production" else str(e),
-                    "request_id": getattr(request.state, "request_id", "unknown")
+                    "request_id": request_id
                 }
             )
+        logger.error(f"Unhandled exception: {str(exc)}", exc_info=exc)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={
+                "error": "Internal Server Error",
+                "message": "Une erreur inattendue s'est produite" if settings.environment == "production" else str(exc),
+                "request_id": request_id
+            }
+        )
 
 class RateLimitMiddleware:
     """Limitation du nombre de requêtes par IP"""
@@ -178,72 +278,147 @@ class RateLimitMiddleware:
         
         await self.app(scope, receive, send)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware:
     """Ajoute des headers de sécurité aux réponses"""
-    
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Headers de sécurité
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
+
+    # CSP permissive pour la documentation (ReDoc utilise des Workers)
+    DOCUMENTATION_CSP = (
+        "default-src 'self' https://cdn.jsdelivr.net https://fonts.googleapis.com https://fonts.gstatic.com; "
+        "script-src 'self' 'unsafe-inline' 'unsafe-eval' blob: https://cdn.jsdelivr.net; "
+        "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; "
+        "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net; "
+        "img-src 'self' data: blob: https://fastapi.tiangolo.com https://cdn.redoc.ly; "
+        "worker-src 'self' blob:; "
+        "connect-src 'self'"
+    )
+
+    # CSP plus permissive en développement
+    DEVELOPMENT_CSP = (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data: blob:; "
+        "font-src 'self' data:; "
+        "connect-src 'self' ws: wss:; "
+        "worker-src 'self' blob:"
+    )
+
+    # CSP stricte en production
+    PRODUCTION_CSP = (
+        "default-src 'self'; "
+        "script-src 'self'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data: https:; "
+        "font-src 'self'; "
+        "connect-src 'self'; "
+        "frame-ancestors 'none'; "
+        "base-uri 'self'; "
+        "form-action 'self'"
+    )
+
+    BASE_HEADERS = (
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    )
+
+    def __init__(self, app: ASGIApp, environment: str = None):
+        self.app = app
+        environment = environment or settings.environment
+        app_csp = self.DEVELOPMENT_CSP if environment == "development" else self.PRODUCTION_CSP
+
+        # Headers précalculés par classe de route (documentation / application)
+        self._docs_headers = self._build_headers(self.DOCUMENTATION_CSP)
+        self._app_headers = self._build_headers(app_csp)
+
+    @classmethod
+    def _build_headers(cls, csp: str) -> Tuple[Tuple[bytes, bytes], ...]:
+        return (*cls.BASE_HEADERS, (b"content-security-policy", csp.encode("latin-1")))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Content Security Policy adaptée selon la route
-        path = request.url.path
-        
-        if path.startswith("/docs") or path.startswith("/redoc") or path == "/openapi.json":
-            # CSP permissive pour la documentation (ReDoc utilise des Workers)
-            response.headers["Content-Security-Policy"] = (
-                "default-src 'self' https://cdn.jsdelivr.net https://fonts.googleapis.com https://fonts.gstatic.com; "
-                "script-src 'self' 'unsafe-inline' 'unsafe-eval' blob: https://cdn.jsdelivr.net; "
-                "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; "
-                "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net; "
-                "img-src 'self' data: blob: https://fastapi.tiangolo.com https://cdn.redoc.ly; "
-                "worker-src 'self' blob:; "
-                "connect-src 'self'"
-            )
-        elif settings.environment == "development":
-            # CSP plus permissive en développement
-            response.headers["Content-Security-Policy"] = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data: blob:; "
-                "font-src 'self' data:; "
-                "connect-src 'self' ws: wss:; "
-                "worker-src 'self' blob:"
-            )
+        if scope["path"].startswith(DOCUMENTATION_PATHS):
+            headers = self._docs_headers
         else:
-            # CSP stricte en production
-            response.headers["Content-Security-Policy"] = (
-                "default-src 'self'; "
-                "script-src 'self'; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data: https:; "
-                "font-src 'self'; "
-                "connect-src 'self'; "
-                "frame-ancestors 'none'; "
-                "base-uri 'self'; "
-                "form-action 'self'"
-            )
-        
-        return response
+            headers = self._app_headers
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                append_headers(message, headers)
+            await send(message)
 
-class DatabaseTransactionMiddleware(BaseHTTPMiddleware):
+        await self.app(scope, receive, send_wrapper)
+
+class DatabaseTransactionMiddleware:
     """Gère les transactions de base de données automatiquement"""
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Skip pour les routes qui n'utilisent pas la DB
-        if request.url.path in ["/health", "/docs", "/redoc", "/openapi.json"]:
-            return await call_next(request)
-        
-        response = await call_next(request)
-        
-        # Si erreur 5xx, on pourrait rollback ici si nécessaire
-        if response.status_code >= 500:
-            logger.error(f"Server error on {request.method} {request.url.path}")
-        
-        return response
\ No newline at end of file
+        if scope["type"] != "http" or scope["path"] in NO_DB_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            # Si erreur 5xx, on pourrait rollback ici si nécessaire
+            if message["type"] == "http.response.start" and message["status"] >= 500:
+                logger.error(f"Server error on {scope['method']} {scope['path']}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# Ordre d'exécution, du plus externe au plus interne. ErrorHandling reste sous
+# SecurityHeaders/RequestID pour que ses réponses d'erreur portent aussi les headers.
+# RequestCancellation lit tout le body en avance : sous BodyLimit, qui le borne.
+MIDDLEWARE_CHAIN = (
+    RequestIDMiddleware,
+    TimingMiddleware,
+    LoggingMiddleware,
+    SecurityHeadersMiddleware,
+    ErrorHandlingMiddleware,
+    DatabaseTransactionMiddleware,
+    BodyLimitMiddleware,
+    RequestCancellationMiddleware,
+)
+
+def setup_middlewares(app: FastAPI) -> None:
+    """Enregistre la chaîne de middlewares ASGI sur l'application"""
+    chain = list(MIDDLEWARE_CHAIN)
+
+    if settings.metrics_enabled:
+        from api.core.metrics import MetricsMiddleware
+        # Juste sous RequestID pour mesurer toute la durée de la requête
+        chain.insert(chain.index(RequestIDMiddleware) + 1, MetricsMiddleware)
+
+    if settings.admission_control_enabled:
+        from api.core.admission import AdmissionControlMiddleware
+        # Avant ErrorHandling : les 503 portent request_id et headers de sécurité,
+        # et une requête refusée ne traverse aucun middleware coûteux
+        chain.insert(chain.index(ErrorHandlingMiddleware), AdmissionControlMiddleware)
+
+    if settings.query_profiler_enabled:
+        from api.core.query_profiler import QueryProfilerMiddleware
+        # Sous RequestID pour corréler les statistiques SQL à request_id
+        chain.insert(chain.index(RequestIDMiddleware) + 1, QueryProfilerMiddleware)
+
+    from api.core.negotiation import MessagePackMiddleware
+    # Format de réponse (Accept) et bodies MessagePack convertis avant l'idempotence
+    chain.append(MessagePackMiddleware)
+
+    from api.core.idempotency import IdempotencyMiddleware
+    # Au plus près des routes : seuls les headers de l'app sont conservés et rejoués,
+    # les middlewares externes ajoutent les leurs (request_id...) à chaque tentative
+    chain.append(IdempotencyMiddleware)
+
+    # add_middleware empile : le dernier ajouté est le plus externe
+    for middleware_class in reversed(chain):
+        app.add_middleware(middleware_class)
@@ -0,0 +1,103 @@
+"""
+Mise à niveau du schéma avant le démarrage de l'application (déploiement,
+``python scripts/migrate_db.py``, ``init_db.py``).
+
+L'historique Alembic ne contient pas de migration initiale : une base vide
+est créée par ``create_all`` (schéma des modèles, partitions de cleaning_logs
+comprises) puis enregistrée à la tête. Une base créée sans Alembic (ancien
+``init_db.py``) est enregistrée à la dernière révision dont son schéma porte
+la trace, puis migrée. Une base déjà versionnée est simplement migrée.
+
+Alembic n'est importé qu'ici : le démarrage de l'API ne fait que comparer les
+révisions (voir api/core/startup.py).
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[2]
+ALEMBIC_INI = ROOT / "alembic.ini"
+
+# Table présente dans toute base initialisée (vide sinon)
+SENTINEL_TABLE = "users"
+
+# Base non versionnée : trace laissée par chaque révision, de la plus récente à la plus ancienne
+UNVERSIONED_MARKERS = (
+    ("008_partition_cleaning_logs", "column", "cleaning_logs", "session_date"),
+    ("007_session_statistics", "column", "cleaning_sessions", "statistics"),
+    ("006_session_status_counters", "column", "cleaning_sessions", "total_count"),
+    ("005_index_updated_at", "index", "rooms", "ix_rooms_updated_at"),
+    ("004_cleaning_logs_updated_at", "column", "cleaning_logs", "updated_at"),
+)
+# Schéma des modèles avant les migrations 004+ (tables d'entreprise comprises)
+UNVERSIONED_BASE_REVISION = "003_add_enterprise_table"
+
+
+def alembic_config(connection: Optional[Connection] = None):
+    """Configuration d'alembic.ini, liée à ``connection`` si elle est fournie"""
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def unversioned_revision(connection: Connection) -> str:
+    """Révision correspondant au schéma d'une base créée sans Alembic"""
+    inspector = inspect(connection)
+    for revision, kind, table, name in UNVERSIONED_MARKERS:
+        if not inspector.has_table(table):
+            continue
+        if kind == "column":
+            present = name in {column["name"] for column in inspector.get_columns(table)}
+        else:
+            present = name in {index["name"] for index in inspector.get_indexes(table)}
+        if present:
+            return revision
+    return UNVERSIONED_BASE_REVISION
+
+
+def create_schema(connection: Connection):
+    """Schéma complet d'une base vide depuis les modèles"""
+    from sqlalchemy.orm import Session
+
+    import api.models  # noqa: F401  (enregistre toutes les tables)
+    from api.models.base import Base
+    from api.services.partition_service import ensure_log_partitions
+
+    Base.metadata.create_all(connection)
+    with Session(bind=connection) as db:
+        ensure_log_partitions(db)
+
+
+def upgrade_database(engine: Engine) -> str:
+    """
+    Crée ou migre le schéma jusqu'à la tête Alembic ; retourne ``"created"``,
+    ``"stamped+upgraded"`` (base créée sans Alembic) ou ``"upgraded"``.
+    """
+    from alembic import command
+
+    with engine.begin() as connection:
+        config = alembic_config(connection)
+        inspector = inspect(connection)
+        if not inspector.has_table("alembic_version"):
+            if not inspector.has_table(SENTINEL_TABLE):
+                logger.info("Base vide : création du schéma depuis les modèles")
+                create_schema(connection)
+                command.stamp(config, "head")
+                return "created"
+            revision = unversioned_revision(connection)
+            logger.info(f"Base créée sans Alembic : enregistrée à la révision {revision}")
+            command.stamp(config, revision)
+            command.upgrade(config, "head")
+            return "stamped+upgraded"
+        command.upgrade(config, "head")
+        return "upgraded"
@@ -0,0 +1,238 @@
+"""
+Négociation de contenu JSON / MessagePack.
+
+Un client qui envoie ``Accept: application/msgpack`` reçoit les réponses des
+routes encodées en MessagePack au lieu de JSON (réponse par défaut de l'app :
+``NegotiatedResponse``, un seul encodage, ``Vary: Accept``). Les erreurs
+restent en JSON.
+
+Sur les routes listées dans ``MSGPACK_BODY_ROUTES``, un body
+``Content-Type: application/msgpack`` est accepté : il est décodé et transmis
+à la route comme du JSON, la validation est inchangée.
+
+Conventions d'encodage (identiques au JSON, seul le conteneur change) :
+UUID en chaîne, date/datetime/time en chaîne ISO 8601, enums par valeur,
+Decimal en flottant. Aucun type d'extension MessagePack n'est utilisé.
+"""
+
+import json
+import re
+import uuid
+from contextvars import ContextVar
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Mapping, Optional, Tuple
+
+import msgpack
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = frozenset({MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"})
+JSON_MEDIA_TYPES = frozenset({"application/json", "application/*", "*/*"})
+
+# (méthode, chemin) des routes qui acceptent un body MessagePack
+MSGPACK_BODY_ROUTES: Tuple[Tuple[str, "re.Pattern[str]"], ...] = tuple(
+    (method, re.compile(pattern)) for method, pattern in (
+        ("POST", r"^/sessions/[^/]+/finalize$"),
+        ("PATCH", r"^/sessions/[^/]+/logs$"),
+    )
+)
+
+ENCODING_CONVENTIONS = (
+    "Réponse disponible en MessagePack avec `Accept: application/msgpack` : "
+    "mêmes champs qu'en JSON, UUID en chaîne, dates et heures en chaîne ISO 8601, "
+    "enums par valeur, aucun type d'extension."
+)
+
+# Format de réponse préféré par la requête en cours (posé par MessagePackMiddleware)
+_response_format: ContextVar[str] = ContextVar("response_format", default="json")
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """MessagePack demandé avec une qualité au moins égale à celle de JSON"""
+    if not accept:
+        return False
+    best_msgpack = best_json = 0.0
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            best_msgpack = max(best_msgpack, quality)
+        elif media_type in JSON_MEDIA_TYPES:
+            best_json = max(best_json, quality)
+    return best_msgpack > 0 and best_msgpack >= best_json
+
+
+def negotiated_format() -> str:
+    """Format de réponse de la requête en cours : ``json`` ou ``msgpack``"""
+    return _response_format.get()
+
+
+def accepts_msgpack_body(method: str, path: str) -> bool:
+    return any(method == route_method and pattern.match(path) for route_method, pattern in MSGPACK_BODY_ROUTES)
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type non sérialisable en MessagePack: {type(value).__name__}")
+
+
+def packb(content: Any) -> bytes:
+    return msgpack.packb(content, default=_encode_default, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    Réponse JSON, ou MessagePack si la requête en cours l'a demandé
+    (response class par défaut de l'application).
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.msgpack = media_type is None and negotiated_format() == "msgpack"
+        if self.msgpack:
+            media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, status_code, headers, media_type, background)
+        self.headers.append("Vary", "Accept")
+
+    def render(self, content: Any) -> bytes:
+        if self.msgpack:
+            return packb(content)
+        return super().render(content)
+
+
+class MessagePackMiddleware:
+    """Format de réponse d'après ``Accept`` ; bodies MessagePack convertis en JSON"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        token = _response_format.set(
+            "msgpack" if accepts_msgpack(headers.get(b"accept", b"").decode("latin-1")) else "json"
+        )
+        try:
+            content_type = headers.get(b"content-type", b"").split(b";")[0].strip().decode("latin-1").lower()
+            if content_type in MSGPACK_MEDIA_TYPES:
+                converted = await self._convert_body(scope, receive)
+                if isinstance(converted, JSONResponse):
+                    await converted(scope, receive, send)
+                    return
+                receive = converted
+            await self.app(scope, receive, send)
+        finally:
+            _response_format.reset(token)
+
+    async def _convert_body(self, scope: Scope, receive: Receive):
+        """
+        ``receive`` rejouant le body réencodé en JSON, ou la réponse d'erreur.
+        Les en-têtes sont remplacés dans le scope lui-même : la route résolue
+        par le routeur (``scope["route"]``) reste visible des middlewares
+        englobants (métriques, profileur).
+        """
+        if not accepts_msgpack_body(scope["method"], scope["path"]):
+            return JSONResponse(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                content={"detail": "Body MessagePack non accepté sur cette route"}
+            )
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        try:
+            body = json.dumps(unpackb(b"".join(chunks)), default=_encode_default).encode()
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": f"Body MessagePack invalide: {e}"}
+            )
+
+        scope["headers"] = [
+            *((name, value) for name, value in scope["headers"] if name not in (b"content-type", b"content-length")),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+        sent = False
+
+        async def replay() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
+
+
+# ===== DOCUMENTATION OPENAPI =====
+
+def document_msgpack(schema: dict) -> dict:
+    """Ajoute ``application/msgpack`` (même schéma) aux réponses et bodies JSON"""
+    for path, operations in schema.get("paths", {}).items():
+        for method, operation in operations.items():
+            for response in operation.get("responses", {}).values():
+                content = response.get("content", {})
+                if "application/json" in content and MSGPACK_MEDIA_TYPE not in content:
+                    content[MSGPACK_MEDIA_TYPE] = content["application/json"]
+                    response["description"] = f"{response.get('description', '')}\n\n{ENCODING_CONVENTIONS}".strip()
+            body = operation.get("requestBody", {}).get("content", {})
+            if "application/json" in body and accepts_msgpack_body(method.upper(), _example_path(path)):
+                body[MSGPACK_MEDIA_TYPE] = body["application/json"]
+    return schema
+
+
+def _example_path(path: str) -> str:
+    # /sessions/{session_id}/finalize -> /sessions/x/finalize (motifs de MSGPACK_BODY_ROUTES)
+    return re.sub(r"\{[^}]+\}", "x", path)
+
+
+def setup_content_negotiation(app: FastAPI) -> None:
+    """Documente MessagePack dans le schéma OpenAPI de l'application"""
+    build_openapi = app.openapi
+
+    def openapi() -> dict:
+        if app.openapi_schema is None:
+            app.openapi_schema = document_msgpack(build_openapi())
+        return app.openapi_schema
+
+    app.openapi = openapi
@@ -0,0 +1,212 @@
+"""
+Profilage des requêtes SQL par requête HTTP et détection des N+1.
+
+S'appuie sur les événements SQLAlchemy ``before_cursor_execute`` /
+``after_cursor_execute`` : chaque requête HTTP profilée compte ses requêtes SQL,
+le temps DB total et les "empreintes" de requêtes (SQL normalisé sans valeurs),
+ce qui permet de repérer une même forme de requête répétée N fois.
+
+En mode strict (``ORM_STRICT_LOADING``, activé dans les tests), tout
+chargement implicite d'une relation qui déclencherait une requête lève une
+erreur : chaque appelant doit choisir sa stratégie (``joinedload``,
+``selectinload``, ``contains_eager``).
+
+Usage en test:
+    with query_budget(max_queries=5, max_repeats=2) as stats:
+        get_overdue_tasks(db)
+"""
+
+import re
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session, raiseload
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+from api.core.middlewares import append_headers, get_request_id
+
+logger = logging.getLogger(__name__)
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+# Normalisation des requêtes en "forme" indépendante des valeurs
+_PARAM_RE = re.compile(r"%\(\w+\)s|\?|:\w+|\$\d+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACES_RE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Retourne la forme normalisée d'une requête SQL (valeurs remplacées par ?)"""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _PARAM_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("IN (?)", shape)
+    return _SPACES_RE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """Statistiques SQL collectées pendant une requête HTTP (ou un bloc de test)"""
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Formes de requêtes exécutées plus de ``threshold`` fois"""
+        return [(shape, n) for shape, n in self.fingerprints.most_common() if n > threshold]
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000
+
+    def server_timing(self) -> str:
+        """Valeur du header Server-Timing"""
+        return f'db;dur={self.total_time_ms:.1f};desc="{self.count} queries"'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+
+def install_query_profiler(engine: Engine):
+    """Branche les listeners de profilage sur un engine (idempotent)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Statistiques de la requête en cours, si le profilage est actif"""
+    return _current_stats.get()
+
+
+@contextmanager
+def profile_queries(request_id: Optional[str] = None) -> Iterator[QueryStats]:
+    """Collecte les requêtes SQL exécutées dans le bloc"""
+    stats = QueryStats(request_id)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Levée quand un bloc dépasse son budget de requêtes SQL"""
+
+
+@contextmanager
+def query_budget(
+    max_queries: Optional[int] = None,
+    max_repeats: Optional[int] = None
+) -> Iterator[QueryStats]:
+    """
+    Fait échouer un test si le bloc dépasse un nombre de requêtes SQL
+    ou répète une même forme de requête plus de ``max_repeats`` fois (N+1).
+    """
+    with profile_queries() as stats:
+        yield stats
+
+    if max_queries is not None and stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{stats.count} requêtes SQL exécutées (budget: {max_queries})\n"
+            + "\n".join(f"  {n}x {shape}" for shape, n in stats.fingerprints.most_common())
+        )
+    if max_repeats is not None:
+        repeated = stats.repeated(max_repeats)
+        if repeated:
+            raise QueryBudgetExceeded(
+                f"Requêtes répétées plus de {max_repeats} fois (N+1 probable):\n"
+                + "\n".join(f"  {n}x {shape}" for shape, n in repeated)
+            )
+
+
+class QueryProfilerMiddleware:
+    """
+    Profile les requêtes SQL de chaque requête HTTP : header Server-Timing
+    et warning quand une forme de requête se répète trop (N+1).
+    """
+
+    def __init__(self, app: ASGIApp, engine: Optional[Engine] = None, repeat_threshold: Optional[int] = None):
+        self.app = app
+        self.repeat_threshold = repeat_threshold or settings.query_profiler_repeat_threshold
+        if engine is None:
+            from api.core.database import engine
+        install_query_profiler(engine)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries(get_request_id(scope)) as stats:
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    append_headers(message, ((b"server-timing", stats.server_timing().encode("latin-1")),))
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        for shape, count in stats.repeated(self.repeat_threshold):
+            logger.warning(
+                f"N+1 probable: requête répétée {count} fois sur {scope['method']} {scope['path']}: {shape}",
+                extra={
+                    "request_id": stats.request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                }
+            )
+
+
+# ===== CHARGEMENT STRICT DES RELATIONS =====
+
+def _raise_on_lazy_load(orm_execute_state: ORMExecuteState):
+    """
+    do_orm_execute : les relations non chargées explicitement par la requête
+    lèvent une erreur au lieu d'émettre une requête par ligne (les accès
+    satisfaits par l'identity map restent permis).
+    """
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*", sql_only=True))
+
+
+def setup_strict_loading(session_class=Session):
+    """Active le mode strict (idempotent)"""
+    if not event.contains(session_class, "do_orm_execute", _raise_on_lazy_load):
+        event.listen(session_class, "do_orm_execute", _raise_on_lazy_load)
+
+
+def teardown_strict_loading(session_class=Session):
+    if event.contains(session_class, "do_orm_execute", _raise_on_lazy_load):
+        event.remove(session_class, "do_orm_execute", _raise_on_lazy_load)
+
@@ -0,0 +1,243 @@
+"""
+Profileur statistique par échantillonnage, utilisable en production.
+
+Pendant la durée demandée, la pile de chaque thread du worker est relevée à
+intervalle régulier et les piles identiques sont comptées. Aucun hook n'est
+posé sur les appels de fonction : le surcoût est proportionnel au nombre
+d'échantillons (quelques dizaines de µs chacun), pas au trafic.
+
+- Mode ``cpu`` : timer ``ITIMER_PROF`` / ``SIGPROF``, qui avance avec le
+  temps CPU du processus. Les threads au repos (boucle asyncio en attente,
+  threadpool vide) sont ignorés.
+- Mode ``wall`` : ``ITIMER_REAL`` / ``SIGALRM``, temps réel (attentes d'E/S
+  comprises).
+
+Les signaux ne peuvent être armés que depuis le thread principal (celui de la
+boucle asyncio sous uvicorn) ; ailleurs, ou sans ``setitimer``, un thread
+échantillonneur prend le relais (temps réel uniquement).
+
+Chaque échantillon est rattaché à la route de la requête en cours dans le
+thread : contexte de la tâche asyncio, ou contexte copié par le threadpool
+pour les routes synchrones (``current_request_scope``).
+"""
+
+import asyncio
+import contextvars
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.core.metrics import route_label
+from api.core.middlewares import current_request_scope
+
+# (fonction, fichier, ligne de définition)
+FrameInfo = Tuple[str, str, int]
+
+NO_REQUEST = "(hors requête)"
+
+# Feuilles de pile d'un thread au repos
+IDLE_FRAMES = frozenset([
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+])
+
+# Frames qui exécutent du code dans un contexte copié : Handle._run (asyncio)
+# et WorkerThread.run (threadpool anyio)
+CONTEXT_RUNNERS = frozenset(["_run", "run"])
+
+MODES = {
+    "cpu": ("SIGPROF", "ITIMER_PROF"),
+    "wall": ("SIGALRM", "ITIMER_REAL"),
+}
+
+
+@lru_cache(maxsize=4096)
+def short_filename(filename: str) -> str:
+    """Chemin relatif à l'entrée de sys.path la plus longue qui le contient"""
+    prefixes = [path for path in sys.path if path and filename.startswith(path.rstrip(os.sep) + os.sep)]
+    if not prefixes:
+        return filename
+    return os.path.relpath(filename, max(prefixes, key=len))
+
+
+def _frame_context(frame: FrameType) -> Optional[contextvars.Context]:
+    local_names = frame.f_locals
+    context = local_names.get("context")
+    if not isinstance(context, contextvars.Context):
+        context = getattr(local_names.get("self"), "_context", None)
+    return context if isinstance(context, contextvars.Context) else None
+
+
+def _route_tag(context: Optional[contextvars.Context]) -> str:
+    scope = context.get(current_request_scope) if context is not None else None
+    if scope is None:
+        return NO_REQUEST
+    return f"{scope['method']} {route_label(scope)}"
+
+
+class ProfilerBusy(RuntimeError):
+    """Un profilage est déjà en cours dans ce worker"""
+
+
+class SamplingProfiler:
+    """Relevé périodique des piles de tous les threads du worker"""
+
+    def __init__(self, interval: float = 0.01, mode: str = "cpu"):
+        if mode not in MODES:
+            raise ValueError(f"Mode de profilage inconnu: {mode}")
+        self.interval = interval
+        self.mode = mode
+        self.method: Optional[str] = None
+        self.samples = 0
+        self.duration = 0.0
+        # (route, pile de la racine à la feuille) -> nombre d'échantillons
+        self.stacks: Counter = Counter()
+        self._frame_infos: Dict[CodeType, FrameInfo] = {}
+        self._started_at = 0.0
+        self._previous_handler: Any = None
+        self._sampler_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ===== DÉMARRAGE / ARRÊT =====
+
+    def _signal_available(self) -> bool:
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        if self._signal_available():
+            signal_name, timer_name = MODES[self.mode]
+            self._previous_handler = signal.signal(getattr(signal, signal_name), self._handle_signal)
+            signal.setitimer(getattr(signal, timer_name), self.interval, self.interval)
+            self.method = "signal"
+        else:
+            self.mode = "wall"
+            self._sampler_thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._sampler_thread.start()
+            self.method = "thread"
+
+    def stop(self):
+        if self.method == "signal":
+            signal_name, timer_name = MODES[self.mode]
+            signal.setitimer(getattr(signal, timer_name), 0)
+            signal.signal(getattr(signal, signal_name), self._previous_handler)
+        elif self.method == "thread":
+            self._stop.set()
+            self._sampler_thread.join()
+        self.duration = time.perf_counter() - self._started_at
+
+    def _handle_signal(self, signum: int, frame: Optional[FrameType]):
+        self._sample(frame)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample(None)
+
+    # ===== ÉCHANTILLONNAGE =====
+
+    def _sample(self, interrupted: Optional[FrameType]):
+        current = threading.get_ident()
+        sampler = self._sampler_thread.ident if self._sampler_thread else None
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler:
+                continue
+            if thread_id == current and interrupted is not None:
+                # Gestionnaire de signal : la pile utile est celle qu'il a interrompue
+                frame = interrupted
+            sample = self._stack(frame)
+            if sample is not None:
+                self.stacks[sample] += 1
+        self.samples += 1
+
+    def _frame_info(self, code: CodeType) -> FrameInfo:
+        info = self._frame_infos.get(code)
+        if info is None:
+            info = self._frame_infos[code] = (code.co_name, short_filename(code.co_filename), code.co_firstlineno)
+        return info
+
+    def _stack(self, frame: FrameType) -> Optional[Tuple[str, Tuple[FrameInfo, ...]]]:
+        """(route, pile racine -> feuille), ``None`` pour un thread au repos"""
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        infos: List[FrameInfo] = []
+        context = None
+        while frame is not None:
+            infos.append(self._frame_info(frame.f_code))
+            if context is None and frame.f_code.co_name in CONTEXT_RUNNERS:
+                context = _frame_context(frame)
+            frame = frame.f_back
+        infos.reverse()
+        return _route_tag(context), tuple(infos)
+
+    # ===== EXPORTS =====
+
+    def collapsed(self) -> str:
+        """Piles repliées (``route;fonction (fichier:ligne);... nombre``), pour flamegraph.pl"""
+        lines = []
+        for (route, stack), count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({filename}:{line})" for name, filename, line in stack)
+            lines.append(f"{route.replace(';', ',')};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "cleaning-api") -> Dict[str, Any]:
+        """Profil au format speedscope (https://www.speedscope.app), un profil par route"""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[FrameInfo, int] = {}
+        by_route: Dict[str, List[Tuple[List[int], int]]] = defaultdict(list)
+        for (route, stack), count in self.stacks.items():
+            indexes = []
+            for info in stack:
+                if info not in frame_index:
+                    frame_index[info] = len(frames)
+                    frames.append({"name": info[0], "file": info[1], "line": info[2]})
+                indexes.append(frame_index[info])
+            by_route[route].append((indexes, count))
+
+        profiles = []
+        for route, samples in sorted(by_route.items(), key=lambda item: -sum(count for _, count in item[1])):
+            weights = [count * self.interval for _, count in samples]
+            profiles.append({
+                "type": "sampled",
+                "name": route,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": [indexes for indexes, _ in samples],
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{name} ({self.mode}, {self.samples} échantillons, {self.duration:.1f} s)",
+            "exporter": "api.core.sampling_profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+# Profilage en cours dans ce worker (un seul à la fois)
+_active: Optional[SamplingProfiler] = None
+
+
+async def profile_for(seconds: float, interval: float = 0.01, mode: str = "cpu") -> SamplingProfiler:
+    """Échantillonne le worker pendant ``seconds`` ; lève ProfilerBusy si un profilage tourne déjà"""
+    global _active
+    if _active is not None:
+        raise ProfilerBusy("Un profilage est déjà en cours sur ce worker")
+    profiler = _active = SamplingProfiler(interval, mode)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        _active = None
+    return profiler
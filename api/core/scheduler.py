@@ -1,6 +1,6 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from api.tasks.background_tasks import generate_daily_sessions
+from api.tasks.background_tasks import generate_daily_sessions, check_session_counters_job
 
 scheduler = AsyncIOScheduler()
 
@@ -12,3 +12,9 @@ def setup_scheduler():
         id="generate_sessions",
         replace_existing=True
     )
+    scheduler.add_job(
+        func=check_session_counters_job,
+        trigger=CronTrigger(hour=3, minute=0),
+        id="check_session_counters",
+        replace_existing=True
+    )
@@ -1,5 +1,7 @@
-import firebase_admin
-from firebase_admin import credentials, auth as firebase_auth
+import os
+from contextvars import ContextVar
+from threading import Lock
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
@@ -11,36 +13,75 @@ from api.models.user import User
 
 logger = logging.getLogger(__name__)
 
-# Initialisation Firebase
-if not firebase_admin._apps:
-    import os
+# Initialisation Firebase différée au premier token vérifié : firebase_admin
+# (et google-auth) ne sont importés qu'à ce moment, pas au démarrage
+_firebase_lock = Lock()
 
-    # Prioriser les variables d'environnement (production)
-    if (settings.firebase_project_id and
-        settings.firebase_private_key and
-        settings.firebase_client_email):
-        # Mode production avec variables d'environnement
-        firebase_config = {
-            "type": "service_account",
-            "project_id": settings.firebase_project_id,
-            "private_key": settings.firebase_private_key.replace('\\n', '\n'),
-            "client_email": settings.firebase_client_email,
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs"
-        }
-        cred = credentials.Certificate(firebase_config)
-    elif settings.firebase_credentials_path and os.path.exists(settings.firebase_credentials_path):
-        # Mode développement avec fichier JSON
-        cred = credentials.Certificate(settings.firebase_credentials_path)
-    else:
-        raise RuntimeError(
-            "Configuration Firebase manquante. "
-            "Définissez FIREBASE_PROJECT_ID, FIREBASE_PRIVATE_KEY et FIREBASE_CLIENT_EMAIL "
-            "ou placez firebase-credentials.json dans le répertoire racine."
-        )
+def init_firebase():
+    """Initialise Firebase Admin SDK (une fois) ; RuntimeError si la configuration manque"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _firebase_lock:
+        if firebase_admin._apps:
+            return
+
+        # Prioriser les variables d'environnement (production)
+        if (settings.firebase_project_id and
+            settings.firebase_private_key and
+            settings.firebase_client_email):
+            # Mode production avec variables d'environnement
+            firebase_config = {
+                "type": "service_account",
+                "project_id": settings.firebase_project_id,
+                "private_key": settings.firebase_private_key.replace('\\n', '\n'),
+                "client_email": settings.firebase_client_email,
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs"
+            }
+            cred = credentials.Certificate(firebase_config)
+        elif settings.firebase_credentials_path and os.path.exists(settings.firebase_credentials_path):
+            # Mode développement avec fichier JSON
+            cred = credentials.Certificate(settings.firebase_credentials_path)
+        else:
+            raise RuntimeError(
+                "Configuration Firebase manquante. "
+                "Définissez FIREBASE_PROJECT_ID, FIREBASE_PRIVATE_KEY et FIREBASE_CLIENT_EMAIL "
+                "ou placez firebase-credentials.json dans le répertoire racine."
+            )
+
+        firebase_admin.initialize_app(cred)
+
+def warm_up_firebase():
+    """Initialisation anticipée (en arrière-plan au démarrage) : erreurs journalisées, non levées"""
+    try:
+        init_firebase()
+        logger.info("✅ Firebase initialisé")
+    except Exception as e:
+        logger.error(f"❌ Firebase non initialisé: {e}")
+
+def verify_id_token(token: str) -> dict:
+    """Vérifie un token d'identification Firebase et retourne ses claims"""
+    init_firebase()
+    from firebase_admin import auth as firebase_auth
+
+    return firebase_auth.verify_id_token(token)
+
+# Token déjà vérifié pour la requête en cours (par le middleware d'idempotence,
+# avant la route) : l'authentification de la route ne le revérifie pas
+_verified_token: ContextVar[Optional[Tuple[str, dict]]] = ContextVar("verified_token", default=None)
 
-    firebase_admin.initialize_app(cred)
+def remember_verified_token(token: str, claims: dict):
+    """Mémorise les claims d'un token vérifié pour le reste de la requête"""
+    _verified_token.set((token, claims))
+
+def verify_request_token(token: str) -> dict:
+    """``verify_id_token``, sauf si ce même token a déjà été vérifié pour la requête"""
+    verified = _verified_token.get()
+    if verified is not None and verified[0] == token:
+        return verified[1]
+    return verify_id_token(token)
 
 security = HTTPBearer()
 
@@ -53,7 +94,7 @@ async def get_current_user(
         token = credentials.credentials
         logger.info(f"Token reçu: {token[:50]}...")
         
-        decoded_token = firebase_auth.verify_id_token(token)
+        decoded_token = verify_request_token(token)
         firebase_uid = decoded_token['uid']
         logger.info(f"Firebase UID décodé: {firebase_uid}")
         
@@ -67,6 +108,12 @@ async def get_current_user(
         
         logger.info(f"Utilisateur trouvé: {user.full_name} (ID: {user.id})")
         return user
+    except RuntimeError as e:
+        logger.error(f"Firebase indisponible: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentification indisponible"
+        )
     except Exception as e:
         logger.error(f"Erreur d'authentification: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,245 @@
+"""
+Coalescence des calculs coûteux (single-flight) et stale-while-revalidate.
+
+Les agrégats du tableau de bord et des statistiques de session sont demandés
+simultanément par toutes les tablettes en début de service. Un même calcul
+n'est exécuté qu'une fois :
+
+- par worker, les appelants concurrents attendent la même tâche asyncio ;
+- entre workers, un verrou Redis court (SET NX PX) désigne le worker qui
+  calcule, les autres attendent que le résultat apparaisse dans le cache.
+
+Les résultats sont stockés avec leur date de calcul et la version du
+namespace : une entrée trop vieille ou invalidée est servie immédiatement
+pendant qu'un seul rafraîchissement tourne en arrière-plan.
+
+Usage:
+    return await aggregates.get_or_compute(
+        CacheNamespace.SESSIONS, ("statistics", session_id),
+        lambda: with_session(lambda db: compute_statistics(db, session_id))
+    )
+"""
+
+import asyncio
+import contextvars
+import time
+import uuid
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from api.core.cache import cache
+from api.core.cancellation import CancellationToken, RequestCancelled, cancellable, current_token
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de scrutation du cache pendant qu'un autre worker calcule
+PEER_POLL_INTERVAL = 0.05
+
+# Compare-and-delete atomique : ne supprime le verrou que s'il porte encore notre jeton
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Partage le résultat d'un calcul en cours entre les appelants d'un worker"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._tokens: Dict[str, CancellationToken] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def _start(self, key: str, function: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        # Token propre au calcul partagé : l'annulation d'un appelant ne l'atteint pas
+        token = CancellationToken()
+        context = contextvars.copy_context()
+        context.run(current_token.set, token)
+        task = asyncio.get_running_loop().create_task(function(), context=context)
+        self._inflight[key] = task
+        self._tokens[key] = token
+
+        def done(_):
+            self._inflight.pop(key, None)
+            self._tokens.pop(key, None)
+
+        task.add_done_callback(done)
+        return task
+
+    async def do(self, key: str, function: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécute ``function`` une seule fois pour ``key`` ; les appels concurrents
+        reçoivent le même résultat (ou la même exception). Le calcul n'est
+        annulé que si tous ses appelants sont partis (requêtes annulées).
+        """
+        task = self._inflight.get(key) or self._start(key, function)
+        token = self._tokens.get(key)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # shield : la déconnexion d'un appelant n'annule pas le calcul partagé
+            return await cancellable(asyncio.shield(task))
+        except (asyncio.CancelledError, RequestCancelled):
+            if self._waiters[key] == 1 and not task.done():
+                # Dernier appelant parti : arrêter les requêtes SQL du calcul
+                token.cancel("abandoned")
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+
+def with_session(function: Callable[[Any], Any]) -> Any:
+    """
+    Exécute ``function(db)`` avec sa propre session : un rafraîchissement en
+    arrière-plan survit à la requête qui l'a déclenché (et à sa session).
+    """
+    from api.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return function(db)
+    finally:
+        db.close()
+
+
+class AggregateCache:
+    """Cache stale-while-revalidate des agrégats, avec coalescence des calculs"""
+
+    def __init__(self):
+        self.flight = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _key(namespace: str, parts: Tuple[Any, ...]) -> str:
+        return f"agg:{namespace}:" + ":".join(str(part) for part in parts)
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        parts: Tuple[Any, ...],
+        compute: Callable[[], Any],
+        fresh_ttl: Optional[int] = None
+    ) -> Any:
+        """
+        Retourne l'agrégat en cache s'il est frais ; s'il est périmé (âge ou
+        namespace invalidé), le retourne tout de suite et lance un seul
+        rafraîchissement ; sinon attend le calcul partagé.
+
+        ``compute`` est synchrone (requêtes SQL) et exécuté dans le threadpool.
+        """
+        fresh_ttl = fresh_ttl or settings.aggregate_fresh_ttl
+        if cache.invalidation_pending(namespace):
+            # Commit de ce worker pas encore visible dans Redis : pas d'agrégat antérieur
+            return await run_in_threadpool(compute)
+        key = self._key(namespace, parts)
+        version = await cache.anamespace_version(namespace)
+
+        entry = await cache.aget(key, local=False)
+        if entry is not None:
+            is_fresh = (
+                entry.get("version") == version
+                and time.time() - entry.get("computed_at", 0) < fresh_ttl
+            )
+            if not is_fresh and not self.flight.in_flight(key):
+                task = asyncio.ensure_future(self._refresh(key, version, compute))
+                self._background.add(task)
+                task.add_done_callback(self._background_done)
+            return entry["value"]
+
+        return await self._refresh(key, version, compute)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Erreur rafraîchissement agrégat: {task.exception()}")
+
+    async def _refresh(self, key: str, version: int, compute: Callable[[], Any]) -> Any:
+        return await self.flight.do(key, lambda: self._compute_and_store(key, version, compute))
+
+    async def _compute_and_store(self, key: str, version: int, compute: Callable[[], Any]) -> Any:
+        started_at = time.time()
+        token = await self._acquire_lock(key)
+
+        if token is None:
+            # Un autre worker calcule : attendre son résultat plutôt que recalculer
+            entry = await self._wait_for_peer(key, started_at)
+            if entry is not None:
+                return entry["value"]
+
+        try:
+            value = await run_in_threadpool(compute)
+            await cache.aset(
+                key,
+                {"value": value, "computed_at": time.time(), "version": version},
+                settings.aggregate_stale_ttl,
+                local=False
+            )
+            return value
+        finally:
+            if token is not None:
+                await self._release_lock(key, token)
+
+    # ===== VERROU INTER-WORKERS =====
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"lock:{key}"
+
+    async def _acquire_lock(self, key: str) -> Optional[str]:
+        """Jeton si ce worker doit calculer, ``None`` si un autre s'en charge"""
+        token = uuid.uuid4().hex
+        client = cache.async_client
+        if not client:
+            return token
+
+        try:
+            acquired = await client.set(
+                self._lock_key(key), token, nx=True, px=settings.aggregate_lock_ttl * 1000
+            )
+        except Exception as e:
+            logger.warning(f"Verrou agrégat indisponible: {e}")
+            return token
+        return token if acquired else None
+
+    async def _release_lock(self, key: str, token: str):
+        client = cache.async_client
+        if not client:
+            return
+
+        try:
+            # Ne pas libérer un verrou expiré puis repris par un autre worker
+            await client.eval(RELEASE_LOCK_SCRIPT, 1, self._lock_key(key), token)
+        except Exception as e:
+            logger.warning(f"Libération du verrou agrégat impossible: {e}")
+
+    async def _wait_for_peer(self, key: str, since: float) -> Optional[Dict[str, Any]]:
+        """Attend (au plus la durée du verrou) une entrée calculée après ``since``"""
+        client = cache.async_client
+        deadline = time.monotonic() + settings.aggregate_lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(PEER_POLL_INTERVAL)
+            try:
+                peer_done = client is None or not await client.exists(self._lock_key(key))
+            except Exception:
+                peer_done = True
+            entry = await cache.aget(key, local=False)
+            if entry is not None and entry.get("computed_at", 0) >= since:
+                return entry
+            if peer_done:
+                # Verrou relâché sans résultat (erreur chez le pair) : calculer nous-mêmes
+                return None
+        return None
+
+
+# Instance globale (une par worker)
+aggregates = AggregateCache()
@@ -0,0 +1,121 @@
+"""
+Sparse fieldsets (``?fields=id,name,status``) sur les listes.
+
+Les champs demandés sont validés contre le schéma de réponse, puis traduits
+en SELECT projeté (``load_only`` des seules colonnes utiles, jointures des
+seules relations demandées) et sérialisés par un modèle réduit à ces champs :
+un écran qui n'affiche que quelques colonnes ne charge ni ne sérialise le reste.
+``id`` est toujours inclus.
+
+Usage:
+    PERFORMER_FIELDS = SparseFieldset(Performer, PerformerResponse)
+
+    selected = PERFORMER_FIELDS.parse(fields)  # None : réponse complète
+    query = db.query(Performer).options(*PERFORMER_FIELDS.options(selected))
+    rows = [PERFORMER_FIELDS.serialize(p, selected) for p in query.all()]
+    return PERFORMER_FIELDS.response(rows, response)
+"""
+
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only
+from sqlalchemy.orm.attributes import QueryableAttribute
+
+from api.core.negotiation import NegotiatedResponse
+
+# Toujours retourné (clé des listes côté client)
+ALWAYS_INCLUDED = frozenset({"id"})
+
+Fields = FrozenSet[str]
+
+
+@lru_cache(maxsize=256)
+def partial_model(schema: Type[BaseModel], fields: Fields) -> Type[BaseModel]:
+    """Modèle dérivé de ``schema`` restreint à ``fields`` (mis en cache par combinaison)"""
+    return create_model(
+        f"{schema.__name__}Partial",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name])
+           for name in schema.model_fields if name in fields}
+    )
+
+
+class SparseFieldset:
+    """
+    Projection d'une liste d'entités ``model`` sur un sous-ensemble des champs
+    de ``schema``.
+
+    ``sources`` : pour un champ qui n'est ni une colonne ni une relation du
+    même nom, colonnes ORM et/ou options de chargement nécessaires.
+    ``getters`` : pour un champ qui n'est pas un attribut du même nom, fonction
+    calculant sa valeur depuis l'instance.
+    """
+
+    def __init__(
+        self,
+        model: Type[Any],
+        schema: Type[BaseModel],
+        sources: Optional[Dict[str, Sequence[Any]]] = None,
+        getters: Optional[Dict[str, Callable[[Any], Any]]] = None
+    ):
+        self.model = model
+        self.schema = schema
+        self.sources = sources or {}
+        self.getters = getters or {}
+        self.all_fields: Fields = frozenset(schema.model_fields)
+
+    def parse(self, fields: Optional[str]) -> Optional[Fields]:
+        """Champs demandés (None : réponse complète) ; 400 si un champ est inconnu"""
+        if fields is None or not fields.strip():
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - self.all_fields
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Champs inconnus: {', '.join(sorted(unknown))}. "
+                       f"Champs disponibles: {', '.join(sorted(self.all_fields))}"
+            )
+        return frozenset(requested) | ALWAYS_INCLUDED
+
+    def _sources(self, name: str) -> Sequence[Any]:
+        if name in self.sources:
+            return self.sources[name]
+        mapper = inspect(self.model)
+        if name in mapper.relationships:
+            return (joinedload(getattr(self.model, name)),)
+        return (getattr(self.model, name),)
+
+    def options(self, fields: Fields) -> List[Any]:
+        """``load_only`` des colonnes et chargement des relations nécessaires aux champs"""
+        columns, loaders = [], []
+        for name in sorted(fields):
+            for source in self._sources(name):
+                (columns if isinstance(source, QueryableAttribute) else loaders).append(source)
+        return [load_only(*columns), *loaders] if columns else loaders
+
+    def serialize(self, instance: Any, fields: Fields) -> Dict[str, Any]:
+        """Dictionnaire JSON des seuls champs demandés (aucun autre attribut n'est lu)"""
+        values = {
+            name: self.getters.get(name, attrgetter(name))(instance)
+            for name in self.schema.model_fields if name in fields
+        }
+        return partial_model(self.schema, fields).model_validate(values, from_attributes=True).model_dump(mode="json")
+
+    @staticmethod
+    def response(rows: List[Dict[str, Any]], response: Response) -> NegotiatedResponse:
+        """
+        Réponse directe, JSON ou MessagePack (le ``response_model`` complet
+        rejetterait une projection), reprenant les headers posés sur ``response`` (ETag...).
+        """
+        return NegotiatedResponse(content=rows, headers=dict(response.headers))
+
+    @staticmethod
+    def cache_key(fields: Fields) -> str:
+        """Partie de clé de cache propre à une projection"""
+        return ",".join(sorted(fields))
@@ -0,0 +1,123 @@
+"""
+Démarrage rapide : chronométrage des phases et vérification du schéma.
+
+Le démarrage n'exécute aucun DDL : la base est créée ou migrée avant, par
+``python scripts/migrate_db.py`` (commande du conteneur, voir
+api/core/migrations.py). Le lifespan compare seulement la révision
+enregistrée dans ``alembic_version`` (une requête) aux têtes des scripts de
+migration, lues directement dans ``alembic/versions`` sans importer Alembic.
+
+Chaque phase (imports, construction de l'app, vérification du schéma...) est
+chronométrée ; le détail est journalisé une fois l'application prête.
+"""
+
+import ast
+import logging
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Origine des mesures : premier import de ce module (en tête de api.main)
+PROCESS_START = time.perf_counter()
+
+VERSIONS_DIR = Path(__file__).resolve().parents[2] / "alembic" / "versions"
+
+# revision = '...' / down_revision: Union[str, None] = '...'
+_REVISION_LINE = re.compile(r"^(revision|down_revision)\s*(?::[^=]+)?=\s*(.+?)\s*$", re.MULTILINE)
+
+
+class StartupTimer:
+    """Durée de chaque phase du démarrage"""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+
+    def log(self):
+        total = time.perf_counter() - PROCESS_START
+        logger.info(f"⏱️ Application prête en {total * 1000:.0f} ms ({self.summary()})")
+
+
+# Instance globale (un démarrage par processus)
+startup_timer = StartupTimer()
+
+
+# ===== VÉRIFICATION DU SCHÉMA =====
+
+def alembic_heads(versions_dir: Path = VERSIONS_DIR) -> Set[str]:
+    """Révisions qui ne sont la ``down_revision`` d'aucune autre"""
+    revisions: Set[str] = set()
+    parents: Set[str] = set()
+    for path in versions_dir.glob("*.py"):
+        declared = dict(_REVISION_LINE.findall(path.read_text(encoding="utf-8")))
+        if "revision" not in declared:
+            continue
+        revisions.add(ast.literal_eval(declared["revision"]))
+        down_revision = ast.literal_eval(declared.get("down_revision", "None"))
+        if isinstance(down_revision, str):
+            parents.add(down_revision)
+        elif down_revision:
+            parents.update(down_revision)
+    return revisions - parents
+
+
+def database_revisions(engine) -> Set[str]:
+    """Révision(s) enregistrée(s) dans ``alembic_version`` (vide si la table n'existe pas)"""
+    from sqlalchemy import inspect, text
+
+    with engine.connect() as connection:
+        if not inspect(connection).has_table("alembic_version"):
+            return set()
+        return set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+
+
+def check_schema(engine, mode: str = "warn", versions_dir: Path = VERSIONS_DIR) -> Optional[str]:
+    """
+    Compare la révision de la base aux têtes Alembic. Retourne le problème
+    détecté (None si la base est à jour) ; ``mode="strict"`` lève une
+    RuntimeError au lieu de journaliser un avertissement, ``"off"`` ne vérifie rien.
+    """
+    from sqlalchemy.exc import DBAPIError
+
+    if mode == "off":
+        return None
+
+    heads = alembic_heads(versions_dir)
+    try:
+        current = database_revisions(engine)
+    except DBAPIError as e:
+        problem = f"base injoignable ({e.orig})"
+    else:
+        if not current:
+            problem = "base non versionnée par Alembic"
+        elif not current <= heads:
+            problem = f"base à la révision {', '.join(sorted(current))}, têtes {', '.join(sorted(heads))}"
+        else:
+            logger.info(f"✅ Schéma à jour (révision {', '.join(sorted(current))})")
+            return None
+
+    message = (
+        f"Schéma de base de données non vérifié ou pas à jour : {problem}. "
+        "Exécutez « python scripts/migrate_db.py »."
+    )
+    if mode == "strict":
+        raise RuntimeError(message)
+    logger.warning(f"⚠️ {message}")
+    return problem
@@ -0,0 +1,153 @@
+"""
+Parsing JSON incrémental d'un tableau dans un body de requête.
+
+``iter_json_array(request.stream(), "task_statuses")`` produit un à un les
+éléments du tableau ``task_statuses`` de l'objet racine, à mesure que les
+chunks arrivent : seul l'élément en cours de décodage est gardé en mémoire
+(plus le chunk courant), jamais le document entier. Les autres clés de
+l'objet racine sont décodées puis ignorées.
+
+Chaque élément est décodé par ``json.JSONDecoder.raw_decode`` ; une erreur de
+syntaxe lève ``json.JSONDecodeError`` (position relative au buffer courant).
+"""
+
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, List, Type, TypeVar
+
+from pydantic import BaseModel
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+T = TypeVar("T")
+
+
+class _StreamBuffer:
+    """Texte décodé pas encore consommé, complété chunk par chunk"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks.__aiter__()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    async def fill(self) -> bool:
+        """Ajoute le chunk suivant (en abandonnant le texte consommé) ; False en fin de body"""
+        if self.exhausted:
+            return False
+        try:
+            chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            self.exhausted = True
+            chunk, final = b"", True
+        else:
+            final = False
+        self.text = self.text[self.pos:] + self.utf8.decode(chunk, final=final)
+        self.pos = 0
+        return True
+
+    async def peek(self) -> str:
+        """Prochain caractère significatif (non consommé)"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not await self.fill():
+                raise json.JSONDecodeError("Fin de body inattendue", self.text, self.pos)
+
+    async def expect(self, *characters: str) -> str:
+        character = await self.peek()
+        if character not in characters:
+            raise json.JSONDecodeError(f"Attendu {' ou '.join(characters)}", self.text, self.pos)
+        self.pos += 1
+        return character
+
+    async def value(self) -> Any:
+        """Valeur JSON complète suivante"""
+        await self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not await self.fill():
+                    raise
+                continue
+            # Un nombre en fin de buffer peut se poursuivre dans le chunk suivant
+            if end == len(self.text) and isinstance(value, (int, float)) and not self.exhausted:
+                await self.fill()
+                continue
+            self.pos = end
+            return value
+
+    async def end(self):
+        """Seuls des espaces peuvent suivre la valeur racine"""
+        while True:
+            if self.text[self.pos:].strip(_WHITESPACE):
+                raise json.JSONDecodeError("Données après la fin du document", self.text, self.pos)
+            self.pos = len(self.text)
+            if not await self.fill():
+                return
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: str) -> AsyncIterator[Any]:
+    """Éléments du tableau ``key`` de l'objet JSON racine, au fil de la lecture"""
+    buffer = _StreamBuffer(chunks)
+    await buffer.expect("{")
+    if await buffer.peek() == "}":
+        buffer.pos += 1
+    else:
+        while True:
+            name = await buffer.value()
+            if not isinstance(name, str):
+                raise json.JSONDecodeError("Clé attendue", buffer.text, buffer.pos)
+            await buffer.expect(":")
+            if name == key:
+                await buffer.expect("[")
+                if await buffer.peek() == "]":
+                    buffer.pos += 1
+                else:
+                    while True:
+                        yield await buffer.value()
+                        if await buffer.expect(",", "]") == "]":
+                            break
+            else:
+                await buffer.value()
+            if await buffer.expect(",", "}") == "}":
+                break
+    await buffer.end()
+
+
+async def iter_batches(items: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    """Regroupe un flux d'éléments en lots d'au plus ``size``"""
+    batch: List[T] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def openapi_request_body(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    ``openapi_extra`` documentant un body JSON lu directement depuis la requête
+    (sans paramètre de body FastAPI) : schéma de ``model`` avec ses
+    sous-modèles développés en place.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {name: resolve(value) for name, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": resolve(schema)}}}}
@@ -1,13 +1,19 @@
 # main.py - CORRECTION DES DOUBLES PREFIXES ET TAGS
+from api.core.startup import PROCESS_START, check_schema, startup_timer  # En premier : origine des mesures
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+import time
+from contextlib import asynccontextmanager, suppress
 
 from api.core.config import settings
 from api.core.database import engine
-from api.models import Base
+from api.core.middlewares import setup_middlewares
+from api.core.cache import cache, setup_cache_invalidation
+from api.core.negotiation import NegotiatedResponse, setup_content_negotiation
+from api.services.session_service import setup_session_counters
 
 # Import des routers
 from api.routers import (
@@ -20,10 +26,17 @@ from api.routers import (
     exports,        # Exports PDF/ZIP
     dashboard,      # ✅ Corrigé: plus de double prefix
     uploads,        # Upload d'images local storage
-    static          # Servir les fichiers statiques
+    static,         # Servir les fichiers statiques
+    metrics,        # Métriques Prometheus
+    profiling,      # Profilage en production
+    sync            # Synchronisation différentielle (mobile)
 )
 from api.routers import enterprise  # Import direct du routeur enterprise
 
+# Les dépendances lourdes (firebase_admin, Pillow, ReportLab, bleach, APScheduler)
+# sont importées au premier usage, pas ici
+startup_timer.record("imports", time.perf_counter() - PROCESS_START)
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -37,14 +50,57 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Démarrage de l'API Cleaning...")
     
-    # Créer les tables si elles n'existent pas
-    Base.metadata.create_all(bind=engine)
-    logger.info("✅ Base de données initialisée")
+    # Pas de DDL au démarrage : la révision Alembic de la base est seulement vérifiée
+    with startup_timer.phase("schema"):
+        check_schema(engine, settings.startup_schema_check)
+    
+    # Abonnements Redis : invalidations du cache local et progression des sessions (SSE)
+    listeners = []
+    with startup_timer.phase("listeners"):
+        if settings.redis_url:
+            from api.core.events import session_events
+            listeners.append(asyncio.create_task(cache.listen_for_invalidations()))
+            listeners.append(asyncio.create_task(session_events.listen()))
+    
+    # Partitions mensuelles de cleaning_logs créées à l'avance, scheduler actif ou non
+    if settings.log_partition_check_interval > 0:
+        from api.tasks.background_tasks import maintain_log_partitions
+        listeners.append(asyncio.create_task(maintain_log_partitions(settings.log_partition_check_interval)))
+    
+    # Tâches planifiées (sessions quotidiennes, cohérence des compteurs)
+    if settings.enable_scheduler:
+        with startup_timer.phase("scheduler"):
+            from api.core.scheduler import scheduler, setup_scheduler
+            setup_scheduler()
+            scheduler.start()
+    
+    # Firebase initialisé en arrière-plan : prêt pour la première requête
+    # authentifiée sans retarder la disponibilité de l'instance
+    from api.core.security import warm_up_firebase
+    listeners.append(asyncio.create_task(asyncio.to_thread(warm_up_firebase)))
+    
+    # Relevé périodique RSS / ramasse-miettes exposé sur /metrics
+    if settings.metrics_enabled and settings.memory_sample_interval > 0:
+        from api.core.memory import memory_sampler
+        listeners.append(asyncio.create_task(memory_sampler.run(settings.memory_sample_interval)))
+    
+    startup_timer.log()
     
     yield
     
     # Shutdown
     logger.info("🛑 Arrêt de l'API Cleaning...")
+    if settings.enable_scheduler:
+        scheduler.shutdown(wait=False)
+    for listener in listeners:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    # Invalidations de cache et événements des derniers commits encore en vol
+    await cache.drain()
+    if settings.redis_url:
+        from api.core.events import session_events
+        await session_events.drain()
 
 def create_app() -> FastAPI:
     """Factory pour créer l'application FastAPI"""
@@ -67,6 +123,7 @@ def create_app() -> FastAPI:
         """,
         version="2.0.0",
         lifespan=lifespan,
+        default_response_class=NegotiatedResponse,  # JSON ou MessagePack selon Accept
         docs_url="/docs",
         redoc_url="/redoc"
     )
@@ -89,6 +146,23 @@ def create_app() -> FastAPI:
             allowed_hosts=settings.allowed_hosts_list
         )
     
+    # Request ID, timing, logs, headers de sécurité, erreurs (ASGI pur)
+    setup_middlewares(app)
+    
+    # MessagePack documenté à côté de JSON dans le schéma OpenAPI
+    setup_content_negotiation(app)
+    
+    # Invalidation du cache des données de référence à chaque commit
+    setup_cache_invalidation()
+    
+    # Compteurs de statut des sessions maintenus à chaque flush des logs
+    setup_session_counters()
+    
+    # Mode strict : tout chargement implicite de relation lève une erreur
+    if settings.orm_strict_loading:
+        from api.core.query_profiler import setup_strict_loading
+        setup_strict_loading()
+    
     # ===== ROUTES D'AUTHENTIFICATION =====
     # ✅ CORRIGÉ: auth.router n'a plus de tags, on les gère ici
     app.include_router(
@@ -130,6 +204,13 @@ def create_app() -> FastAPI:
         tags=["🧹 Sessions"]
     )
     
+    # ===== SYNCHRONISATION MOBILE =====
+    app.include_router(
+        sync.router,
+        prefix="/sync",
+        tags=["🔄 Synchronisation"]
+    )
+    
     # ===== LOGS ET EXPORTS =====
     app.include_router(
         logs.router, 
@@ -172,6 +253,16 @@ def create_app() -> FastAPI:
         tags=["📁 Fichiers statiques"]
     )
     
+    # ===== MÉTRIQUES =====
+    if settings.metrics_enabled:
+        from api.core.metrics import register_db_pool_metrics
+        register_db_pool_metrics(engine)
+        app.include_router(metrics.router, tags=["📊 Métriques"])
+    
+    # ===== PROFILAGE =====
+    if settings.profiling_enabled:
+        app.include_router(profiling.router, prefix="/debug", tags=["🔬 Profilage"])
+    
     # ===== ROUTES DE BASE =====
     
     @app.get("/", tags=["🏠 Accueil"])
@@ -224,7 +315,8 @@ def create_app() -> FastAPI:
     return app
 
 # Créer l'instance de l'application
-app = create_app()
+with startup_timer.phase("create_app"):
+    app = create_app()
 
 # Point d'entrée pour uvicorn
 if __name__ == "__main__":
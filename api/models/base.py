@@ -38,7 +38,8 @@ class TimestampedModel(BaseModel):
         DateTime(timezone=True), 
         server_default=func.now(),
         onupdate=func.now(),
-        nullable=True
+        nullable=True,
+        index=True  # Synchronisation différentielle (updated_at > jeton)
     )
     
     def __repr__(self):
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Date, Text, Enum, ForeignKey, JSON, DateTime
+from sqlalchemy import DDL, Column, Date, Text, Enum, ForeignKey, JSON, DateTime, Index, Integer, PrimaryKeyConstraint, event, select
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
-from datetime import datetime
+from datetime import date, datetime
+import uuid
 from api.models.base import BaseModel, TimestampedModel
 
 class SessionStatus(PyEnum):
@@ -23,17 +24,45 @@ class CleaningSession(TimestampedModel):
     status = Column(Enum(SessionStatus), default=SessionStatus.EN_COURS)
     notes = Column(Text)
     
+    # Compteurs de logs par statut, maintenus par deltas atomiques à chaque flush
+    # (voir api/services/session_service.py) : le statut en est dérivé en SQL
+    fait_count = Column(Integer, default=0, server_default="0", nullable=False)
+    partiel_count = Column(Integer, default=0, server_default="0", nullable=False)
+    reporte_count = Column(Integer, default=0, server_default="0", nullable=False)
+    impossible_count = Column(Integer, default=0, server_default="0", nullable=False)
+    total_count = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    # Statistiques figées d'une session complétée (effacées dès qu'un log change
+    # ou que la session est rouverte)
+    statistics = Column(JSON, nullable=True)
+    
     # Relations
     logs = relationship("CleaningLog", back_populates="session", cascade="all, delete-orphan")
     exports = relationship("Export", back_populates="session", cascade="all, delete-orphan")
 
-class CleaningLog(BaseModel):
+class CleaningLog(TimestampedModel):
     __tablename__ = "cleaning_logs"
+    __table_args__ = (
+        # Table partitionnée par mois sur la date de session (voir
+        # api/services/partition_service.py) : la clé primaire inclut la clé de partition
+        PrimaryKeyConstraint("id", "session_date"),
+        # Validateur ETag des logs d'une session (count + max(updated_at)) servi par l'index
+        Index("ix_cleaning_logs_session_id_updated_at", "session_id", "updated_at"),
+        {"postgresql_partition_by": "RANGE (session_date)"},
+    )
+    # L'identité ORM reste l'id seul
+    __mapper_args__ = {"primary_key": ["id"]}
+    
+    # Pas de contrainte UNIQUE sur l'id seul (interdite sur une table partitionnée)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4, nullable=False)
     
     # Clés étrangères avec le bon type UUID
     session_id = Column(UUID(as_uuid=True), ForeignKey("cleaning_sessions.id"), index=True)
     assigned_task_id = Column(UUID(as_uuid=True), ForeignKey("assigned_tasks.id"))
     
+    # Date de la session, dénormalisée : clé de partition, renseignée à l'insertion
+    session_date = Column(Date, nullable=False, index=True)
+    
     # Qui a fait la tâche et qui l'a enregistrée
     performed_by_id = Column(UUID(as_uuid=True), ForeignKey("performers.id"), index=True)
     recorded_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -49,4 +78,30 @@ class CleaningLog(BaseModel):
     session = relationship("CleaningSession", back_populates="logs")
     assigned_task = relationship("AssignedTask", backref="logs")
     performed_by = relationship("Performer", backref="performed_logs")
-    recorded_by = relationship("User", backref="recorded_logs")
\ No newline at end of file
+    recorded_by = relationship("User", backref="recorded_logs")
+
+@event.listens_for(CleaningLog, "before_insert")
+def _set_log_session_date(mapper, connection, log: CleaningLog):
+    """Date de la session du log (clé de partition de cleaning_logs), requise par la clé primaire"""
+    if log.session_date is not None:
+        return
+    session = log.__dict__.get("session")
+    if session is not None and session.date is not None:
+        log.session_date = session.date
+    elif log.session_id is not None:
+        log.session_date = connection.execute(
+            select(CleaningSession.date).where(CleaningSession.id == log.session_id)
+        ).scalar()
+    if log.session_date is None:
+        # Log sans session : rangé dans le mois de sa création
+        log.session_date = date.today()
+
+# Schéma créé par create_all (init_db.py) : partition DEFAULT comme dans la
+# migration 008, un log hors des partitions mensuelles n'échoue jamais à l'insertion
+event.listen(
+    CleaningLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS cleaning_logs_default PARTITION OF cleaning_logs DEFAULT").execute_if(
+        dialect="postgresql"
+    )
+)
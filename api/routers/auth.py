@@ -4,15 +4,13 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-import firebase_admin
-from firebase_admin import auth as firebase_auth
 import logging
 
 from api.core.database import get_db
 from api.models.user import User, UserRole
 from api.schemas.user import UserResponse
 # Import de get_current_user depuis security.py pour éviter la duplication
-from api.core.security import get_current_user
+from api.core.security import get_current_user, verify_id_token
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +38,14 @@ class RegisterRequest(BaseModel):
 async def verify_firebase_token(id_token: str) -> dict:
     """Vérifie un token Firebase et retourne les claims"""
     try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        decoded_token = verify_id_token(id_token)
         return decoded_token
+    except RuntimeError as e:
+        logger.error(f"Firebase indisponible: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentification indisponible"
+        )
     except Exception as e:
         logger.error(f"Erreur vérification token Firebase: {e}")
         raise HTTPException(
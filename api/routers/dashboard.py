@@ -6,24 +6,45 @@ from sqlalchemy import and_, func
 from datetime import date, datetime, timedelta
 from typing import Dict, Any, List
 
-from api.core.database import get_db
+from api.core.cache import CacheNamespace
 from api.core.security import get_current_user
+from api.core.single_flight import aggregates, with_session
 from api.models.user import User
 from api.models.session import CleaningSession, CleaningLog, SessionStatus, LogStatus
-from api.models.task import AssignedTask
+from api.models.task import AssignedTask, TaskTemplate
 from api.models.performer import Performer
+from api.models.room import Room
 
 # ✅ CORRIGÉ: Supprimer les tags ici car ils sont gérés dans main.py
 router = APIRouter()
 
 @router.get("")
 async def get_dashboard_data(
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """Récupère toutes les données pour le tableau de bord principal."""
-    
     today = date.today()
+    return await aggregates.get_or_compute(
+        CacheNamespace.SESSIONS,
+        ("dashboard", today.isoformat()),
+        lambda: with_session(lambda db: compute_dashboard_data(db, today))
+    )
+
+@router.get("/metrics")
+async def get_metrics(
+    period: str = Query("week", regex="^(day|week|month|year)$"),
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Récupère les métriques selon la période demandée."""
+    today = date.today()
+    return await aggregates.get_or_compute(
+        CacheNamespace.SESSIONS,
+        ("dashboard_metrics", period, today.isoformat()),
+        lambda: with_session(lambda db: compute_metrics(db, period, today))
+    )
+
+def compute_dashboard_data(db: Session, today: date) -> Dict[str, Any]:
+    """Calcule les agrégats du tableau de bord (partagé entre appelants concurrents)"""
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
@@ -32,18 +53,15 @@ async def get_dashboard_data(
         CleaningSession.date == today
     ).first()
     
+    # Les compteurs de statut de chaque session évitent de charger ses logs
     today_stats = None
     if today_session:
-        logs = db.query(CleaningLog).filter(
-            CleaningLog.session_id == today_session.id
-        ).all()
-        
         today_stats = {
             "session_id": str(today_session.id),
             "status": today_session.status.value,
-            "total_tasks": len(logs),
-            "completed": len([l for l in logs if l.status == LogStatus.FAIT]),
-            "pending": len([l for l in logs if l.status == LogStatus.REPORTE]),
+            "total_tasks": today_session.total_count,
+            "completed": today_session.fait_count,
+            "pending": today_session.reporte_count,
             "completion_rate": 0
         }
         
@@ -67,98 +85,79 @@ async def get_dashboard_data(
     
     completion_rates = []
     for session in week_sessions:
-        logs = db.query(CleaningLog).filter(CleaningLog.session_id == session.id).all()
-        week_stats["total_tasks"] += len(logs)
-        completed = len([l for l in logs if l.status == LogStatus.FAIT])
-        week_stats["completed_tasks"] += completed
+        week_stats["total_tasks"] += session.total_count
+        week_stats["completed_tasks"] += session.fait_count
         
-        if logs:
-            completion_rates.append((completed / len(logs)) * 100)
+        if session.total_count:
+            completion_rates.append((session.fait_count / session.total_count) * 100)
     
     if completion_rates:
         week_stats["average_completion_rate"] = round(
             sum(completion_rates) / len(completion_rates), 1
         )
     
-    # Top performers du mois
-    month_logs = db.query(CleaningLog).join(CleaningSession).filter(
-        and_(
-            CleaningSession.date >= month_ago,
-            CleaningLog.status == LogStatus.FAIT
-        )
-    ).all()
-    
-    performer_counts = {}
-    for log in month_logs:
-        if log.performed_by_id:
-            if log.performed_by_id not in performer_counts:
-                performer_counts[log.performed_by_id] = 0
-            performer_counts[log.performed_by_id] += 1
-    
-    top_performers = []
-    for performer_id, count in sorted(
-        performer_counts.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]:
-        performer = db.query(Performer).filter(Performer.id == performer_id).first()
-        if performer:
-            top_performers.append({
-                "id": str(performer_id),
-                "name": performer.name,
-                "tasks_completed": count
-            })
+    # Top performers du mois (session_date : seules les partitions du mois sont lues)
+    tasks_completed = func.count(CleaningLog.id)
+    top_performers = [
+        {
+            "id": str(performer_id),
+            "name": name,
+            "tasks_completed": count
+        }
+        for performer_id, name, count in db.query(
+            Performer.id, Performer.name, tasks_completed
+        ).join(
+            CleaningLog, CleaningLog.performed_by_id == Performer.id
+        ).filter(
+            and_(
+                CleaningLog.session_date >= month_ago,
+                CleaningLog.status == LogStatus.FAIT
+            )
+        ).group_by(Performer.id, Performer.name).order_by(tasks_completed.desc()).limit(5).all()
+    ]
     
-    # Tâches les plus reportées
+    # Tâches les plus reportées (noms de tâche et de pièce joints dans la même requête)
+    postpone_count = func.count(CleaningLog.id)
     postponed_tasks = db.query(
-        AssignedTask.id,
-        AssignedTask.task_template_id,
-        func.count(CleaningLog.id).label('postpone_count')
-    ).join(
+        TaskTemplate.name,
+        Room.name,
+        postpone_count
+    ).select_from(AssignedTask).join(
         CleaningLog,
         AssignedTask.id == CleaningLog.assigned_task_id
     ).join(
-        CleaningSession,
-        CleaningLog.session_id == CleaningSession.id
+        TaskTemplate, TaskTemplate.id == AssignedTask.task_template_id
+    ).join(
+        Room, Room.id == AssignedTask.room_id
     ).filter(
         and_(
-            CleaningSession.date >= week_ago,
+            CleaningLog.session_date >= week_ago,
             CleaningLog.status == LogStatus.REPORTE
         )
     ).group_by(
         AssignedTask.id,
-        AssignedTask.task_template_id
+        TaskTemplate.name,
+        Room.name
     ).order_by(
-        func.count(CleaningLog.id).desc()
+        postpone_count.desc()
     ).limit(5).all()
     
-    from sqlalchemy.orm import joinedload
-    
-    most_postponed = []
-    for task in postponed_tasks:
-        assigned_task = db.query(AssignedTask).options(
-            joinedload(AssignedTask.task_template),
-            joinedload(AssignedTask.room)
-        ).filter(AssignedTask.id == task.id).first()
-        
-        if assigned_task:
-            most_postponed.append({
-                "task_name": assigned_task.task_template.name,
-                "room_name": assigned_task.room.name,
-                "postpone_count": task.postpone_count
-            })
+    most_postponed = [
+        {
+            "task_name": task_name,
+            "room_name": room_name,
+            "postpone_count": count
+        }
+        for task_name, room_name, count in postponed_tasks
+    ]
     
     # Sessions récentes
     recent_sessions = []
     for session in db.query(CleaningSession).order_by(
         CleaningSession.date.desc()
     ).limit(7).all():
-        logs = db.query(CleaningLog).filter(
-            CleaningLog.session_id == session.id
-        ).all()
-        
-        completed = len([l for l in logs if l.status == LogStatus.FAIT])
-        total = len(logs)
+        completed = session.fait_count
+        total = session.total_count
         
         recent_sessions.append({
             "id": str(session.id),
@@ -177,16 +176,8 @@ async def get_dashboard_data(
         "last_updated": datetime.utcnow().isoformat()
     }
 
-@router.get("/metrics")
-async def get_metrics(
-    period: str = Query("week", regex="^(day|week|month|year)$"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-) -> Dict[str, Any]:
-    """Récupère les métriques selon la période demandée."""
-    
-    today = date.today()
-    
+def compute_metrics(db: Session, period: str, today: date) -> Dict[str, Any]:
+    """Calcule les métriques de la période (partagé entre appelants concurrents)"""
     if period == "day":
         start_date = today
     elif period == "week":
@@ -202,12 +193,8 @@ async def get_metrics(
     
     daily_metrics = []
     for session in sessions:
-        logs = db.query(CleaningLog).filter(
-            CleaningLog.session_id == session.id
-        ).all()
-        
-        completed = len([l for l in logs if l.status == LogStatus.FAIT])
-        total = len(logs)
+        completed = session.fait_count
+        total = session.total_count
         
         daily_metrics.append({
             "date": session.date.isoformat(),
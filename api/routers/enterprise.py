@@ -7,6 +7,7 @@ import logging
 
 from api.core.database import get_db
 from api.core.security import get_current_user
+from api.core.cache import cache, CacheNamespace
 from api.models.user import User
 from api.models.enterprise import Enterprise
 from api.schemas.enterprise import (
@@ -48,20 +49,26 @@ async def get_my_enterprise_basic_info(
     """
     Récupérer les informations de base de l'entreprise (nom, logo) pour le header
     """
-    enterprise = db.query(Enterprise).filter(
-        Enterprise.user_id == current_user.id
-    ).first()
+    def load_basic_info():
+        enterprise = db.query(Enterprise).filter(
+            Enterprise.user_id == current_user.id
+        ).first()
+        if not enterprise:
+            return None
+        return EnterpriseBasicInfo(
+            name=enterprise.name,
+            logo_url=enterprise.logo_url
+        ).model_dump(mode="json")
     
-    if not enterprise:
+    basic_info = await cache.aget_or_set(CacheNamespace.ENTERPRISE, ("basic", current_user.id), load_basic_info)
+    
+    if basic_info is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Aucune entreprise associée à cet utilisateur"
         )
     
-    return EnterpriseBasicInfo(
-        name=enterprise.name,
-        logo_url=enterprise.logo_url
-    )
+    return basic_info
 
 @router.post("/", response_model=EnterpriseResponse, status_code=status.HTTP_201_CREATED)
 async def create_enterprise(
@@ -2,12 +2,15 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from api.core.cancellation import RequestCancelled, check_cancelled
 from api.core.database import get_db
 from api.core.security import get_current_user
 from api.models.user import User
 from api.models.session import CleaningSession, CleaningLog
 from api.models.export import Export
 from api.services.export_service import generate_pdf_report_task, generate_zip_photos_task
+from api.services.session_service import LOG_RELATIONS
+from api.core.metrics import export_jobs_queued
 import os
 
 router = APIRouter()
@@ -23,6 +26,7 @@ async def generate_pdf_report(
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
+    export_jobs_queued.inc(type="pdf")
     background_tasks.add_task(generate_pdf_report_task, session_id)
     return {"message": "Génération du PDF en cours"}
 
@@ -37,11 +41,12 @@ async def generate_zip_photos(
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
+    export_jobs_queued.inc(type="zip")
     background_tasks.add_task(generate_zip_photos_task, session_id)
     return {"message": "Génération du ZIP en cours"}
 
 @router.post("/pdf/{session_id}/download")
-async def generate_and_download_pdf(
+def generate_and_download_pdf(
     session_id: uuid.UUID,
     include_photos: bool = True,
     max_photos: int = 10,
@@ -49,11 +54,18 @@ async def generate_and_download_pdf(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Génère et télécharge immédiatement le PDF d'une session"""
+    """
+    Génère et télécharge immédiatement le PDF d'une session.
+
+    Exécuté dans le threadpool (requêtes SQL, téléchargements et rendu
+    bloquants) ; si le client se déconnecte ou que le délai de la route est
+    dépassé, la génération s'arrête au prochain point d'arrêt (photo, page).
+    """
     import tempfile
     import os
     from datetime import datetime
 
+    tmp_file_path = None
     try:
         # Vérifier que la session existe
         session = db.query(CleaningSession).filter(CleaningSession.id == session_id).first()
@@ -61,7 +73,7 @@ async def generate_and_download_pdf(
             raise HTTPException(status_code=404, detail="Session non trouvée")
 
         # Récupérer les logs de manière simple
-        logs = db.query(CleaningLog).filter(
+        logs = db.query(CleaningLog).options(*LOG_RELATIONS).filter(
             CleaningLog.session_id == session_id
         ).all()
 
@@ -407,6 +419,7 @@ async def generate_and_download_pdf(
                 # Utiliser le paramètre max_photos
 
                 for photo_data in all_photos[:max_photos]:
+                    check_cancelled()
                     try:
                         # Télécharger l'image depuis Firebase
                         response = requests.get(photo_data['url'], timeout=10)
@@ -495,8 +508,12 @@ async def generate_and_download_pdf(
                 footer_style
             ))
 
-            # Construire le PDF
-            doc.build(story)
+            # Construire le PDF (interrompu entre deux pages si la requête est annulée)
+            doc.build(
+                story,
+                onFirstPage=lambda canvas, document: check_cancelled(),
+                onLaterPages=lambda canvas, document: check_cancelled()
+            )
 
             # Nom de fichier avec date et options
             try:
@@ -530,6 +547,11 @@ async def generate_and_download_pdf(
         except ImportError as import_error:
             raise HTTPException(status_code=500, detail=f"ReportLab non installé: {str(import_error)}")
 
+    except RequestCancelled:
+        # Requête abandonnée : supprimer le PDF partiel
+        if tmp_file_path and os.path.exists(tmp_file_path):
+            os.unlink(tmp_file_path)
+        raise
     except HTTPException:
         raise
     except Exception as e:
@@ -1,15 +1,19 @@
 import uuid
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, File, Query, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from api.core.database import get_db
 from api.core.security import get_current_user
 from api.core.config import settings
+from api.core.sparse_fields import SparseFieldset
 from api.models.user import User
 from api.models.session import CleaningLog, CleaningSession, LogStatus, SessionStatus
 from api.schemas.session import CleaningLogCreate, CleaningLogResponse
+from api.schemas.task import AssignedTaskResponse
+from api.services.archive_service import archived_log_response, session_archive
 from api.utils.file_utils import save_uploaded_file
 from api.models import Base
 from api.models import CleaningLog
@@ -20,6 +24,39 @@ from api.models import TaskTemplate, AssignedTask
 
 router = APIRouter()
 
+# Relations sérialisées avec un log (CleaningLogResponse)
+LOG_RESPONSE_RELATIONS = (
+    joinedload(CleaningLog.session),
+    joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.task_template),
+    joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.room),
+    joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.default_performer),
+    joinedload(CleaningLog.performed_by),
+)
+
+# ?fields= : champs de CleaningLogResponse -> colonnes et relations de CleaningLog
+LOG_FIELDS = SparseFieldset(
+    CleaningLog,
+    CleaningLogResponse,
+    sources={
+        "assigned_task": LOG_RESPONSE_RELATIONS[1:4],
+        "performer": (joinedload(CleaningLog.performed_by),),
+        "notes": (CleaningLog.note,),
+        "photos": (CleaningLog.photo_urls,),
+        "timestamp": (CleaningLog.created_at,),
+    },
+    getters={
+        "assigned_task": lambda log: AssignedTaskResponse.from_orm_model(log.assigned_task),
+        "performer": lambda log: log.performed_by,
+        "notes": lambda log: log.note,
+        "photos": lambda log: log.photo_urls,
+        "timestamp": lambda log: log.created_at,
+    }
+)
+
+def load_log_response(db: Session, log_id: uuid.UUID) -> CleaningLog:
+    """Relit un log avec les relations de sa réponse (une requête)"""
+    return db.query(CleaningLog).options(*LOG_RESPONSE_RELATIONS).filter(CleaningLog.id == log_id).one()
+
 @router.post("", response_model=CleaningLogResponse)
 async def create_cleaning_log(
     log: CleaningLogCreate,
@@ -29,20 +66,38 @@ async def create_cleaning_log(
     db_log = CleaningLog(**log.dict())
     db.add(db_log)
     db.commit()
-    db.refresh(db_log)
-    return db_log
+    return load_log_response(db, db_log.id)
 
 @router.get("", response_model=List[CleaningLogResponse])
 async def get_cleaning_logs(
+    response: Response,
     session_id: Optional[uuid.UUID] = None,
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex. id,status,timestamp)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(CleaningLog)
+    selected = LOG_FIELDS.parse(fields)
+    
+    query = db.query(CleaningLog).options(
+        *(LOG_RESPONSE_RELATIONS if selected is None else LOG_FIELDS.options(selected))
+    )
     if session_id:
         query = query.filter(CleaningLog.session_id == session_id)
-    
-    return query.order_by(desc(CleaningLog.timestamp)).all()
+    logs = query.order_by(desc(CleaningLog.created_at)).all()
+    
+    # Session archivée : logs servis depuis l'archive (lecture gzip hors de la boucle)
+    if session_id and not logs:
+        archived = await run_in_threadpool(session_archive.get, session_id)
+        if archived is not None:
+            rows = [archived_log_response(log, archived["session"]) for log in archived["logs"]]
+            rows.sort(key=lambda row: row["created_at"] or "", reverse=True)
+            if selected is not None:
+                rows = [{name: row[name] for name in LOG_FIELDS.schema.model_fields if name in selected} for row in rows]
+            return LOG_FIELDS.response(rows, response)
+    
+    if selected is None:
+        return logs
+    return LOG_FIELDS.response([LOG_FIELDS.serialize(log, selected) for log in logs], response)
 
 @router.post("/{log_id}/photos")
 async def upload_photo(
@@ -94,32 +149,10 @@ async def complete_task(
     if note:
         log.note = note
     
+    # Compteurs et statut de la session mis à jour au flush (deltas atomiques)
     db.commit()
     
-    session = db.query(CleaningSession).filter(
-        CleaningSession.id == log.session_id
-    ).first()
-    
-    all_logs = db.query(CleaningLog).filter(
-        CleaningLog.session_id == session.id
-    ).all()
-    
-    completed_count = len([l for l in all_logs if l.status == LogStatus.FAIT])
-    impossible_count = len([l for l in all_logs if l.status == LogStatus.IMPOSSIBLE])
-    postponed_count = len([l for l in all_logs if l.status == LogStatus.REPORTE])
-    
-    if completed_count + impossible_count == len(all_logs):
-        session.status = SessionStatus.COMPLETEE
-    elif postponed_count == len(all_logs):
-        session.status = SessionStatus.EN_COURS
-    else:
-        session.status = SessionStatus.INCOMPLETE
-    
-    session.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(log)
-    
-    return log
+    return load_log_response(db, log_id)
 
 @router.post("/{log_id}/quick-complete", response_model=CleaningLogResponse)
 async def quick_complete_task(
@@ -150,6 +183,5 @@ async def quick_complete_task(
     log.recorded_by_id = current_user.id
     
     db.commit()
-    db.refresh(log)
     
-    return log
\ No newline at end of file
+    return load_log_response(db, log_id)
\ No newline at end of file
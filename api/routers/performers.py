@@ -1,14 +1,19 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from api.core.database import get_db
 from api.core.security import get_current_user
+from api.core.cache import cache, CacheNamespace
+from api.core.conditional import conditional_response, resource_etag
+from api.core.sparse_fields import SparseFieldset
 from api.models.user import User
 from api.models.performer import Performer
 from api.schemas.performer import PerformerCreate, PerformerUpdate, PerformerResponse
 
 router = APIRouter()
 
+PERFORMER_FIELDS = SparseFieldset(Performer, PerformerResponse)
+
 @router.post("", response_model=PerformerResponse)
 async def create_performer(
     performer: PerformerCreate,
@@ -23,14 +28,39 @@ async def create_performer(
 
 @router.get("", response_model=List[PerformerResponse])
 async def get_performers(
+    request: Request,
+    response: Response,
     include_inactive: bool = False,
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex. id,name)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Performer)
-    if not include_inactive:
-        query = query.filter(Performer.is_active == True)
-    return query.all()
+    selected = PERFORMER_FIELDS.parse(fields)
+    
+    not_modified = conditional_response(request, response, resource_etag(db, Performer))
+    if not_modified:
+        return not_modified
+    
+    def load_performers():
+        query = db.query(Performer)
+        if selected is not None:
+            query = query.options(*PERFORMER_FIELDS.options(selected))
+        if not include_inactive:
+            query = query.filter(Performer.is_active == True)
+        if selected is not None:
+            return [PERFORMER_FIELDS.serialize(p, selected) for p in query.all()]
+        return [PerformerResponse.model_validate(p).model_dump(mode="json") for p in query.all()]
+    
+    scope = "all" if include_inactive else "active"
+    if selected is None:
+        return await cache.aget_or_set(CacheNamespace.PERFORMERS, (scope,), load_performers)
+    
+    rows = await cache.aget_or_set(
+        CacheNamespace.PERFORMERS,
+        (scope, PERFORMER_FIELDS.cache_key(selected)),
+        load_performers
+    )
+    return PERFORMER_FIELDS.response(rows, response)
 
 @router.get("/{performer_id}", response_model=PerformerResponse)
 async def get_performer(
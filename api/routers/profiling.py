@@ -0,0 +1,102 @@
+"""
+Profilage CPU et diagnostic mémoire du worker en production (administrateurs uniquement)
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from api.core.auth_dependencies import require_admin
+from api.core.config import settings
+from api.core.memory import MemoryTracingError, memory_sampler, memory_tracer
+from api.core.sampling_profiler import ProfilerBusy, profile_for
+from api.models.user import User
+
+router = APIRouter()
+
+@router.post("/profile")
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    mode: str = Query("cpu", regex="^(cpu|wall)$"),
+    format: str = Query("speedscope", regex="^(speedscope|collapsed)$"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Échantillonne les piles de tous les threads du worker qui reçoit la
+    requête pendant ``seconds`` secondes, sous le trafic réel, et retourne le
+    profil par route : JSON speedscope ou piles repliées (flamegraph.pl).
+    """
+    if seconds > settings.profiling_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Durée maximale de profilage : {settings.profiling_max_seconds:g} s"
+        )
+
+    try:
+        profiler = await profile_for(seconds, interval_ms / 1000, mode)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    headers = {"X-Profile-Samples": str(profiler.samples), "X-Profile-Method": profiler.method}
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed(), headers=headers)
+    headers["Content-Disposition"] = 'attachment; filename="profile.speedscope.json"'
+    return JSONResponse(profiler.speedscope(), headers=headers)
+
+
+# ===== MÉMOIRE (tracemalloc) =====
+
+@router.get("/memory")
+async def memory_status(current_user: User = Depends(require_admin)):
+    """RSS, ramasse-miettes et état de tracemalloc du worker qui reçoit la requête"""
+    return {
+        **memory_sampler.sample(),
+        "tracing_frames": memory_tracer.frames if memory_tracer.tracing else None,
+        "snapshots": memory_tracer.snapshots if memory_tracer.tracing else 0,
+    }
+
+
+@router.post("/memory/start")
+async def start_memory_tracing(
+    frames: Optional[int] = Query(None, ge=1, le=100),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Démarre tracemalloc sur ce worker et prend le snapshot de référence.
+    ``frames`` : profondeur de pile conservée par allocation (l'attribution
+    par route exige que le endpoint figure dans la pile).
+    """
+    try:
+        await run_in_threadpool(memory_tracer.start, frames or settings.memory_trace_frames)
+    except MemoryTracingError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"tracing": True, "frames": memory_tracer.frames}
+
+
+@router.post("/memory/snapshot")
+async def memory_snapshot(
+    request: Request,
+    compare_to: str = Query("previous", regex="^(previous|start)$"),
+    limit: int = Query(20, ge=1, le=200),
+    collect: bool = Query(True),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Nouveau snapshot comparé au précédent (ou à la référence) : principaux
+    écarts d'allocation par fichier/ligne et par route. Une croissance qui
+    persiste d'un snapshot à l'autre, après collecte (``collect``), est une fuite.
+    """
+    try:
+        return await run_in_threadpool(memory_tracer.snapshot, request.app.routes, compare_to, limit, collect)
+    except MemoryTracingError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing(current_user: User = Depends(require_admin)):
+    """Arrête tracemalloc (et son surcoût) et libère les snapshots"""
+    memory_tracer.stop()
+    return {"tracing": False}
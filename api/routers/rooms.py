@@ -1,9 +1,11 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from api.core.database import get_db
 from api.core.security import get_current_user
 from api.core.auth_dependencies import require_manager
+from api.core.cache import cache, CacheNamespace
+from api.core.conditional import conditional_response, resource_etag
 from api.models.user import User
 from api.models.room import Room
 from api.schemas.room import RoomCreate, RoomResponse
@@ -24,10 +26,23 @@ async def create_room(
 
 @router.get("", response_model=List[RoomResponse])
 async def get_rooms(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Room).filter(Room.is_active == True).order_by(Room.display_order).all()
+    not_modified = conditional_response(request, response, resource_etag(db, Room))
+    if not_modified:
+        return not_modified
+    
+    return await cache.aget_or_set(
+        CacheNamespace.ROOMS,
+        ("active",),
+        lambda: [
+            RoomResponse.model_validate(room).model_dump(mode="json")
+            for room in db.query(Room).filter(Room.is_active == True).order_by(Room.display_order).all()
+        ]
+    )
 
 @router.put("/{room_id}", response_model=RoomResponse, dependencies=[Depends(require_manager)])
 async def update_room(
@@ -1,26 +1,32 @@
-from typing import List, Optional, Dict, Any
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
 from datetime import date, datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, func, desc
 import uuid
 
 from api.core.database import get_db
-
-def normalize_datetimes(dt1: datetime, dt2: datetime) -> tuple[datetime, datetime]:
-    """
-    Normalise deux datetime pour éviter les erreurs de timezone
-    """
-    if dt1.tzinfo is None and dt2.tzinfo is not None:
-        dt1 = dt1.replace(tzinfo=dt2.tzinfo)
-    elif dt1.tzinfo is not None and dt2.tzinfo is None:
-        dt2 = dt2.replace(tzinfo=dt1.tzinfo)
-    return dt1, dt2
+from api.core.cache import CacheNamespace
+from api.core.conditional import conditional_response, resource_etag
+from api.core.config import settings
+from api.core.sparse_fields import SparseFieldset
+from api.core.streaming_json import iter_batches, iter_json_array, openapi_request_body
+from api.core.single_flight import aggregates, with_session
 from api.core.security import get_current_user
 from api.models.user import User
 from api.models.session import CleaningSession, CleaningLog, SessionStatus, LogStatus
 from api.models.task import AssignedTask
-from api.schemas.session import CleaningSessionResponse, CleaningLogResponse
+from api.schemas.session import (
+    CleaningSessionResponse, CleaningLogResponse, FinalizeSessionRequest, FinalizeSessionResponse,
+    FinalizeTaskItem, LogStatusBatchRequest, LogStatusBatchResponse
+)
+from api.schemas.sync import NormalizedSessionLogs
+from api.services.archive_service import session_archive
+from api.services.session_service import LOG_RELATIONS, NORMALIZED_LOG_RELATIONS, apply_finalize_batch, apply_log_status_changes, normalize_session_logs, compute_session_statistics, persist_session_statistics
 from api.services.task_scheduler import should_task_be_done_today, get_tasks_for_date
 from sqlalchemy import and_, func
 from sqlalchemy.orm import joinedload
@@ -28,13 +34,41 @@ from sqlalchemy.orm import joinedload
 
 router = APIRouter()
 
+# Statuts de finalisation appliqués (et flushés) par lots de cette taille
+FINALIZE_BATCH_SIZE = 100
+
+async def archived_session_part(session_id: uuid.UUID, part: str, request: Request, response: Response):
+    """
+    Partie (``session``, ``logs``) d'une session archivée, servie depuis son
+    fichier d'archive ; ``None`` si la session n'est pas archivée. Manifeste et
+    fichier mensuel (gzip) sont lus hors de la boucle d'événements.
+    """
+    etag = await run_in_threadpool(session_archive.etag, session_id)
+    if etag is None:
+        return None
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    record = await run_in_threadpool(session_archive.get, session_id)
+    return record[part] if record else None
+
+SESSION_FIELDS = SparseFieldset(CleaningSession, CleaningSessionResponse)
+
 @router.get("", response_model=List[CleaningSessionResponse])
 async def get_sessions(
+    response: Response,
     limit: int = 30,
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex. id,date,status)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(CleaningSession).order_by(desc(CleaningSession.date)).limit(limit).all()
+    selected = SESSION_FIELDS.parse(fields)
+    query = db.query(CleaningSession).order_by(desc(CleaningSession.date)).limit(limit)
+    if selected is None:
+        return query.all()
+    
+    sessions = query.options(*SESSION_FIELDS.options(selected)).all()
+    return SESSION_FIELDS.response([SESSION_FIELDS.serialize(s, selected) for s in sessions], response)
 
 @router.get("/today", response_model=CleaningSessionResponse)
 async def get_today_session(
@@ -52,9 +86,20 @@ async def get_today_session(
 @router.get("/{session_id}", response_model=CleaningSessionResponse)
 async def get_session(
     session_id: uuid.UUID,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    archived = await archived_session_part(session_id, "session", request, response)
+    if archived is not None:
+        return archived
+    
+    etag = resource_etag(db, (CleaningSession, CleaningSession.id == session_id))
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     session = db.query(CleaningSession).filter(CleaningSession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
@@ -218,12 +263,40 @@ async def refresh_today_session(
 @router.get("/{session_id}/logs")
 async def get_session_logs(
     session_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    format: str = Query("nested", regex="^(nested|normalized)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Récupère tous les logs d'une session avec les données relationnelles.
+    
+    ``format=normalized`` : logs à plat (clés étrangères) et une carte
+    ``included`` des tâches, pièces, modèles et exécutants, chacun sérialisé
+    une seule fois au lieu d'être répété dans chaque log.
     """
+    from api.models.room import Room
+    from api.models.task import TaskTemplate
+    from api.models.performer import Performer
+    
+    # Session archivée : logs servis depuis l'archive (références figées)
+    archived = await archived_session_part(session_id, "logs", request, response)
+    if archived is not None:
+        if format == "normalized" and not isinstance(archived, Response):
+            return NormalizedSessionLogs.model_validate(normalize_session_logs(session_id, archived))
+        return archived
+    
+    # Les logs embarquent tâche assignée, pièce, modèle de tâche et exécutant
+    etag = resource_etag(
+        db,
+        (CleaningLog, CleaningLog.session_id == session_id),
+        AssignedTask, Room, TaskTemplate, Performer
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     # Vérifier que la session existe
     session = db.query(CleaningSession).filter(
         CleaningSession.id == session_id
@@ -232,135 +305,164 @@ async def get_session_logs(
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
+    if format == "normalized":
+        logs = db.query(CleaningLog).options(*NORMALIZED_LOG_RELATIONS).filter(CleaningLog.session_id == session_id).all()
+        return NormalizedSessionLogs.model_validate(normalize_session_logs(session_id, logs), from_attributes=True)
+    
     # Récupérer tous les logs avec les relations
-    logs = db.query(CleaningLog).options(
-        joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.room),
-        joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.task_template),
-        joinedload(CleaningLog.performed_by)
-    ).filter(CleaningLog.session_id == session_id).all()
+    logs = db.query(CleaningLog).options(*LOG_RELATIONS).filter(CleaningLog.session_id == session_id).all()
     
     return logs
 
+@router.patch("/{session_id}/logs", response_model=LogStatusBatchResponse)
+async def update_session_logs(
+    session_id: uuid.UUID,
+    payload: LogStatusBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Met à jour le statut de plusieurs logs en un aller-retour (une transaction,
+    statut de session recalculé une fois). Résultat rapporté par élément.
+    """
+    session = db.query(CleaningSession).filter(CleaningSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    
+    results = apply_log_status_changes(db, session, payload.changes, current_user.id)
+    db.commit()
+    
+    return LogStatusBatchResponse(
+        session_id=session.id,
+        session_status=session.status,
+        updated=sum(1 for result in results if result.ok),
+        results=results
+    )
+
+@router.get("/{session_id}/events")
+async def stream_session_events(
+    session_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Flux Server-Sent Events de la progression d'une session : état initial
+    (``snapshot``), puis un événement ``progress`` par commit modifiant ses
+    logs (logs changés + compteurs à jour), heartbeats sur flux inactif.
+    """
+    from fastapi.responses import StreamingResponse
+    from api.core.events import session_events
+    from api.services.session_service import COUNTER_COLUMNS
+    
+    session = db.query(CleaningSession).filter(CleaningSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    
+    snapshot = {
+        "session_id": str(session.id),
+        "counters": {
+            "status": session.status.value if session.status else None,
+            **{column: getattr(session, column) for column in COUNTER_COLUMNS},
+        },
+    }
+    # Rendre la connexion au pool : le flux peut rester ouvert des heures
+    db.close()
+    
+    return StreamingResponse(
+        session_events.stream(str(session_id), snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{session_id}/statistics")
 async def get_session_statistics(
     session_id: uuid.UUID,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
     Récupère les statistiques détaillées d'une session.
     """
+    return await aggregates.get_or_compute(
+        CacheNamespace.SESSIONS,
+        ("statistics", session_id),
+        lambda: with_session(lambda db: load_session_statistics(db, session_id))
+    )
+
+def load_session_statistics(db: Session, session_id: uuid.UUID) -> Dict[str, Any]:
+    """
+    Statistiques d'une session : persistées une fois la session complétée
+    (résultat immuable), calculées en SQL tant qu'elle est en cours.
+    """
     session = db.query(CleaningSession).filter(
         CleaningSession.id == session_id
     ).first()
     
     if not session:
+        archived = session_archive.get(session_id)
+        if archived and archived["session"].get("statistics") is not None:
+            return archived["session"]["statistics"]
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    # Récupérer tous les logs avec les relations
-    logs = db.query(CleaningLog).options(
-        joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.room),
-        joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.task_template),
-        joinedload(CleaningLog.performed_by)
-    ).filter(CleaningLog.session_id == session_id).all()
-    
-    # Calculer les statistiques
-    total_tasks = len(logs)
-    completed_tasks = len([l for l in logs if l.status == LogStatus.FAIT])
-    partial_tasks = len([l for l in logs if l.status == LogStatus.PARTIEL])
-    postponed_tasks = len([l for l in logs if l.status == LogStatus.REPORTE])
-    impossible_tasks = len([l for l in logs if l.status == LogStatus.IMPOSSIBLE])
-    
-    # Statistiques par pièce
-    stats_by_room = {}
-    for log in logs:
-        room_name = log.assigned_task.room.name
-        if room_name not in stats_by_room:
-            stats_by_room[room_name] = {
-                "total": 0,
-                "completed": 0,
-                "partial": 0,
-                "postponed": 0,
-                "impossible": 0
-            }
-        
-        stats_by_room[room_name]["total"] += 1
-        
-        if log.status == LogStatus.FAIT:
-            stats_by_room[room_name]["completed"] += 1
-        elif log.status == LogStatus.PARTIEL:
-            stats_by_room[room_name]["partial"] += 1
-        elif log.status == LogStatus.REPORTE:
-            stats_by_room[room_name]["postponed"] += 1
-        elif log.status == LogStatus.IMPOSSIBLE:
-            stats_by_room[room_name]["impossible"] += 1
-    
-    # Top performers
-    performer_stats = {}
-    for log in logs:
-        if log.performed_by_id and log.status in [LogStatus.FAIT, LogStatus.PARTIEL]:
-            if log.performed_by_id not in performer_stats:
-                performer_stats[log.performed_by_id] = {
-                    "id": str(log.performed_by_id),
-                    "name": log.performed_by.name if log.performed_by else "Inconnu",
-                    "tasks_completed": 0,
-                    "tasks_partial": 0,
-                    "total_duration": 0
-                }
-            
-            if log.status == LogStatus.FAIT:
-                performer_stats[log.performed_by_id]["tasks_completed"] += 1
-            else:
-                performer_stats[log.performed_by_id]["tasks_partial"] += 1
-            
-            # Calculer la durée si disponible
-            if log.performed_at and log.created_at:
-                performed_at, created_at = normalize_datetimes(log.performed_at, log.created_at)
-                duration = (performed_at - created_at).total_seconds() / 60
-                performer_stats[log.performed_by_id]["total_duration"] += duration
-    
-    top_performers = sorted(
-        performer_stats.values(),
-        key=lambda x: x["tasks_completed"],
-        reverse=True
-    )[:5]
-    
-    # Temps moyen par tâche
-    durations = []
-    for log in logs:
-        if log.performed_at and log.created_at and log.status == LogStatus.FAIT:
-            performed_at, created_at = normalize_datetimes(log.performed_at, log.created_at)
-            duration = (performed_at - created_at).total_seconds() / 60
-            durations.append(duration)
-    
-    average_duration = sum(durations) / len(durations) if durations else 0
+    if session.status == SessionStatus.COMPLETEE and session.statistics is not None:
+        return session.statistics
     
-    return {
-        "session_id": str(session_id),
-        "date": session.date.isoformat(),
-        "status": session.status.value,
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "partial_tasks": partial_tasks,
-        "postponed_tasks": postponed_tasks,
-        "impossible_tasks": impossible_tasks,
-        "completion_rate": (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
-        "average_duration_minutes": round(average_duration, 1),
-        "stats_by_room": stats_by_room,
-        "top_performers": top_performers,
-        "has_photos": any(log.photo_urls for log in logs),
-        "notes_count": len([l for l in logs if l.note])
-    }
+    statistics = compute_session_statistics(db, session)
+    if session.status == SessionStatus.COMPLETEE:
+        persist_session_statistics(db, session, statistics)
+    return statistics
 
-@router.post("/{session_id}/finalize")
+async def read_finalize_batches(request: Request) -> AsyncIterator[List[FinalizeTaskItem]]:
+    """
+    Statuts du body de finalisation, validés, par lots. Un body annoncé sous
+    ``finalize_stream_threshold`` est validé en une fois ; au-delà (ou sans
+    Content-Length), le tableau ``task_statuses`` est décodé et validé au fil
+    de la réception, sans jamais charger le document entier.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) <= settings.finalize_stream_threshold:
+        try:
+            items = FinalizeSessionRequest.model_validate_json(await request.body()).task_statuses
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+        for start in range(0, len(items), FINALIZE_BATCH_SIZE):
+            yield items[start:start + FINALIZE_BATCH_SIZE]
+        return
+
+    async def validated_items():
+        index = 0
+        async for element in iter_json_array(request.stream(), "task_statuses"):
+            try:
+                yield FinalizeTaskItem.model_validate(element)
+            except ValidationError as e:
+                raise RequestValidationError([
+                    {**error, "loc": ("body", "task_statuses", index, *error["loc"])} for error in e.errors()
+                ])
+            index += 1
+
+    try:
+        async for batch in iter_batches(validated_items(), FINALIZE_BATCH_SIZE):
+            yield batch
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error", "input": {}, "ctx": {"error": e.msg}
+        }])
+
+@router.post(
+    "/{session_id}/finalize",
+    response_model=FinalizeSessionResponse,
+    openapi_extra=openapi_request_body(FinalizeSessionRequest)
+)
 async def finalize_session(
     session_id: uuid.UUID,
-    request: Dict[str, Any],  # Format: {"task_statuses": [{"task_id": "...", "status": {...}}]}
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Finalise une session en convertissant les statuts temporaires en CleaningLogs permanents
+    Finalise une session en convertissant les statuts temporaires en CleaningLogs permanents.
+    
+    Body : ``FinalizeSessionRequest`` (``{"task_statuses": [{"task_id": "...", "status": {...}}]}``).
+    Les gros bodies sont lus et appliqués par lots au fil de la réception.
     """
     # Vérifier que la session existe
     session = db.query(CleaningSession).filter(CleaningSession.id == session_id).first()
@@ -370,69 +472,32 @@ async def finalize_session(
     if session.status == SessionStatus.COMPLETEE:
         raise HTTPException(status_code=400, detail="Session already completed")
     
-    task_statuses = request.get('task_statuses', [])
-    created_logs = []
+    # Logs de la session chargés une fois ; exécutants cités résolus lot par lot
+    logs_by_task = {
+        log.assigned_task_id: log
+        for log in db.query(CleaningLog).filter(CleaningLog.session_id == session_id).all()
+    }
+    performers_by_name: Dict[str, Optional[uuid.UUID]] = {}
+    logs_updated = 0
     
     try:
-        # Mettre à jour les logs existants avec les statuts temporaires
-        for task_data in task_statuses:
-            task_id = task_data.get('task_id')
-            status_info = task_data.get('status', {})
-            
-            # Chercher le log existant pour cette tâche dans cette session
-            existing_log = db.query(CleaningLog).filter(
-                and_(
-                    CleaningLog.session_id == session_id,
-                    CleaningLog.assigned_task_id == task_id
-                )
-            ).first()
-            
-            if existing_log:
-                # Mettre à jour le log existant
-                status_mapping = {
-                    'done': LogStatus.FAIT,
-                    'partial': LogStatus.PARTIEL,
-                    'skipped': LogStatus.REPORTE,
-                    'blocked': LogStatus.IMPOSSIBLE,
-                    'todo': LogStatus.REPORTE,
-                    'in_progress': LogStatus.REPORTE
-                }
-                
-                existing_log.status = status_mapping.get(status_info.get('status'), LogStatus.REPORTE)
-                existing_log.note = status_info.get('notes')
-                
-                # Gérer les photos (conversion en JSON)
-                photos = status_info.get('photos', [])
-                if photos:
-                    existing_log.photo_urls = photos
-                
-                # Gérer l'exécutant
-                performer_name = status_info.get('performed_by')
-                if performer_name:
-                    # Trouver l'ID du performer par son nom
-                    from api.models.performer import Performer
-                    performer = db.query(Performer).filter(Performer.name == performer_name).first()
-                    if performer:
-                        existing_log.performed_by_id = performer.id
-                
-                # Gérer les timestamps
-                if status_info.get('completed_at'):
-                    existing_log.performed_at = datetime.fromisoformat(status_info['completed_at'].replace('Z', '+00:00'))
-                
-                created_logs.append(existing_log)
+        async for batch in read_finalize_batches(request):
+            logs_updated += apply_finalize_batch(db, logs_by_task, performers_by_name, batch)
         
         # Sauvegarder toutes les modifications
         db.commit()
-        
-        return {
-            "message": "Session finalized successfully",
-            "logs_updated": len(created_logs),
-            "session_id": str(session_id)
-        }
-        
+    except (RequestValidationError, HTTPException):
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error finalizing session: {str(e)}")
+    
+    return FinalizeSessionResponse(
+        message="Session finalized successfully",
+        logs_updated=logs_updated,
+        session_id=session_id
+    )
 
 @router.put("/{session_id}/complete")
 async def complete_session(
@@ -0,0 +1,94 @@
+import base64
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from api.core.config import settings
+from api.core.database import get_db
+from api.core.security import get_current_user
+from api.models.user import User
+from api.models.room import Room
+from api.models.task import TaskTemplate, AssignedTask
+from api.models.performer import Performer
+from api.models.session import CleaningSession, CleaningLog
+from api.schemas.sync import SyncChanges, SyncResponse
+
+router = APIRouter()
+
+TOKEN_PREFIX = "v1:"
+
+# Ressources synchronisées : clé de réponse -> modèle (is_active = suppression logique)
+SOFT_DELETABLE = {
+    "rooms": Room,
+    "task_templates": TaskTemplate,
+    "assigned_tasks": AssignedTask,
+    "performers": Performer,
+}
+
+def encode_sync_token(watermark: datetime) -> str:
+    """Jeton opaque portant l'horodatage (horloge DB) de la synchronisation"""
+    return base64.urlsafe_b64encode((TOKEN_PREFIX + watermark.isoformat()).encode()).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> datetime:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        if not raw.startswith(TOKEN_PREFIX):
+            raise ValueError(raw)
+        return datetime.fromisoformat(raw[len(TOKEN_PREFIX):])
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Jeton de synchronisation invalide, relancer une synchronisation complète"
+        )
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = Query(None, description="Jeton retourné par la synchronisation précédente"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Synchronisation différentielle pour l'application mobile.
+
+    Sans ``since`` : instantané complet (données de référence actives, session
+    du jour et ses logs). Avec ``since`` : uniquement les lignes créées ou
+    modifiées depuis le jeton (via les index sur ``updated_at``) ; les lignes
+    désactivées sont listées dans ``deleted``. Une petite fenêtre de
+    recouvrement peut renvoyer des lignes déjà reçues : le client les applique
+    par identifiant (upsert).
+    """
+    # Horloge de la base, la même que celle qui alimente updated_at
+    watermark = db.execute(select(func.now())).scalar()
+    changes = {key: [] for key in SyncChanges.model_fields}
+    deleted = {key: [] for key in SOFT_DELETABLE}
+
+    if since is None:
+        for key, model in SOFT_DELETABLE.items():
+            changes[key] = db.query(model).filter(model.is_active == True).all()
+
+        today_session = db.query(CleaningSession).filter(CleaningSession.date == date.today()).first()
+        if today_session:
+            changes["sessions"] = [today_session]
+            changes["logs"] = db.query(CleaningLog).filter(CleaningLog.session_id == today_session.id).all()
+    else:
+        # Recouvrement : une transaction commencée avant le jeton peut avoir été validée après
+        changed_since = decode_sync_token(since) - timedelta(seconds=settings.sync_overlap_seconds)
+
+        for key, model in SOFT_DELETABLE.items():
+            for row in db.query(model).filter(model.updated_at > changed_since).all():
+                if row.is_active:
+                    changes[key].append(row)
+                else:
+                    deleted[key].append(row.id)
+
+        changes["sessions"] = db.query(CleaningSession).filter(CleaningSession.updated_at > changed_since).all()
+        changes["logs"] = db.query(CleaningLog).filter(CleaningLog.updated_at > changed_since).all()
+
+    return SyncResponse(
+        token=encode_sync_token(watermark),
+        full=since is None,
+        changes=SyncChanges.model_validate(changes, from_attributes=True),
+        deleted=deleted
+    )
@@ -1,16 +1,39 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from api.core.database import get_db
 from api.core.security import get_current_user
 from api.core.auth_dependencies import require_manager
+from api.core.cache import cache, CacheNamespace
+from api.core.conditional import conditional_response, resource_etag
+from api.core.sparse_fields import SparseFieldset
 from api.models.user import User
 from api.models.task import TaskTemplate, AssignedTask
 from api.schemas.task import TaskTemplateCreate, TaskTemplateResponse, AssignedTaskCreate, AssignedTaskResponse
+from api.services.task_scheduler import ASSIGNED_TASK_RELATIONS
 
 router = APIRouter()
 assigned_router = APIRouter()
 
+# ?fields= : la fréquence est exposée par deux champs calculés depuis la colonne JSON
+ASSIGNED_TASK_FIELDS = SparseFieldset(
+    AssignedTask,
+    AssignedTaskResponse,
+    sources={
+        "frequency_days": (AssignedTask.frequency,),
+        "times_per_day": (AssignedTask.frequency,),
+    },
+    getters={
+        "frequency_days": lambda task: task.frequency or {},
+        "times_per_day": lambda task: (task.frequency or {}).get("times_per_day", 1),
+    }
+)
+
+def load_assigned_task_response(db: Session, assigned_task_id) -> AssignedTaskResponse:
+    """Relit une tâche assignée avec ses relations (une requête) pour la réponse"""
+    task = db.query(AssignedTask).options(*ASSIGNED_TASK_RELATIONS).filter(AssignedTask.id == assigned_task_id).one()
+    return AssignedTaskResponse.from_orm_model(task)
+
 # Task Templates
 @router.post("", response_model=TaskTemplateResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_manager)])
 async def create_task_template(
@@ -28,10 +51,23 @@ async def create_task_template(
 
 @router.get("", response_model=List[TaskTemplateResponse])
 async def get_task_templates(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(TaskTemplate).filter(TaskTemplate.is_active == True).all()
+    not_modified = conditional_response(request, response, resource_etag(db, TaskTemplate))
+    if not_modified:
+        return not_modified
+    
+    return await cache.aget_or_set(
+        CacheNamespace.TASK_TEMPLATES,
+        ("active",),
+        lambda: [
+            TaskTemplateResponse.model_validate(task).model_dump(mode="json")
+            for task in db.query(TaskTemplate).filter(TaskTemplate.is_active == True).all()
+        ]
+    )
 
 @router.put("/{task_template_id}", response_model=TaskTemplateResponse, dependencies=[Depends(require_manager)])
 async def update_task_template(
@@ -111,22 +147,45 @@ async def create_assigned_task(
     db_task = AssignedTask(**task_data)
     db.add(db_task)
     db.commit()
-    db.refresh(db_task)
-    return AssignedTaskResponse.from_orm_model(db_task)
+    return load_assigned_task_response(db, db_task.id)
 
 @assigned_router.get("", response_model=List[AssignedTaskResponse])
 async def get_assigned_tasks(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex. id,room,is_active)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from sqlalchemy.orm import joinedload
-    tasks = db.query(AssignedTask).options(
-        joinedload(AssignedTask.task_template),
-        joinedload(AssignedTask.room),
-        joinedload(AssignedTask.default_performer)
-    ).filter(AssignedTask.is_active == True).all()
+    from api.models.room import Room
+    from api.models.performer import Performer
+    
+    selected = ASSIGNED_TASK_FIELDS.parse(fields)
     
-    return [AssignedTaskResponse.from_orm_model(task) for task in tasks]
+    # La réponse embarque pièce, modèle de tâche et exécutant
+    etag = resource_etag(db, AssignedTask, TaskTemplate, Room, Performer)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    def load_assigned_tasks():
+        tasks = db.query(AssignedTask).options(*ASSIGNED_TASK_RELATIONS).filter(AssignedTask.is_active == True).all()
+        return [AssignedTaskResponse.from_orm_model(task).model_dump(mode="json") for task in tasks]
+    
+    if selected is None:
+        return await cache.aget_or_set(CacheNamespace.ASSIGNED_TASKS, ("active",), load_assigned_tasks)
+    
+    # Projection : seules les colonnes et relations des champs demandés
+    def load_assigned_task_fields():
+        tasks = db.query(AssignedTask).options(*ASSIGNED_TASK_FIELDS.options(selected)).filter(AssignedTask.is_active == True).all()
+        return [ASSIGNED_TASK_FIELDS.serialize(task, selected) for task in tasks]
+    
+    rows = await cache.aget_or_set(
+        CacheNamespace.ASSIGNED_TASKS,
+        ("active", ASSIGNED_TASK_FIELDS.cache_key(selected)),
+        load_assigned_task_fields
+    )
+    return ASSIGNED_TASK_FIELDS.response(rows, response)
 
 @assigned_router.put("/{assigned_task_id}", response_model=AssignedTaskResponse, dependencies=[Depends(require_manager)])
 async def update_assigned_task(
@@ -141,8 +200,7 @@ async def update_assigned_task(
     for k, v in payload.model_dump().items():
         setattr(task, k, v)
     db.commit()
-    db.refresh(task)
-    return AssignedTaskResponse.from_orm_model(task)
+    return load_assigned_task_response(db, task.id)
 
 @assigned_router.delete("/{assigned_task_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_manager)])
 async def delete_assigned_task(
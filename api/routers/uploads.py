@@ -18,6 +18,7 @@ from ..schemas.upload import (
 from ..core.database import get_db
 from ..core.security import get_current_user
 from ..models.user import User
+from ..core.metrics import upload_bytes, uploads_total
 
 logger = logging.getLogger(__name__)
 
@@ -77,6 +78,8 @@ async def upload_photo(
         await file.seek(0)  # Reset pour relire
         file_content = await file.read()
         file_size = len(file_content)
+        upload_bytes.inc(file_size)
+        uploads_total.inc()
         
         # Extraire le nom du fichier depuis l'URL
         filename = photo_url.split('/')[-1].split('?')[0]  # Enlever les paramètres de requête
@@ -166,6 +169,8 @@ async def upload_multiple_photos(
                 await file.seek(0)
                 file_content = await file.read()
                 file_size = len(file_content)
+                upload_bytes.inc(file_size)
+                uploads_total.inc()
                 
                 # Extraire le nom du fichier
                 filename = photo_url.split('/')[-1].split('?')[0]
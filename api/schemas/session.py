@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime, date
+from enum import Enum
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from api.models.session import SessionStatus, LogStatus
 from api.schemas.performer import PerformerResponse
 from api.schemas.task import AssignedTaskResponse
@@ -37,3 +38,54 @@ class CleaningLogResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class LogStatusChange(BaseModel):
+    log_id: uuid.UUID
+    status: LogStatus = LogStatus.FAIT
+    performed_by_id: Optional[uuid.UUID] = None  # Par défaut : exécutant par défaut de la tâche
+    note: Optional[str] = None
+
+class LogStatusBatchRequest(BaseModel):
+    changes: List[LogStatusChange] = Field(..., min_length=1, max_length=500)
+
+class LogStatusChangeResult(BaseModel):
+    log_id: uuid.UUID
+    ok: bool
+    status: Optional[LogStatus] = None
+    error: Optional[str] = None
+
+class LogStatusBatchResponse(BaseModel):
+    session_id: uuid.UUID
+    session_status: SessionStatus
+    updated: int
+    results: List[LogStatusChangeResult]
+
+# ===== FINALISATION D'UNE SESSION =====
+
+class FinalizeTaskState(str, Enum):
+    """Statuts temporaires de l'application mobile"""
+    DONE = "done"
+    PARTIAL = "partial"
+    SKIPPED = "skipped"
+    BLOCKED = "blocked"
+    TODO = "todo"
+    IN_PROGRESS = "in_progress"
+
+class FinalizeTaskStatus(BaseModel):
+    status: FinalizeTaskState = FinalizeTaskState.TODO
+    notes: Optional[str] = Field(None, max_length=2000)
+    photos: List[str] = Field(default_factory=list, max_length=20)
+    performed_by: Optional[str] = Field(None, max_length=255)  # Nom de l'exécutant
+    completed_at: Optional[datetime] = None
+
+class FinalizeTaskItem(BaseModel):
+    task_id: uuid.UUID  # Tâche assignée
+    status: FinalizeTaskStatus = Field(default_factory=FinalizeTaskStatus)
+
+class FinalizeSessionRequest(BaseModel):
+    task_statuses: List[FinalizeTaskItem] = Field(default_factory=list)
+
+class FinalizeSessionResponse(BaseModel):
+    message: str
+    logs_updated: int
+    session_id: uuid.UUID
@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime, time
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+from api.models.session import LogStatus
+from api.schemas.performer import PerformerResponse
+from api.schemas.room import RoomResponse
+from api.schemas.session import CleaningSessionResponse
+from api.schemas.task import TaskTemplateResponse
+
+class AssignedTaskSyncItem(BaseModel):
+    """Tâche assignée à plat : les relations sont synchronisées séparément"""
+    id: uuid.UUID
+    task_template_id: Optional[uuid.UUID]
+    room_id: Optional[uuid.UUID]
+    default_performer_id: Optional[uuid.UUID]
+    frequency: Optional[Dict[str, Any]]
+    suggested_time: Optional[time]
+    order_in_room: Optional[int]
+    is_active: bool
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+class CleaningLogSyncItem(BaseModel):
+    id: uuid.UUID
+    session_id: uuid.UUID
+    assigned_task_id: Optional[uuid.UUID]
+    performed_by_id: Optional[uuid.UUID]
+    status: Optional[LogStatus]
+    note: Optional[str]
+    photo_urls: Optional[List[str]]
+    performed_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+class SyncChanges(BaseModel):
+    rooms: List[RoomResponse] = Field(default_factory=list)
+    task_templates: List[TaskTemplateResponse] = Field(default_factory=list)
+    assigned_tasks: List[AssignedTaskSyncItem] = Field(default_factory=list)
+    performers: List[PerformerResponse] = Field(default_factory=list)
+    sessions: List[CleaningSessionResponse] = Field(default_factory=list)
+    logs: List[CleaningLogSyncItem] = Field(default_factory=list)
+
+class SyncResponse(BaseModel):
+    token: str  # À renvoyer tel quel dans ?since= à la prochaine synchronisation
+    full: bool  # True : instantané complet, le client remplace ses données locales
+    changes: SyncChanges
+    deleted: Dict[str, List[uuid.UUID]]  # Identifiants désactivés (is_active=False)
+
+# ===== LOGS D'UNE SESSION, FORMAT NORMALISÉ =====
+
+class SessionLogsIncluded(BaseModel):
+    """Entités référencées par les logs, une seule fois chacune (clé : id)"""
+    assigned_tasks: Dict[str, AssignedTaskSyncItem] = Field(default_factory=dict)
+    rooms: Dict[str, RoomResponse] = Field(default_factory=dict)
+    task_templates: Dict[str, TaskTemplateResponse] = Field(default_factory=dict)
+    performers: Dict[str, PerformerResponse] = Field(default_factory=dict)
+
+class NormalizedSessionLogs(BaseModel):
+    session_id: uuid.UUID
+    logs: List[CleaningLogSyncItem]  # Clés étrangères seulement
+    included: SessionLogsIncluded
+
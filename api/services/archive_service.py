@@ -0,0 +1,319 @@
+"""
+Archivage à froid des sessions anciennes.
+
+Les sessions plus anciennes que la fenêtre de rétention sont écrites dans un
+fichier NDJSON compressé par mois (``sessions-YYYY-MM.ndjson.gz``), une ligne
+par session : la session (compteurs et statistiques compris), ses logs avec
+leurs références (tâche, pièce, exécutant, URLs des photos) et les métadonnées
+de ses exports. Les lignes sont ensuite supprimées des tables.
+
+Le répertoire (``ARCHIVE_DIR``) doit être un chemin absolu sur un volume
+persistant : les lignes étant supprimées après écriture, un répertoire
+éphémère du conteneur perdrait les sessions au prochain redéploiement.
+L'archivage est refusé tant qu'il n'est pas configuré.
+
+Un manifeste ``index.json`` (identifiant de session -> fichier, date) sert
+d'index en mémoire au chemin de lecture : les routes de sessions et de logs
+servent une session archivée depuis son fichier de manière transparente. Les
+fichiers photos et PDF restent en place, seules leurs références sont archivées.
+"""
+
+import enum
+import gzip
+import json
+import os
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, inspect
+from sqlalchemy.orm import Session, joinedload
+
+from api.core.config import settings
+from api.models.export import Export
+from api.models.session import CleaningSession, CleaningLog
+from api.services.session_service import LOG_RELATIONS, compute_session_statistics
+
+MANIFEST = "index.json"
+# Fichiers mensuels décompressés gardés en mémoire (lectures successives d'une même période)
+MONTH_CACHE_SIZE = 4
+
+
+class ArchiveConfigurationError(RuntimeError):
+    """Répertoire d'archive absent ou non durable (chemin relatif)"""
+
+
+def archive_directory(directory: Optional[str] = None) -> str:
+    """Répertoire d'archive explicite et absolu (``directory`` ou ``ARCHIVE_DIR``)"""
+    directory = directory or settings.archive_dir
+    if not directory:
+        raise ArchiveConfigurationError(
+            "ARCHIVE_DIR n'est pas configuré : indiquez un chemin absolu sur un volume persistant"
+        )
+    if not os.path.isabs(directory):
+        raise ArchiveConfigurationError(
+            f"Répertoire d'archive relatif ({directory}) : indiquez un chemin absolu sur un volume persistant"
+        )
+    return directory
+
+
+def archive_file_name(day: date) -> str:
+    return f"sessions-{day.year}-{day.month:02d}.ndjson.gz"
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _columns(instance) -> Optional[Dict[str, Any]]:
+    """Colonnes d'une instance ORM en valeurs JSON"""
+    if instance is None:
+        return None
+    return {
+        attribute.key: _json_value(getattr(instance, attribute.key))
+        for attribute in inspect(instance).mapper.column_attrs
+    }
+
+
+def serialize_session(db: Session, session: CleaningSession) -> Dict[str, Any]:
+    """Ligne d'archive d'une session, autonome (références dénormalisées)"""
+    logs = db.query(CleaningLog).options(*LOG_RELATIONS).filter(
+        CleaningLog.session_id == session.id,
+        CleaningLog.session_date == session.date
+    ).all()
+
+    archived_logs = []
+    for log in logs:
+        record = _columns(log)
+        assigned_task = _columns(log.assigned_task)
+        if assigned_task is not None:
+            assigned_task["room"] = _columns(log.assigned_task.room)
+            assigned_task["task_template"] = _columns(log.assigned_task.task_template)
+        record["assigned_task"] = assigned_task
+        record["performed_by"] = _columns(log.performed_by)
+        archived_logs.append(record)
+
+    return {
+        "session": _columns(session),
+        "logs": archived_logs,
+        "exports": [_columns(export) for export in session.exports],
+    }
+
+
+# ===== ÉCRITURE =====
+
+def _read_records(path: str) -> "OrderedDict[str, Dict[str, Any]]":
+    records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                records[record["session"]["id"]] = record
+    return records
+
+
+def _write_atomic(path: str, write):
+    temporary = f"{path}.tmp"
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def _write_records(path: str, records: Dict[str, Dict[str, Any]]):
+    def write(temporary: str):
+        with gzip.open(temporary, "wt", encoding="utf-8", compresslevel=9) as f:
+            for record in records.values():
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    _write_atomic(path, write)
+
+
+def _load_manifest(directory: str) -> Dict[str, Dict[str, str]]:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(directory: str, manifest: Dict[str, Dict[str, str]]):
+    def write(temporary: str):
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+
+    _write_atomic(os.path.join(directory, MANIFEST), write)
+
+
+def archive_sessions(
+    db: Session,
+    before: Optional[date] = None,
+    directory: Optional[str] = None,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Archive les sessions antérieures à ``before`` (par défaut : aujourd'hui
+    moins la rétention), mois par mois : fichier écrit et synchronisé sur
+    disque avant la suppression des lignes, si bien qu'une interruption ne perd
+    rien (une nouvelle exécution réécrit les mêmes sessions sans doublon).
+    Retourne le nombre de sessions archivées par fichier. Lève
+    ``ArchiveConfigurationError`` (hors ``dry_run``) sans répertoire durable.
+    """
+    from api.core.cache import CacheNamespace, cache
+
+    if before is None:
+        before = date.today() - timedelta(days=settings.archive_retention_days)
+    if not dry_run:
+        directory = archive_directory(directory)
+
+    sessions = db.query(CleaningSession).options(
+        joinedload(CleaningSession.exports)
+    ).filter(CleaningSession.date < before).order_by(CleaningSession.date).all()
+
+    by_month: Dict[str, List[CleaningSession]] = {}
+    for session in sessions:
+        by_month.setdefault(archive_file_name(session.date), []).append(session)
+    if dry_run or not by_month:
+        return {name: len(month_sessions) for name, month_sessions in by_month.items()}
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = _load_manifest(directory)
+    archived: Dict[str, int] = {}
+
+    for name, month_sessions in by_month.items():
+        path = os.path.join(directory, name)
+        records = _read_records(path)
+        for session in month_sessions:
+            record = serialize_session(db, session)
+            if session.statistics is None:
+                record["session"]["statistics"] = compute_session_statistics(db, session)
+            records[str(session.id)] = record
+        _write_records(path, records)
+
+        for session in month_sessions:
+            manifest[str(session.id)] = {"file": name, "date": session.date.isoformat()}
+        _save_manifest(directory, manifest)
+
+        session_ids = [session.id for session in month_sessions]
+        first_day, last_day = month_sessions[0].date, month_sessions[-1].date
+        db.execute(delete(CleaningLog).where(
+            CleaningLog.session_id.in_(session_ids),
+            CleaningLog.session_date.between(first_day, last_day)
+        ))
+        db.execute(delete(Export).where(Export.session_id.in_(session_ids)))
+        db.execute(delete(CleaningSession).where(CleaningSession.id.in_(session_ids)))
+        db.commit()
+        archived[name] = len(month_sessions)
+
+    db.expunge_all()
+    cache.invalidate(CacheNamespace.SESSIONS)
+    return archived
+
+
+# ===== LECTURE =====
+
+class SessionArchive:
+    """
+    Lecture des sessions archivées : index en mémoire chargé depuis le
+    manifeste (rechargé quand il change), fichiers mensuels décodés à la demande.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._index: Dict[str, Dict[str, str]] = {}
+        self._index_mtime: Optional[float] = None
+        self._months: "OrderedDict[tuple[str, float], Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory or settings.archive_dir
+
+    def _refresh_index(self):
+        if not self.directory:
+            self._index, self._index_mtime = {}, None
+            return
+        path = os.path.join(self.directory, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            self._index, self._index_mtime = {}, None
+            return
+        if mtime != self._index_mtime:
+            self._index, self._index_mtime = _load_manifest(self.directory), mtime
+
+    def locate(self, session_id: Any) -> Optional[Dict[str, str]]:
+        """Entrée d'index (fichier, date) d'une session archivée"""
+        with self._lock:
+            self._refresh_index()
+            return self._index.get(str(session_id))
+
+    def _month(self, name: str) -> Dict[str, Dict[str, Any]]:
+        path = os.path.join(self.directory, name)
+        key = (name, os.stat(path).st_mtime)
+        with self._lock:
+            if key in self._months:
+                self._months.move_to_end(key)
+                return self._months[key]
+        records = dict(_read_records(path))
+        with self._lock:
+            self._months[key] = records
+            while len(self._months) > MONTH_CACHE_SIZE:
+                self._months.popitem(last=False)
+        return records
+
+    def get(self, session_id: Any) -> Optional[Dict[str, Any]]:
+        """Ligne d'archive complète (session, logs, exports) ou None"""
+        entry = self.locate(session_id)
+        if entry is None:
+            return None
+        try:
+            return self._month(entry["file"]).get(str(session_id))
+        except FileNotFoundError:
+            return None
+
+    def etag(self, session_id: Any) -> Optional[str]:
+        """Validateur d'une session archivée (immuable tant que son fichier ne change pas)"""
+        entry = self.locate(session_id)
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, entry["file"])
+        try:
+            return f'W/"archive-{int(os.stat(path).st_mtime)}-{session_id}"'
+        except FileNotFoundError:
+            return None
+
+
+def archived_log_response(log: Dict[str, Any], session: Dict[str, Any]) -> Dict[str, Any]:
+    """Log archivé sous la forme de ``CleaningLogResponse`` (références figées à l'archivage)"""
+    assigned_task = log.get("assigned_task")
+    if assigned_task is not None:
+        frequency = assigned_task.get("frequency") or {}
+        assigned_task = {
+            **assigned_task,
+            "frequency_days": frequency,
+            "times_per_day": frequency.get("times_per_day", 1),
+        }
+    return {
+        "id": log["id"],
+        "session": session,
+        "assigned_task": assigned_task,
+        "performer": log.get("performed_by"),
+        "status": log.get("status"),
+        "notes": log.get("note"),
+        "photos": log.get("photo_urls"),
+        "timestamp": log.get("created_at"),
+        "created_at": log.get("created_at"),
+    }
+
+
+# Instance globale (index partagé par les requêtes du worker)
+session_archive = SessionArchive()
@@ -6,6 +6,8 @@ from api.core.database import SessionLocal
 from api.core.config import settings
 from api.models.session import CleaningSession, CleaningLog
 from api.models.export import Export
+from api.services.session_service import LOG_RELATIONS
+from api.core.metrics import export_jobs_queued
 
 def generate_pdf_report_task(session_id: uuid.UUID):
     """Génère un rapport PDF pour une session"""
@@ -15,7 +17,7 @@ def generate_pdf_report_task(session_id: uuid.UUID):
         from jinja2 import Template
         
         session = db.query(CleaningSession).filter(CleaningSession.id == session_id).first()
-        logs = db.query(CleaningLog).filter(CleaningLog.session_id == session_id).all()
+        logs = db.query(CleaningLog).options(*LOG_RELATIONS).filter(CleaningLog.session_id == session_id).all()
         
         html_template = """
         <!DOCTYPE html>
@@ -74,6 +76,7 @@ def generate_pdf_report_task(session_id: uuid.UUID):
     except Exception as e:
         print(f"Erreur génération PDF: {e}")
     finally:
+        export_jobs_queued.dec(type="pdf")
         db.close()
 
 def generate_zip_photos_task(session_id: uuid.UUID):
@@ -112,4 +115,5 @@ def generate_zip_photos_task(session_id: uuid.UUID):
     except Exception as e:
         print(f"Erreur génération ZIP: {e}")
     finally:
+        export_jobs_queued.dec(type="zip")
         db.close()
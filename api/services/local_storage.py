@@ -11,7 +11,6 @@ from pathlib import Path
 from datetime import datetime
 import aiofiles
 from fastapi import UploadFile, HTTPException
-from PIL import Image
 import io
 
 logger = logging.getLogger(__name__)
@@ -71,6 +70,7 @@ class LocalStorageService:
 
     async def _optimize_image(self, file_content: bytes, filename: str) -> bytes:
         """Optimise et compresse l'image"""
+        from PIL import Image  # Import différé : Pillow n'est chargé qu'au premier upload
 
         try:
             # Ouvrir l'image avec Pillow
@@ -0,0 +1,139 @@
+"""
+Partitionnement mensuel de ``cleaning_logs`` (PostgreSQL, RANGE sur ``session_date``).
+
+Chaque mois a sa partition ``cleaning_logs_yYYYYmMM`` : les requêtes bornées
+par ``session_date`` (semaine, mois) ne lisent qu'une ou deux partitions, et un
+mois ancien se détache (``DETACH PARTITION``) sans réécrire la table.
+
+Les partitions futures sont créées à l'avance par une tâche de fond de chaque
+worker (lifespan, ``log_partition_check_interval``), indépendante du scheduler ;
+un verrou consultatif PostgreSQL sérialise les workers. Un log hors de toute
+partition mensuelle (session ancienne ou lointaine) est rangé dans la
+partition ``DEFAULT`` au lieu de faire échouer l'INSERT ; la tâche crée
+ensuite la partition de son mois et y déplace ces lignes. Sur une base non
+partitionnée (SQLite, schéma créé sans la migration) tout est sans effet.
+"""
+
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.core.config import settings
+
+PARENT_TABLE = "cleaning_logs"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+# Clé du verrou consultatif : un seul worker crée les partitions à la fois
+PARTITION_LOCK_KEY = 0x6C6F6773
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(db: Session) -> bool:
+    """Vrai si cleaning_logs est une table partitionnée PostgreSQL"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)"
+    ), {"table": PARENT_TABLE}).scalar()
+
+
+def list_log_partitions(db: Session) -> List[str]:
+    """Partitions mensuelles actuellement attachées (hors DEFAULT), par ordre chronologique"""
+    if not is_partitioned(db):
+        return []
+    return list(db.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = :table AND child.relname <> :default ORDER BY child.relname"
+    ), {"table": PARENT_TABLE, "default": DEFAULT_PARTITION}).scalars())
+
+
+def _default_partition_months(db: Session) -> List[date]:
+    """Mois des logs rangés dans la partition DEFAULT (faute de partition mensuelle)"""
+    exists = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar()
+    if not exists:
+        return []
+    return list(db.execute(text(
+        f"SELECT DISTINCT date_trunc('month', session_date)::date FROM {DEFAULT_PARTITION}"
+    )).scalars())
+
+
+def _create_partition(db: Session, month: date, from_default: bool):
+    """
+    Crée la partition d'un mois. Si la partition DEFAULT contient des lignes
+    de ce mois, elles sont déplacées dans une table attachée ensuite (un
+    ``PARTITION OF`` direct échouerait sur ces lignes).
+    """
+    name = partition_name(month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    if not from_default:
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+        return
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE session_date >= :start AND session_date < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), {"start": month, "end": add_months(month, 1)})
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+
+
+def ensure_log_partitions(
+    db: Session,
+    months_ahead: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Crée les partitions du mois courant, des ``months_ahead`` mois suivants
+    et des mois (passés ou futurs) dont des logs attendent dans la partition
+    DEFAULT, si elles n'existent pas ; retourne les noms des partitions créées.
+    """
+    if not is_partitioned(db):
+        return []
+    if months_ahead is None:
+        months_ahead = settings.log_partition_months_ahead
+
+    # Relâché au commit ; les partitions créées entre-temps par un autre worker sont relues
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    existing = set(list_log_partitions(db))
+    current = month_start(today or date.today())
+    in_default = set(_default_partition_months(db))
+    months = in_default | {add_months(current, offset) for offset in range(months_ahead + 1)}
+    created = []
+    for month in sorted(months):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        _create_partition(db, month, from_default=month in in_default)
+        created.append(name)
+    db.commit()
+    return created
+
+
+def detach_log_partition(db: Session, month: date) -> Optional[str]:
+    """
+    Détache la partition d'un mois (opération de catalogue, sans copie) : la
+    table reste disponible sous son nom pour archivage ou suppression.
+    """
+    name = partition_name(month_start(month))
+    if name not in list_log_partitions(db):
+        return None
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    db.commit()
+    return name
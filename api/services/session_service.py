@@ -1,16 +1,526 @@
-from datetime import date
-from sqlalchemy.orm import Session
-from api.models.session import CleaningSession
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import and_, case, event, func, inspect, literal, null, or_, select, update
+from sqlalchemy.orm import Session, attributes, joinedload, selectinload
+from api.models.session import CleaningSession, CleaningLog, SessionStatus, LogStatus
+from api.models.task import AssignedTask
+from api.models.performer import Performer
+from api.models.room import Room
+from api.schemas.session import FinalizeTaskItem, FinalizeTaskState, LogStatusChange, LogStatusChangeResult
+
+# Relations affichées avec un log (tâche, pièce, modèle de tâche, exécutant)
+LOG_RELATIONS = (
+    joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.room),
+    joinedload(CleaningLog.assigned_task).joinedload(AssignedTask.task_template),
+    joinedload(CleaningLog.performed_by),
+)
+
+# Même graphe pour le format normalisé : chaque entité liée lue une seule fois (IN)
+NORMALIZED_LOG_RELATIONS = (
+    selectinload(CleaningLog.assigned_task).selectinload(AssignedTask.room),
+    selectinload(CleaningLog.assigned_task).selectinload(AssignedTask.task_template),
+    selectinload(CleaningLog.performed_by),
+)
+
+def _related(item, key: str):
+    return item.get(key) if isinstance(item, dict) else getattr(item, key)
+
+def normalize_session_logs(session_id, logs) -> Dict[str, Any]:
+    """
+    Logs à plat (clés étrangères) et carte ``included`` des tâches, pièces,
+    modèles et exécutants référencés, chacun une seule fois. Accepte des logs
+    ORM ou des logs archivés (dictionnaires imbriqués).
+    """
+    included: Dict[str, Dict[str, Any]] = {
+        "assigned_tasks": {}, "rooms": {}, "task_templates": {}, "performers": {}
+    }
+
+    def include(key: str, item):
+        if item is not None:
+            included[key].setdefault(str(_related(item, "id")), item)
+
+    for log in logs:
+        assigned_task = _related(log, "assigned_task")
+        include("assigned_tasks", assigned_task)
+        if assigned_task is not None:
+            include("rooms", _related(assigned_task, "room"))
+            include("task_templates", _related(assigned_task, "task_template"))
+        include("performers", _related(log, "performed_by"))
+
+    return {"session_id": session_id, "logs": logs, "included": included}
 
 def get_or_create_today_session(db: Session) -> CleaningSession:
     """Récupère ou crée la session du jour"""
     today = date.today()
     session = db.query(CleaningSession).filter(CleaningSession.date == today).first()
-    
+
     if not session:
         session = CleaningSession(date=today)
         db.add(session)
         db.commit()
         db.refresh(session)
-    
+
     return session
+
+# ===== COMPTEURS DE STATUT PAR SESSION =====
+
+# Statut de log -> colonne compteur de la session
+STATUS_COUNTERS: Dict[LogStatus, str] = {
+    LogStatus.FAIT: "fait_count",
+    LogStatus.PARTIEL: "partiel_count",
+    LogStatus.REPORTE: "reporte_count",
+    LogStatus.IMPOSSIBLE: "impossible_count",
+}
+COUNTER_COLUMNS = (*STATUS_COUNTERS.values(), "total_count")
+COUNTER_ATTRIBUTES = (*COUNTER_COLUMNS, "status", "statistics", "updated_at")
+
+def session_status_case(fait, impossible, reporte, total):
+    """
+    Expression SQL du statut de session à partir des compteurs :
+    tout fait/impossible -> complétée, tout reporté -> en cours, sinon incomplète.
+    """
+    status_type = CleaningSession.status.type
+    return case(
+        (fait + impossible == total, literal(SessionStatus.COMPLETEE, status_type)),
+        (reporte == total, literal(SessionStatus.EN_COURS, status_type)),
+        else_=literal(SessionStatus.INCOMPLETE, status_type)
+    )
+
+def _counter_deltas_statement(session_id: uuid.UUID, deltas: Counter):
+    """UPDATE atomique : compteurs += deltas et statut recalculé dans la même instruction"""
+    table = CleaningSession.__table__
+    # Les expressions du SET lisent les valeurs d'avant l'UPDATE : on y ajoute les deltas
+    new = {column: table.c[column] + deltas.get(column, 0) for column in COUNTER_COLUMNS}
+    return update(table).where(table.c.id == session_id).values(
+        **new,
+        status=session_status_case(new["fait_count"], new["impossible_count"], new["reporte_count"], new["total_count"]),
+        statistics=null()
+    )
+
+def _rebuild_statement(session_id: Optional[uuid.UUID] = None):
+    table = CleaningSession.__table__
+    logs = CleaningLog.__table__
+
+    def count(*criteria):
+        return select(func.count()).select_from(logs).where(
+            logs.c.session_id == table.c.id, *criteria
+        ).scalar_subquery()
+
+    counts = {column: count(logs.c.status == status) for status, column in STATUS_COUNTERS.items()}
+    counts["total_count"] = count()
+
+    statement = update(table).values(
+        **counts,
+        status=session_status_case(counts["fait_count"], counts["impossible_count"], counts["reporte_count"], counts["total_count"]),
+        statistics=null()
+    )
+    if session_id is not None:
+        statement = statement.where(table.c.id == session_id)
+    return statement
+
+def rebuild_session_counters(db: Session, session_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Recalcule compteurs et statut depuis les logs (une session ou toutes).
+    Retourne le nombre de sessions mises à jour.
+    """
+    return db.connection().execute(_rebuild_statement(session_id)).rowcount
+
+def find_inconsistent_sessions(db: Session) -> List[uuid.UUID]:
+    """Sessions dont les compteurs ne correspondent plus aux logs"""
+    table = CleaningSession.__table__
+    logs = CleaningLog.__table__
+    actual = select(
+        logs.c.session_id,
+        *(func.count().filter(logs.c.status == status).label(column) for status, column in STATUS_COUNTERS.items()),
+        func.count().label("total_count")
+    ).group_by(logs.c.session_id).subquery()
+
+    mismatch = or_(*(
+        table.c[column] != func.coalesce(actual.c[column], 0)
+        for column in COUNTER_COLUMNS
+    ))
+    rows = db.connection().execute(
+        select(table.c.id).select_from(
+            table.outerjoin(actual, actual.c.session_id == table.c.id)
+        ).where(mismatch)
+    )
+    return [session_id for (session_id,) in rows]
+
+def check_session_counters(db: Session) -> List[uuid.UUID]:
+    """Vérifie les compteurs et reconstruit ceux des sessions incohérentes"""
+    session_ids = find_inconsistent_sessions(db)
+    for session_id in session_ids:
+        rebuild_session_counters(db, session_id)
+    db.commit()
+    return session_ids
+
+def _lock_changed_logs(session: Session, flush_context, instances):
+    """
+    before_flush : verrouille (FOR UPDATE) les logs dont le statut change et
+    relit leur statut en base. Le delta des compteurs part de ce statut et non
+    de la valeur chargée en mémoire : deux mises à jour concurrentes ou
+    rejouées du même log (REPORTE -> FAIT envoyé deux fois) ne comptent
+    qu'une fois, la seconde attendant le commit de la première.
+    """
+    log_ids = [
+        log.id for log in session.dirty
+        if isinstance(log, CleaningLog) and log.id is not None
+        and attributes.get_history(log, "status").added
+    ]
+    if not log_ids:
+        return
+    table = CleaningLog.__table__
+    rows = session.connection().execute(
+        select(table.c.id, table.c.status).where(table.c.id.in_(log_ids)).with_for_update()
+    )
+    session.info["locked_log_statuses"] = dict(rows.all())
+
+def _collect_counter_deltas(session: Session, flush_context):
+    """
+    after_flush : deltas de compteurs par session à partir de l'historique des
+    logs, appliqués par un UPDATE relatif ; prépare les événements à diffuser.
+    """
+    deltas: Dict[uuid.UUID, Counter] = {}
+    rebuild: Set[uuid.UUID] = session.info.setdefault("session_counter_rebuild", set())
+    events: Dict[uuid.UUID, Dict[str, Any]] = session.info.setdefault("session_events", {})
+    locked_statuses = session.info.pop("locked_log_statuses", {})
+
+    def log_event(log, status, deleted=False):
+        changed = events.setdefault(log.session_id, {"logs": {}})["logs"]
+        changed[str(log.id)] = {
+            "id": str(log.id),
+            "status": status.value if status else None,
+            "performed_by_id": None if deleted else log.performed_by_id,
+            "deleted": deleted,
+        }
+
+    def add(session_id, status, amount):
+        delta = deltas.setdefault(session_id, Counter())
+        delta["total_count"] += amount
+        if status in STATUS_COUNTERS:
+            delta[STATUS_COUNTERS[status]] += amount
+
+    for log in session.new:
+        if isinstance(log, CleaningLog) and log.session_id:
+            add(log.session_id, log.status, 1)
+            log_event(log, log.status)
+
+    for log in session.deleted:
+        if isinstance(log, CleaningLog) and log.session_id:
+            if "status" in log.__dict__:
+                add(log.session_id, log.__dict__["status"], -1)
+            else:
+                rebuild.add(log.session_id)
+            log_event(log, None, deleted=True)
+
+    for log in session.dirty:
+        if not isinstance(log, CleaningLog) or not log.session_id:
+            continue
+        history = attributes.get_history(log, "status")
+        if not history.added:
+            continue
+        log_event(log, history.added[0])
+        if log.id in locked_statuses:
+            old_status = locked_statuses[log.id]
+        elif history.deleted:
+            old_status = history.deleted[0]
+        else:
+            # Ancienne valeur inconnue : delta inconnu
+            rebuild.add(log.session_id)
+            continue
+        new_status = history.added[0]
+        if old_status != new_status:
+            delta = deltas.setdefault(log.session_id, Counter())
+            if old_status in STATUS_COUNTERS:
+                delta[STATUS_COUNTERS[old_status]] -= 1
+            if new_status in STATUS_COUNTERS:
+                delta[STATUS_COUNTERS[new_status]] += 1
+
+    connection = session.connection()
+    for session_id, delta in deltas.items():
+        if session_id not in rebuild and any(delta.values()):
+            statement = _counter_deltas_statement(session_id, delta).returning(*_returned_columns())
+            _record_counters(events, session_id, connection.execute(statement).first())
+    session.info.setdefault("session_counter_expire", set()).update(deltas)
+
+def _returned_columns():
+    table = CleaningSession.__table__
+    return (table.c.status, *(table.c[column] for column in COUNTER_COLUMNS))
+
+def _record_counters(events: Dict[uuid.UUID, Dict[str, Any]], session_id: uuid.UUID, row):
+    """Compteurs à jour (RETURNING de l'UPDATE) joints à l'événement de la session"""
+    if row is None:
+        return
+    status, *counts = row
+    events.setdefault(session_id, {"logs": {}})["counters"] = {
+        "status": status.value if status else None,
+        **dict(zip(COUNTER_COLUMNS, counts)),
+    }
+
+def _apply_counter_rebuilds(session: Session, flush_context):
+    """after_flush_postexec : reconstructions puis expiration des compteurs en mémoire"""
+    touched = session.info.pop("session_counter_expire", set())
+    events = session.info.setdefault("session_events", {})
+    for session_id in session.info.pop("session_counter_rebuild", set()):
+        statement = _rebuild_statement(session_id).returning(*_returned_columns())
+        _record_counters(events, session_id, session.connection().execute(statement).first())
+        touched.add(session_id)
+
+    mapper = inspect(CleaningSession)
+    for session_id in touched:
+        instance = session.identity_map.get(mapper.identity_key_from_primary_key((session_id,)))
+        if instance is not None:
+            session.expire(instance, COUNTER_ATTRIBUTES)
+
+def _publish_session_events(session: Session):
+    """after_commit : diffuse la progression des sessions modifiées (SSE)"""
+    events = session.info.pop("session_events", None)
+    if not events:
+        return
+    from api.core.events import session_events
+
+    for session_id, data in events.items():
+        session_events.publish(str(session_id), {
+            "session_id": str(session_id),
+            "logs": list(data["logs"].values()),
+            "counters": data.get("counters"),
+        })
+
+def _discard_session_events(session: Session):
+    session.info.pop("locked_log_statuses", None)
+    session.info.pop("session_events", None)
+    session.info.pop("session_counter_rebuild", None)
+    session.info.pop("session_counter_expire", None)
+
+def _clear_statistics_on_reopen(target: CleaningSession, value, oldvalue, initiator):
+    """Une session qui quitte l'état complété perd ses statistiques figées"""
+    if value != SessionStatus.COMPLETEE:
+        target.statistics = None
+
+def setup_session_counters(session_class=Session):
+    """
+    Maintient les compteurs de statut des sessions à chaque flush modifiant des
+    logs et diffuse la progression après commit.
+    """
+    if event.contains(session_class, "after_flush", _collect_counter_deltas):
+        return
+    event.listen(session_class, "before_flush", _lock_changed_logs)
+    event.listen(session_class, "after_flush", _collect_counter_deltas)
+    event.listen(session_class, "after_flush_postexec", _apply_counter_rebuilds)
+    event.listen(session_class, "after_commit", _publish_session_events)
+    event.listen(session_class, "after_rollback", _discard_session_events)
+    event.listen(CleaningSession.status, "set", _clear_statistics_on_reopen)
+
+def apply_log_status_changes(
+    db: Session,
+    session: CleaningSession,
+    changes: List[LogStatusChange],
+    recorded_by_id: uuid.UUID
+) -> List[LogStatusChangeResult]:
+    """
+    Applique un lot de changements de statut sur les logs d'une session.
+
+    Logs et exécutants sont chargés en une requête chacun ; les changements
+    invalides sont rapportés individuellement sans bloquer les autres. Le
+    statut de la session est recalculé une seule fois (au flush). Ne commit pas.
+    """
+    log_ids = {change.log_id for change in changes}
+    rows = db.query(CleaningLog, AssignedTask.default_performer_id).outerjoin(
+        AssignedTask, AssignedTask.id == CleaningLog.assigned_task_id
+    ).filter(
+        CleaningLog.session_id == session.id,
+        CleaningLog.id.in_(log_ids)
+    ).all()
+    logs = {log.id: (log, default_performer_id) for log, default_performer_id in rows}
+
+    performer_ids = {change.performed_by_id for change in changes if change.performed_by_id}
+    performer_ids.update(default_id for _, default_id in logs.values() if default_id)
+    known_performers = {
+        performer_id for (performer_id,) in db.query(Performer.id).filter(
+            Performer.id.in_(performer_ids),
+            Performer.is_active == True
+        ).all()
+    } if performer_ids else set()
+
+    now = datetime.utcnow()
+    results = []
+    for change in changes:
+        entry = logs.get(change.log_id)
+        if entry is None:
+            results.append(LogStatusChangeResult(log_id=change.log_id, ok=False, error="Log non trouvé dans cette session"))
+            continue
+
+        log, default_performer_id = entry
+        performer_id = change.performed_by_id or default_performer_id
+        if performer_id is None:
+            results.append(LogStatusChangeResult(log_id=change.log_id, ok=False, error="Pas d'exécutant par défaut pour cette tâche"))
+            continue
+        if performer_id not in known_performers:
+            results.append(LogStatusChangeResult(log_id=change.log_id, ok=False, error="Exécutant non trouvé"))
+            continue
+
+        log.performed_by_id = performer_id
+        log.status = change.status
+        log.performed_at = now
+        log.recorded_by_id = recorded_by_id
+        if change.note:
+            log.note = change.note
+        results.append(LogStatusChangeResult(log_id=change.log_id, ok=True, status=change.status))
+
+    # Un seul flush : UPDATE des logs puis deltas de compteurs et statut de la session
+    db.flush()
+    return results
+
+# Statuts temporaires de l'application mobile -> statut du log
+FINALIZE_STATUS_MAPPING = {
+    FinalizeTaskState.DONE: LogStatus.FAIT,
+    FinalizeTaskState.PARTIAL: LogStatus.PARTIEL,
+    FinalizeTaskState.SKIPPED: LogStatus.REPORTE,
+    FinalizeTaskState.BLOCKED: LogStatus.IMPOSSIBLE,
+    FinalizeTaskState.TODO: LogStatus.REPORTE,
+    FinalizeTaskState.IN_PROGRESS: LogStatus.REPORTE,
+}
+
+def apply_finalize_batch(
+    db: Session,
+    logs_by_task: Dict[uuid.UUID, CleaningLog],
+    performers_by_name: Dict[str, Optional[uuid.UUID]],
+    items: List[FinalizeTaskItem]
+) -> int:
+    """
+    Applique un lot de statuts temporaires (finalisation) aux logs de la
+    session, indexés par tâche assignée. Les exécutants cités et pas encore
+    résolus sont chargés en une requête par lot (``performers_by_name`` sert
+    de cache d'un lot à l'autre). Flush sans commit ; retourne le nombre de
+    logs mis à jour (les tâches absentes de la session sont ignorées).
+    """
+    names = {item.status.performed_by for item in items if item.status.performed_by} - performers_by_name.keys()
+    if names:
+        found = dict(db.query(Performer.name, Performer.id).filter(Performer.name.in_(names)).all())
+        performers_by_name.update({name: found.get(name) for name in names})
+
+    updated = 0
+    for item in items:
+        log = logs_by_task.get(item.task_id)
+        if log is None:
+            continue
+        status_info = item.status
+        log.status = FINALIZE_STATUS_MAPPING[status_info.status]
+        log.note = status_info.notes
+        if status_info.photos:
+            log.photo_urls = status_info.photos
+        performer_id = performers_by_name.get(status_info.performed_by) if status_info.performed_by else None
+        if performer_id:
+            log.performed_by_id = performer_id
+        if status_info.completed_at:
+            log.performed_at = status_info.completed_at
+        updated += 1
+
+    db.flush()
+    return updated
+
+# ===== STATISTIQUES =====
+
+def _minutes(start, end):
+    """Durée en minutes entre deux horodatages (SQL)"""
+    return func.extract("epoch", end - start) / 60
+
+def compute_session_statistics(db: Session, session: CleaningSession) -> Dict[str, Any]:
+    """
+    Statistiques d'une session calculées en SQL (agrégats, sans charger les
+    logs) : compteurs de la session, puis trois requêtes groupées.
+    """
+    is_done = CleaningLog.status == LogStatus.FAIT
+    has_duration = and_(CleaningLog.performed_at.isnot(None), CleaningLog.created_at.isnot(None))
+    duration = _minutes(CleaningLog.created_at, CleaningLog.performed_at)
+
+    average_duration, photo_logs, notes_count = db.query(
+        func.avg(duration).filter(is_done, has_duration),
+        func.count().filter(func.json_array_length(CleaningLog.photo_urls) > 0),
+        func.count().filter(CleaningLog.note.isnot(None), CleaningLog.note != "")
+    ).filter(CleaningLog.session_id == session.id).one()
+
+    # Statistiques par pièce
+    room_keys = {
+        LogStatus.FAIT: "completed",
+        LogStatus.PARTIEL: "partial",
+        LogStatus.REPORTE: "postponed",
+        LogStatus.IMPOSSIBLE: "impossible",
+    }
+    stats_by_room: Dict[str, Dict[str, int]] = {}
+    room_rows = db.query(Room.name, CleaningLog.status, func.count()).select_from(CleaningLog).join(
+        AssignedTask, AssignedTask.id == CleaningLog.assigned_task_id
+    ).join(
+        Room, Room.id == AssignedTask.room_id
+    ).filter(
+        CleaningLog.session_id == session.id
+    ).group_by(Room.name, CleaningLog.status).all()
+    for room_name, log_status, count in room_rows:
+        room = stats_by_room.setdefault(room_name, {"total": 0, **{key: 0 for key in room_keys.values()}})
+        room["total"] += count
+        if log_status in room_keys:
+            room[room_keys[log_status]] += count
+
+    # Top performers (tâches faites ou partielles)
+    tasks_completed = func.count().filter(is_done)
+    performer_rows = db.query(
+        CleaningLog.performed_by_id,
+        func.coalesce(Performer.name, "Inconnu"),
+        tasks_completed,
+        func.count().filter(CleaningLog.status == LogStatus.PARTIEL),
+        func.coalesce(func.sum(duration).filter(has_duration), 0)
+    ).outerjoin(
+        Performer, Performer.id == CleaningLog.performed_by_id
+    ).filter(
+        CleaningLog.session_id == session.id,
+        CleaningLog.performed_by_id.isnot(None),
+        CleaningLog.status.in_([LogStatus.FAIT, LogStatus.PARTIEL])
+    ).group_by(
+        CleaningLog.performed_by_id, Performer.name
+    ).order_by(tasks_completed.desc()).limit(5).all()
+    top_performers = [
+        {
+            "id": str(performer_id),
+            "name": name,
+            "tasks_completed": completed,
+            "tasks_partial": partial,
+            "total_duration": float(total_duration),
+        }
+        for performer_id, name, completed, partial, total_duration in performer_rows
+    ]
+
+    total_tasks = session.total_count
+    return {
+        "session_id": str(session.id),
+        "date": session.date.isoformat(),
+        "status": session.status.value,
+        "total_tasks": total_tasks,
+        "completed_tasks": session.fait_count,
+        "partial_tasks": session.partiel_count,
+        "postponed_tasks": session.reporte_count,
+        "impossible_tasks": session.impossible_count,
+        "completion_rate": (session.fait_count / total_tasks * 100) if total_tasks > 0 else 0,
+        "average_duration_minutes": round(float(average_duration or 0), 1),
+        "stats_by_room": stats_by_room,
+        "top_performers": top_performers,
+        "has_photos": photo_logs > 0,
+        "notes_count": notes_count
+    }
+
+def persist_session_statistics(db: Session, session: CleaningSession, statistics: Dict[str, Any]):
+    """
+    Fige les statistiques d'une session complétée, seulement si elle n'a pas
+    changé depuis leur calcul (updated_at inchangé) ; updated_at est conservé.
+    """
+    table = CleaningSession.__table__
+    db.execute(
+        update(table).where(
+            table.c.id == session.id,
+            table.c.updated_at == session.updated_at,
+            table.c.status == SessionStatus.COMPLETEE
+        ).values(statistics=statistics, updated_at=table.c.updated_at)
+    )
+    db.commit()
+
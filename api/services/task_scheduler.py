@@ -1,14 +1,22 @@
 # api/services/task_scheduler.py - NOUVEAU FICHIER COMPLET
 
+import uuid
 from datetime import date, datetime, timedelta
 from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from api.models.task import AssignedTask
-from api.models.session import CleaningSession, CleaningLog, LogStatus
+from api.models.session import CleaningLog, LogStatus
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Relations d'une tâche assignée lues par le planning (chargées dans la même requête)
+ASSIGNED_TASK_RELATIONS = (
+    joinedload(AssignedTask.task_template),
+    joinedload(AssignedTask.room),
+    joinedload(AssignedTask.default_performer),
+)
+
 def should_task_be_done_today(task: AssignedTask, check_date: date) -> bool:
     """Détermine si une tâche doit être effectuée à une date donnée selon sa fréquence."""
     if not task.is_active:
@@ -36,18 +44,20 @@ def should_task_be_done_today(task: AssignedTask, check_date: date) -> bool:
     logger.warning(f"Type de fréquence inconnu pour la tâche {task.id}: {freq_type}")
     return False
 
-def get_tasks_for_date(db: Session, target_date: date) -> List[AssignedTask]:
-    """Récupère toutes les tâches qui doivent être effectuées à une date donnée."""
-    all_tasks = db.query(AssignedTask).filter(AssignedTask.is_active == True).all()
-    
-    tasks_for_date = []
-    for task in all_tasks:
-        if should_task_be_done_today(task, target_date):
-            tasks_for_date.append(task)
-    
+def get_active_tasks(db: Session) -> List[AssignedTask]:
+    """Tâches actives avec modèle, pièce et exécutant par défaut (une requête)."""
+    return db.query(AssignedTask).options(*ASSIGNED_TASK_RELATIONS).filter(AssignedTask.is_active == True).all()
+
+def filter_tasks_for_date(tasks: List[AssignedTask], target_date: date) -> List[AssignedTask]:
+    """Tâches dues à une date donnée, dans l'ordre de passage."""
+    tasks_for_date = [task for task in tasks if should_task_be_done_today(task, target_date)]
     tasks_for_date.sort(key=lambda t: (t.room_id, t.order_in_room))
     return tasks_for_date
 
+def get_tasks_for_date(db: Session, target_date: date) -> List[AssignedTask]:
+    """Récupère toutes les tâches qui doivent être effectuées à une date donnée."""
+    return filter_tasks_for_date(get_active_tasks(db), target_date)
+
 def get_suggested_schedule(db: Session, target_date: date) -> List[Dict[str, Any]]:
     """Génère un planning suggéré pour une journée."""
     tasks = get_tasks_for_date(db, target_date)
@@ -82,22 +92,21 @@ def get_suggested_schedule(db: Session, target_date: date) -> List[Dict[str, Any
 
 def calculate_workload_distribution(db: Session, start_date: date, end_date: date) -> Dict[str, Any]:
     """Calcule la distribution de la charge de travail sur une période."""
-    from api.models.performer import Performer
+    # Tâches chargées une fois pour toute la période, filtrées jour par jour
+    active_tasks = get_active_tasks(db)
     
     distribution = {}
     current_date = start_date
     
     while current_date <= end_date:
-        tasks = get_tasks_for_date(db, current_date)
+        tasks = filter_tasks_for_date(active_tasks, current_date)
         
         for task in tasks:
             if task.default_performer_id:
                 performer_id = str(task.default_performer_id)
                 
                 if performer_id not in distribution:
-                    performer = db.query(Performer).filter(
-                        Performer.id == task.default_performer_id
-                    ).first()
+                    performer = task.default_performer
                     
                     distribution[performer_id] = {
                         "performer_name": performer.name if performer else "Inconnu",
@@ -130,8 +139,8 @@ def get_overdue_tasks(db: Session) -> List[Dict[str, Any]]:
     """Récupère les tâches en retard (reportées sur plusieurs jours)."""
     week_ago = date.today() - timedelta(days=7)
     
-    postponed_logs = db.query(CleaningLog).join(CleaningSession).filter(
-        CleaningSession.date >= week_ago,
+    postponed_logs = db.query(CleaningLog).filter(
+        CleaningLog.session_date >= week_ago,
         CleaningLog.status == LogStatus.REPORTE
     ).all()
     
@@ -147,13 +156,21 @@ def get_overdue_tasks(db: Session) -> List[Dict[str, Any]]:
             }
         
         task_postpone_count[task_id]["postpone_count"] += 1
-        task_postpone_count[task_id]["dates"].append(log.session.date.isoformat())
+        task_postpone_count[task_id]["dates"].append(log.session_date.isoformat())
+    
+    overdue_ids = [uuid.UUID(task_id) for task_id, info in task_postpone_count.items() if info["postpone_count"] >= 2]
+    tasks = {
+        str(task.id): task
+        for task in db.query(AssignedTask).options(*ASSIGNED_TASK_RELATIONS).filter(
+            AssignedTask.id.in_(overdue_ids)
+        ).all()
+    } if overdue_ids else {}
     
     overdue_tasks = []
     
     for task_id, info in task_postpone_count.items():
         if info["postpone_count"] >= 2:
-            task = db.query(AssignedTask).filter(AssignedTask.id == task_id).first()
+            task = tasks.get(task_id)
             
             if task:
                 overdue_tasks.append({
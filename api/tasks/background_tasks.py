@@ -1,6 +1,9 @@
+import asyncio
 from datetime import date
 from api.core.database import SessionLocal
 from api.models.session import CleaningSession
+from api.services.session_service import check_session_counters
+from api.services.partition_service import ensure_log_partitions
 
 async def generate_daily_sessions():
     """Génère automatiquement les sessions de nettoyage quotidiennes"""
@@ -22,3 +25,35 @@ async def generate_daily_sessions():
         print(f"Erreur lors de la génération de session: {e}")
     finally:
         db.close()
+
+async def check_session_counters_job():
+    """Reconstruit les compteurs de statut des sessions incohérentes avec leurs logs"""
+    db = SessionLocal()
+    try:
+        repaired = check_session_counters(db)
+        if repaired:
+            print(f"Compteurs reconstruits pour {len(repaired)} session(s)")
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors de la vérification des compteurs: {e}")
+    finally:
+        db.close()
+
+def ensure_log_partitions_job():
+    """Crée à l'avance les partitions mensuelles de cleaning_logs"""
+    db = SessionLocal()
+    try:
+        created = ensure_log_partitions(db)
+        if created:
+            print(f"Partitions créées: {', '.join(created)}")
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors de la création des partitions: {e}")
+    finally:
+        db.close()
+
+async def maintain_log_partitions(interval: float):
+    """Au démarrage puis toutes les ``interval`` secondes, hors de la boucle d'événements"""
+    while True:
+        await asyncio.to_thread(ensure_log_partitions_job)
+        await asyncio.sleep(interval)
@@ -13,7 +13,6 @@ from datetime import datetime, timedelta
 import re
 from pathlib import Path
 import mimetypes
-import bleach
 from fastapi import UploadFile, HTTPException, status
 
 # Patterns de validation sécurisés
@@ -222,6 +221,8 @@ def sanitize_html(html: str, allowed_tags: Optional[list] = None) -> str:
     Returns:
         HTML nettoyé
     """
+    import bleach  # Import différé (coûteux, rarement utilisé)
+    
     if allowed_tags is None:
         allowed_tags = ['p', 'br', 'strong', 'em', 'u', 'ul', 'ol', 'li']
     
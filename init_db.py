@@ -48,24 +48,12 @@ def create_tables():
             test_row = result.fetchone()
             print(f"SUCCESS - Connexion reussie: {test_row}")
         
-        print("Import des modeles avec types UUID coherents...")
-        
-        # Import de la base
-        from api.models.base import Base
-        
-        # Import de tous les modèles
-        from api.models.user import User
-        from api.models.performer import Performer  
-        from api.models.room import Room
-        from api.models.task import TaskTemplate, AssignedTask
-        from api.models.session import CleaningSession, CleaningLog
-        from api.models.export import Export
-        
-        print("SUCCESS - Tous les modeles importes")
-        
-        print("Creation des tables...")
-        Base.metadata.create_all(bind=engine)
-        print("SUCCESS - Tables creees avec succes")
+        # Base vide : schéma des modèles (partitions comprises) enregistré à la
+        # dernière révision Alembic ; base existante : migrations Alembic
+        print("Creation ou migration du schema...")
+        from api.core.migrations import upgrade_database
+        outcome = upgrade_database(engine)
+        print(f"SUCCESS - Schema a jour ({outcome})")
         
         # Vérifier les tables créées
         with engine.connect() as conn:
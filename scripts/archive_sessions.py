@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Archive les sessions plus anciennes que la rétention dans des fichiers NDJSON
+compressés par mois (voir api/services/archive_service.py), puis les supprime
+des tables. Les routes de sessions continuent de les servir depuis l'archive.
+
+Requiert ARCHIVE_DIR (ou --directory) : chemin absolu sur un volume persistant.
+
+Usage:
+    python scripts/archive_sessions.py [--retention-days 730] [--before 2024-01-01] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.core.config import settings
+from api.core.database import SessionLocal
+from api.services.archive_service import ArchiveConfigurationError, archive_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=settings.archive_retention_days)
+    parser.add_argument("--before", type=date.fromisoformat, help="Date limite (exclue), prioritaire sur la rétention")
+    parser.add_argument("--directory", default=settings.archive_dir, help="Chemin absolu sur un volume persistant")
+    parser.add_argument("--dry-run", action="store_true", help="Liste les sessions concernées sans rien modifier")
+    args = parser.parse_args()
+
+    before = args.before or date.today() - timedelta(days=args.retention_days)
+    db = SessionLocal()
+    try:
+        archived = archive_sessions(db, before=before, directory=args.directory, dry_run=args.dry_run)
+    except ArchiveConfigurationError as e:
+        sys.exit(f"Archivage refusé : {e}")
+    finally:
+        db.close()
+
+    if not archived:
+        print(f"Aucune session antérieure au {before.isoformat()}")
+        return
+    action = "À archiver" if args.dry_run else "Archivé"
+    for name, count in archived.items():
+        print(f"{action}: {count} session(s) -> {os.path.join(args.directory or 'ARCHIVE_DIR', name)}")
+
+
+if __name__ == "__main__":
+    main()
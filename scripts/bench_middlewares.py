@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark du coût par requête de la chaîne de middlewares.
+
+Compare la chaîne ASGI pure (api.core.middlewares) à une chaîne équivalente
+de six BaseHTTPMiddleware (l'implémentation précédente), sur un endpoint vide
+appelé directement en ASGI (sans réseau ni serveur).
+
+Usage:
+    python scripts/bench_middlewares.py [--requests 5000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from api.core.middlewares import MIDDLEWARE_CHAIN
+
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+class PassthroughHTTPMiddleware(BaseHTTPMiddleware):
+    """Reproduit le coût structurel d'un BaseHTTPMiddleware (tâche + stream)"""
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["x-bench"] = "1"
+        return response
+
+
+def build_app(kind: str) -> Starlette:
+    app = Starlette(routes=[Route("/bench", endpoint)])
+    if kind == "asgi":
+        for middleware_class in reversed(MIDDLEWARE_CHAIN):
+            app.add_middleware(middleware_class)
+    elif kind == "base_http":
+        for _ in MIDDLEWARE_CHAIN:
+            app.add_middleware(PassthroughHTTPMiddleware)
+    return app
+
+
+async def run(app, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/bench",
+        "raw_path": b"/bench",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+    async def send(message):
+        pass
+
+    async def call():
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            return {"type": "http.disconnect"}
+
+        await app(dict(scope), receive, send)
+
+    # Échauffement
+    for _ in range(200):
+        await call()
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call()
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Le logging des requêtes n'est pas ce qu'on mesure
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    for kind in ("none", "base_http", "asgi"):
+        results[kind] = asyncio.run(run(build_app(kind), args.requests))
+
+    baseline = results["none"]
+    print(f"{'chaîne':<12}{'µs/requête':>14}{'surcoût µs':>14}")
+    for kind, per_request in results.items():
+        print(f"{kind:<12}{per_request * 1e6:>14.1f}{(per_request - baseline) * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark JSON / MessagePack sur des réponses représentatives.
+
+Encode et décode les corps de ``/sessions/{id}/logs`` (format imbriqué et
+normalisé) et ``/assigned-tasks`` construits en mémoire, avec les encodeurs
+utilisés par l'API (``json`` de Starlette, ``api.core.negotiation.packb``) ;
+``orjson`` est mesuré en référence s'il est installé. Affiche la taille
+brute et gzip, et les temps d'encodage/décodage par corps.
+
+Usage:
+    python scripts/bench_msgpack.py [--logs 60] [--iterations 500]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from api.core.negotiation import packb, unpackb
+
+
+def build_payloads(log_count: int):
+    """Corps JSON-compatibles (après jsonable_encoder), comme les passe FastAPI"""
+    now = datetime(2024, 5, 1, 8, 0)
+    performers = [{"id": uuid.uuid4(), "name": name, "is_active": True, "created_at": now}
+                  for name in ("Marie", "Sofia", "Lucas")]
+    rooms = [{"id": uuid.uuid4(), "name": f"Pièce {i}", "description": None, "display_order": i,
+              "is_active": True, "created_at": now} for i in range(6)]
+    templates = [{"id": uuid.uuid4(), "name": f"Tâche {i}", "description": "Nettoyage complet", "category": "sols",
+                  "estimated_duration": 15, "default_duration": 15, "is_active": True, "created_at": now}
+                 for i in range(12)]
+    tasks = [{
+        "id": uuid.uuid4(),
+        "task_template": templates[i % len(templates)],
+        "room": rooms[i % len(rooms)],
+        "default_performer": performers[i % len(performers)],
+        "frequency_days": {"type": "daily", "times_per_day": 1, "days": []},
+        "times_per_day": 1,
+        "suggested_time": None,
+        "is_active": True,
+        "created_at": now,
+    } for i in range(log_count)]
+
+    session_id = uuid.uuid4()
+    logs = [{
+        "id": uuid.uuid4(),
+        "session_id": session_id,
+        "assigned_task_id": task["id"],
+        "performed_by_id": task["default_performer"]["id"],
+        "status": "fait",
+        "note": None,
+        "photo_urls": [],
+        "performed_at": now + timedelta(minutes=i),
+        "created_at": now,
+        "updated_at": now + timedelta(minutes=i),
+        "assigned_task": task,
+        "performed_by": task["default_performer"],
+    } for i, task in enumerate(tasks)]
+
+    flat_logs = [{key: value for key, value in log.items() if key not in ("assigned_task", "performed_by")}
+                 for log in logs]
+    normalized = {
+        "session_id": session_id,
+        "logs": flat_logs,
+        "included": {
+            "assigned_tasks": {str(task["id"]): task for task in tasks},
+            "rooms": {str(room["id"]): room for room in rooms},
+            "task_templates": {str(template["id"]): template for template in templates},
+            "performers": {str(performer["id"]): performer for performer in performers},
+        },
+    }
+    return {
+        "session logs": jsonable_encoder(logs),
+        "session logs (normalized)": jsonable_encoder(normalized),
+        "assigned tasks": jsonable_encoder(tasks),
+    }
+
+
+def json_dumps(content) -> bytes:
+    # Réglages de starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def per_call(function, argument, iterations: int) -> float:
+    function(argument)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    codecs = {"json": (json_dumps, json.loads), "msgpack": (packb, unpackb)}
+    try:
+        import orjson
+        codecs["orjson"] = (orjson.dumps, orjson.loads)
+    except ImportError:
+        pass
+
+    print(f"{'corps':<28}{'format':<10}{'octets':>10}{'gzip':>10}{'encode µs':>12}{'decode µs':>12}")
+    for name, payload in build_payloads(args.logs).items():
+        for codec, (encode, decode) in codecs.items():
+            body = encode(payload)
+            assert decode(body) == payload
+            print(
+                f"{name:<28}{codec:<10}{len(body):>10}{len(gzip.compress(body)):>10}"
+                f"{per_call(encode, payload, args.iterations) * 1e6:>12.1f}"
+                f"{per_call(decode, body, args.iterations) * 1e6:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
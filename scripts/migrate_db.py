@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Met le schéma de la base à jour avant le démarrage de l'API (commande du
+conteneur) : création d'une base vide, migrations Alembic sinon. Voir
+api/core/migrations.py.
+
+Usage:
+    python scripts/migrate_db.py
+"""
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.core.database import engine
+from api.core.migrations import upgrade_database
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    outcome = upgrade_database(engine)
+    messages = {
+        "created": "Schéma créé et enregistré à la dernière révision",
+        "stamped+upgraded": "Base sans version enregistrée puis migrée",
+        "upgraded": "Schéma migré jusqu'à la dernière révision",
+    }
+    print(messages[outcome])
+
+
+if __name__ == "__main__":
+    main()
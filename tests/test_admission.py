@@ -0,0 +1,148 @@
+"""
+Contrôle d'admission : ordre de service par priorité, délestage et 503.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.core.admission import (
+    AdmissionControlMiddleware,
+    AdmissionController,
+    AdmissionRejected,
+    Priority,
+    admission_decisions,
+    route_priority,
+)
+
+MAX_WAIT = {Priority.CRITICAL: 1.0, Priority.NORMAL: 0.5, Priority.LOW: 0.05}
+
+
+def controller(max_concurrency=1, **kwargs):
+    return AdmissionController(max_concurrency=max_concurrency, max_wait=dict(MAX_WAIT), **kwargs)
+
+
+@pytest.mark.parametrize("method, path, priority", [
+    ("POST", "/logs/abc/complete", Priority.CRITICAL),
+    ("POST", "/uploads/photo", Priority.CRITICAL),
+    ("PATCH", "/sessions/abc/logs", Priority.CRITICAL),
+    ("GET", "/sessions/abc/logs", Priority.NORMAL),
+    ("PUT", "/rooms/abc", Priority.NORMAL),
+    ("POST", "/exports/pdf/abc", Priority.LOW),
+    ("GET", "/dashboard/metrics", Priority.LOW),
+])
+def test_route_priority(method, path, priority):
+    assert route_priority(method, path) == priority
+
+
+def test_waiters_served_by_priority():
+    async def scenario():
+        admission = controller()
+        order = []
+        await admission.acquire(Priority.NORMAL)
+
+        async def request(priority):
+            await admission.acquire(priority)
+            order.append(priority)
+            admission.release(priority)
+
+        tasks = [asyncio.create_task(request(priority)) for priority in (Priority.LOW, Priority.NORMAL, Priority.CRITICAL)]
+        await asyncio.sleep(0.01)
+        admission.release(Priority.NORMAL)
+        await asyncio.gather(*tasks)
+        return order, admission.active
+
+    order, active = asyncio.run(scenario())
+    assert order == [Priority.CRITICAL, Priority.NORMAL, Priority.LOW]
+    assert active == 0
+
+
+def test_low_priority_times_out_then_is_shed():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(Priority.CRITICAL)
+        with pytest.raises(AdmissionRejected) as timeout:
+            await admission.acquire(Priority.LOW)
+        # Un critique attend depuis plus que la cible LOW : refus immédiat
+        waiting = asyncio.create_task(admission.acquire(Priority.CRITICAL))
+        await asyncio.sleep(0.06)
+        with pytest.raises(AdmissionRejected) as shed:
+            await admission.acquire(Priority.LOW)
+        admission.release(Priority.CRITICAL)
+        await waiting
+        return timeout.value, shed.value, admission.in_flight
+
+    timeout, shed, in_flight = asyncio.run(scenario())
+    assert (timeout.reason, shed.reason) == ("timeout", "shed")
+    assert timeout.retry_after >= 2
+    assert in_flight[Priority.CRITICAL] == 1
+
+
+def test_low_priority_share_keeps_slots_for_staff():
+    async def scenario():
+        admission = controller(max_concurrency=4, low_priority_share=0.5)
+        for _ in range(2):
+            await admission.acquire(Priority.LOW)
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(Priority.LOW)
+        await admission.acquire(Priority.CRITICAL)
+        await admission.acquire(Priority.NORMAL)
+        return admission.in_flight
+
+    assert asyncio.run(scenario()) == {Priority.CRITICAL: 1, Priority.NORMAL: 1, Priority.LOW: 2}
+
+
+def test_middleware_rejects_with_retry_after():
+    admission = controller()
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
+    @app.get("/exports/history")
+    async def history():
+        return []
+
+    client = TestClient(app)
+    assert client.get("/exports/history").status_code == 200
+
+    admission.in_flight[Priority.CRITICAL] = 1  # place occupée par une écriture terrain
+    timeouts_before = admission_decisions.value(priority="low", decision="timeout")
+    response = client.get("/exports/history")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 2
+    assert admission_decisions.value(priority="low", decision="timeout") == timeouts_before + 1
+    assert client.get("/health").status_code == 404  # route exemptée : jamais mise en file
+
+
+def test_event_stream_does_not_hold_a_slot():
+    """Un flux SSE ouvert n'occupe pas de place : les écritures terrain passent"""
+    admission = controller()
+
+    async def scenario():
+        app_calls = []
+
+        async def app(scope, receive, send):
+            app_calls.append(scope["path"])
+            if scope["path"].endswith("/events"):
+                # Flux longue durée : ouvert jusqu'à la fin du scénario
+                await asyncio.sleep(3600)
+
+        middleware = AdmissionControlMiddleware(app, controller=admission)
+
+        def request(method, path):
+            return middleware({"type": "http", "method": method, "path": path}, None, None)
+
+        streams = [asyncio.create_task(request("GET", f"/sessions/s{index}/events")) for index in range(3)]
+        await asyncio.sleep(0.01)
+        active_with_streams = admission.active
+        await asyncio.wait_for(request("POST", "/logs/abc/complete"), timeout=0.5)
+        for stream in streams:
+            stream.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+        return active_with_streams, app_calls
+
+    active_with_streams, app_calls = asyncio.run(scenario())
+    assert active_with_streams == 0
+    assert "/logs/abc/complete" in app_calls
+    assert admission.active == 0
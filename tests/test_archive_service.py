@@ -0,0 +1,189 @@
+"""
+Archivage à froid : lecture des fichiers d'archive, archivage d'une base puis
+relecture transparente par les routes de sessions et de logs.
+"""
+
+import os
+import uuid
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.core.database import get_db
+from api.core.security import get_current_user
+from api.models.base import Base
+from api.models.export import Export
+from api.models.performer import Performer
+from api.models.room import Room
+from api.models.session import CleaningLog, CleaningSession, LogStatus
+from api.models.task import AssignedTask, TaskTemplate
+from api.models.user import User
+from api.routers import logs, sessions
+from api.services.archive_service import (
+    MANIFEST,
+    ArchiveConfigurationError,
+    SessionArchive,
+    _save_manifest,
+    _write_records,
+    archive_file_name,
+    archive_sessions,
+)
+from api.services.session_service import setup_session_counters
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def write_archive(directory, session_id, day="2023-01-03"):
+    name = archive_file_name(date.fromisoformat(day))
+    record = {"session": {"id": session_id, "date": day, "status": "completee"}, "logs": [{"id": "l1"}], "exports": []}
+    _write_records(os.path.join(directory, name), {session_id: record})
+    _save_manifest(directory, {session_id: {"file": name, "date": day}})
+
+
+def test_archived_session_served_from_file(tmp_path):
+    session_id = str(uuid.uuid4())
+    write_archive(str(tmp_path), session_id)
+
+    archive = SessionArchive(str(tmp_path))
+    record = archive.get(session_id)
+    assert record["session"]["date"] == "2023-01-03"
+    assert record["logs"] == [{"id": "l1"}]
+    assert archive.etag(session_id).startswith('W/"archive-')
+
+
+def test_unknown_session_is_not_archived(tmp_path):
+    archive = SessionArchive(str(tmp_path))
+    assert archive.get(uuid.uuid4()) is None
+    assert archive.etag(uuid.uuid4()) is None
+
+
+def test_index_reloaded_when_manifest_changes(tmp_path):
+    archive = SessionArchive(str(tmp_path))
+    session_id = str(uuid.uuid4())
+    assert archive.locate(session_id) is None
+
+    write_archive(str(tmp_path), session_id)
+    os.utime(tmp_path / MANIFEST, (1, 1))
+    assert archive.locate(session_id)["file"] == "sessions-2023-01.ndjson.gz"
+
+
+# ===== ARCHIVAGE D'UNE BASE =====
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    setup_session_counters()
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def data(db):
+    """Une session de 2023 (complétée, avec un export) et la session du jour"""
+    performer = Performer(name="Marie")
+    room = Room(name="Cuisine")
+    template = TaskTemplate(name="Sols", default_duration=20)
+    db.add_all([performer, room, template])
+    db.flush()
+    task = AssignedTask(
+        task_template_id=template.id, room_id=room.id, default_performer_id=performer.id,
+        frequency={"type": "daily", "times_per_day": 1}, is_active=True
+    )
+    old, today = CleaningSession(date=date(2023, 1, 10)), CleaningSession(date=date.today())
+    db.add_all([task, old, today])
+    db.flush()
+    db.add_all([
+        CleaningLog(
+            session_id=old.id, assigned_task_id=task.id, performed_by_id=performer.id,
+            status=LogStatus.FAIT, note="RAS", photo_urls=["a.jpg"]
+        ),
+        CleaningLog(session_id=today.id, assigned_task_id=task.id, status=LogStatus.REPORTE),
+        Export(session_id=old.id, pdf_url="/exports/2023-01-10.pdf"),
+    ])
+    db.commit()
+    ids = {"old": old.id, "today": today.id}
+    db.expunge_all()
+    return ids
+
+
+@pytest.fixture
+def client(engine, db, tmp_path, monkeypatch):
+    monkeypatch.setattr("api.core.config.settings.archive_dir", str(tmp_path))
+    # Statistiques calculées avec leur propre session (single-flight)
+    monkeypatch.setattr("api.core.database.SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    app = FastAPI()
+    app.include_router(sessions.router, prefix="/sessions")
+    app.include_router(logs.router, prefix="/logs")
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: User(firebase_uid="test", full_name="Test")
+    return TestClient(app)
+
+
+def test_archived_session_read_back_through_routes(client, db, data, tmp_path):
+    old_id = str(data["old"])
+    before = client.get(f"/sessions/{old_id}/statistics").json()
+
+    archived = archive_sessions(db, before=date(2024, 1, 1), directory=str(tmp_path))
+
+    assert archived == {"sessions-2023-01.ndjson.gz": 1}
+    assert db.get(CleaningSession, data["old"]) is None
+    assert db.query(CleaningLog).filter(CleaningLog.session_id == data["old"]).count() == 0
+    assert db.query(Export).count() == 0
+    assert db.get(CleaningSession, data["today"]) is not None
+
+    session = client.get(f"/sessions/{old_id}")
+    assert session.status_code == 200
+    assert session.json()["date"] == "2023-01-10"
+    assert client.get(f"/sessions/{old_id}", headers={"If-None-Match": session.headers["etag"]}).status_code == 304
+
+    nested = client.get(f"/sessions/{old_id}/logs").json()
+    assert [log["status"] for log in nested] == ["fait"]
+    assert nested[0]["assigned_task"]["room"]["name"] == "Cuisine"
+    normalized = client.get(f"/sessions/{old_id}/logs", params={"format": "normalized"}).json()
+    assert [room["name"] for room in normalized["included"]["rooms"].values()] == ["Cuisine"]
+    assert normalized["logs"][0]["performed_by_id"] == nested[0]["performed_by_id"]
+
+    statistics = client.get(f"/sessions/{old_id}/statistics").json()
+    assert statistics == before
+
+    flat = client.get("/logs", params={"session_id": old_id}).json()
+    assert len(flat) == 1
+    assert flat[0]["session"]["id"] == old_id
+    assert flat[0]["performer"]["name"] == "Marie"
+    assert (flat[0]["notes"], flat[0]["photos"]) == ("RAS", ["a.jpg"])
+    assert flat[0]["assigned_task"]["task_template"]["name"] == "Sols"
+    sparse = client.get("/logs", params={"session_id": old_id, "fields": "status"}).json()
+    assert sparse == [{"id": flat[0]["id"], "status": "fait"}]
+
+
+@pytest.mark.parametrize("directory", [None, "archives"])
+def test_archiving_requires_an_absolute_archive_dir(db, data, directory, monkeypatch):
+    """Sans répertoire durable, rien n'est supprimé ; le dry-run reste possible"""
+    monkeypatch.setattr("api.core.config.settings.archive_dir", None)
+
+    with pytest.raises(ArchiveConfigurationError):
+        archive_sessions(db, before=date(2024, 1, 1), directory=directory)
+
+    assert db.get(CleaningSession, data["old"]) is not None
+    assert archive_sessions(db, before=date(2024, 1, 1), directory=directory, dry_run=True) == {
+        "sessions-2023-01.ndjson.gz": 1
+    }
@@ -0,0 +1,147 @@
+from api.core.cache import LocalLRUCache, RedisCache, _MISSING
+
+
+def test_local_cache_evicts_least_recently_used():
+    """Le cache local reste borné et évince l'entrée la moins récemment lue"""
+    local = LocalLRUCache(maxsize=2, ttl=30)
+    local.set("rooms:v0:active", 1)
+    local.set("rooms:v0:all", 2)
+    local.get("rooms:v0:active")
+    local.set("performers:v0:all", 3)
+
+    assert len(local) == 2
+    assert local.get("rooms:v0:all") is _MISSING
+    assert local.get("rooms:v0:active") == 1
+
+
+def test_invalidation_message_clears_namespace():
+    """Un message pub/sub vide le namespace local et mémorise la nouvelle version"""
+    cache = RedisCache()
+    cache.local.set("rooms:v0:active", [1])
+    cache.local.set("performers:v0:all", [2])
+
+    cache._apply_invalidation("rooms:3")
+
+    assert cache.local.get("rooms:v0:active") is _MISSING
+    assert cache.local.get("performers:v0:all") == [2]
+    assert cache._versions == {"rooms": 3}
+
+
+def test_version_read_does_not_overwrite_newer_invalidation():
+    """Une invalidation reçue pendant la lecture de la version en Redis n'est pas écrasée"""
+    import asyncio
+
+    cache = RedisCache()
+    cache._listening = True
+
+    class SlowRedis:
+        async def get(self, key):
+            # Invalidation publiée par un autre worker pendant l'aller-retour Redis
+            await asyncio.sleep(0)
+            cache._apply_invalidation("rooms:4")
+            return "3"
+
+    cache._async_client = SlowRedis()
+
+    assert asyncio.run(cache.anamespace_version("rooms")) == 4
+    assert cache._versions == {"rooms": 4}
+
+    cache._apply_invalidation("rooms:2")  # message publié dans le désordre
+    assert cache._versions == {"rooms": 4}
+
+
+class FakeAsyncRedis:
+    """Client ``redis.asyncio`` réduit au pipeline INCR/PUBLISH"""
+
+    def __init__(self):
+        self.versions = {}
+        self.commands = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def incr(self, key):
+        self.queued.append(("incr", key))
+
+    def publish(self, channel, message):
+        self.queued.append(("publish", channel, message))
+
+    async def execute(self):
+        results = []
+        for command in self.queued:
+            self.redis.commands.append(command)
+            if command[0] == "incr":
+                self.redis.versions[command[1]] = self.redis.versions.get(command[1], 0) + 1
+                results.append(self.redis.versions[command[1]])
+            else:
+                results.append(1)
+        self.queued = []
+        return results
+
+
+def test_commit_invalidation_does_not_block_the_event_loop(monkeypatch):
+    """Commit sur la boucle : INCR + PUBLISH par le client async, namespace servi sans cache entre-temps"""
+    import asyncio
+    from types import SimpleNamespace
+
+    from api.core import cache as cache_module
+
+    cache = RedisCache()
+    cache.redis_url = "redis://test"
+    cache._listening = True
+
+    class SyncRedisForbidden:
+        def __getattr__(self, name):
+            raise AssertionError("client Redis synchrone appelé depuis la boucle d'événements")
+
+    cache._client = SyncRedisForbidden()
+    redis = cache._async_client = FakeAsyncRedis()
+    monkeypatch.setattr(cache_module, "cache", cache)
+
+    async def commit_then_read():
+        cache.local.set("rooms:v0:active", ["ancien"])
+        cache_module._invalidate_after_commit(SimpleNamespace(info={"cache_namespaces": {"rooms"}}))
+
+        assert cache.local.get("rooms:v0:active") is _MISSING
+        assert cache.invalidation_pending("rooms")
+        # Relecture avant que Redis ait reçu l'invalidation : jamais l'ancienne valeur
+        assert await cache.aget_or_set("rooms", ("active",), lambda: ["nouveau"]) == ["nouveau"]
+        assert redis.commands == []
+
+        await cache.drain()
+
+    asyncio.run(commit_then_read())
+
+    assert redis.commands == [("incr", "ns:rooms:version"), ("publish", "cache:invalidations", "rooms:1")]
+    assert not cache.invalidation_pending("rooms")
+    assert cache._versions == {"rooms": 1}
+
+
+def test_commit_invalidation_outside_the_loop_is_synchronous(monkeypatch):
+    """Handler synchrone (threadpool) ou script : invalidation immédiate par le client synchrone"""
+    from types import SimpleNamespace
+
+    from api.core import cache as cache_module
+
+    cache = RedisCache()
+    cache.redis_url = "redis://test"
+    invalidated = []
+    monkeypatch.setattr(cache, "invalidate", lambda *namespaces: invalidated.append(namespaces))
+    monkeypatch.setattr(cache_module, "cache", cache)
+
+    cache_module._invalidate_after_commit(SimpleNamespace(info={"cache_namespaces": {"rooms", "performers"}}))
+
+    assert invalidated == [("performers", "rooms")]
+    assert not cache.invalidation_pending("rooms")
@@ -0,0 +1,155 @@
+"""
+Annulation du travail des requêtes abandonnées (déconnexion, délai dépassé).
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from api.core.cancellation import (
+    CancellationToken,
+    RequestCancellationMiddleware,
+    RequestCancelled,
+    cancellable,
+    current_token,
+    requests_cancelled,
+)
+from api.core.config import settings
+from api.core.single_flight import SingleFlight
+
+# Requête sans fin : seule une interruption l'arrête
+ENDLESS_QUERY = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c")
+
+
+@pytest.fixture
+def engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture
+def app(engine, monkeypatch):
+    monkeypatch.setattr(settings, "dashboard_request_timeout", 0.2)
+    app = FastAPI()
+    app.add_middleware(RequestCancellationMiddleware, engine=engine)
+    app.state.outcome = []
+
+    @app.get("/dashboard")
+    async def dashboard():
+        await cancellable(asyncio.sleep(5))
+        return {}
+
+    @app.get("/dashboard/metrics")
+    def metrics():
+        try:
+            with engine.connect() as connection:
+                connection.execute(ENDLESS_QUERY)
+        except OperationalError as e:
+            app.state.outcome.append(str(e.orig))
+            raise
+        return {}
+
+    return app
+
+
+def test_token_runs_callbacks_once():
+    token = CancellationToken()
+    calls = []
+    token.add_callback(lambda: calls.append("registered"))
+    removed = token.add_callback(lambda: calls.append("removed"))
+    token.remove_callback(removed)
+    token.cancel("timeout")
+    token.cancel("disconnect")
+    token.add_callback(lambda: calls.append("late"))
+    assert calls == ["registered", "late"]
+    with pytest.raises(RequestCancelled):
+        token.check()
+    assert token.reason == "timeout"
+
+
+def test_timeout_returns_504_and_stops_async_work(app):
+    before = requests_cancelled.value(route="/dashboard", reason="timeout")
+    start = time.perf_counter()
+    response = TestClient(app).get("/dashboard")
+    assert response.status_code == 504
+    assert time.perf_counter() - start < 2
+    assert requests_cancelled.value(route="/dashboard", reason="timeout") == before + 1
+
+
+def test_timeout_interrupts_running_query(app):
+    start = time.perf_counter()
+    response = TestClient(app).get("/dashboard/metrics")
+    assert response.status_code == 504
+    assert time.perf_counter() - start < 2
+    assert app.state.outcome == ["interrupted"]
+
+
+def test_unmonitored_route_passes_through(app):
+    @app.get("/rooms")
+    async def rooms():
+        return {"token": current_token.get() is not None}
+
+    assert TestClient(app).get("/rooms").json() == {"token": False}
+
+
+def test_client_disconnect_cancels_without_response(app):
+    sent = []
+
+    async def receive():
+        if not sent:
+            sent.append("request")
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message["type"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/dashboard", "raw_path": b"/dashboard", "root_path": "",
+        "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+    before = requests_cancelled.value(route="/dashboard", reason="disconnect")
+    start = time.perf_counter()
+    asyncio.run(app(scope, receive, send))
+    assert time.perf_counter() - start < 1
+    assert sent == ["request"]
+    assert requests_cancelled.value(route="/dashboard", reason="disconnect") == before + 1
+
+
+def test_shared_computation_cancelled_only_when_all_callers_leave():
+    flight = SingleFlight()
+    started = []
+
+    async def compute():
+        started.append(current_token.get())
+        await asyncio.sleep(5)
+
+    async def caller(token):
+        current_token.set(token)
+        await flight.do("dashboard", compute)
+
+    async def main():
+        tokens = [CancellationToken(), CancellationToken()]
+        callers = [asyncio.create_task(caller(token)) for token in tokens]
+        await asyncio.sleep(0.01)
+        tokens[0].cancel("disconnect")
+        await asyncio.sleep(0.01)
+        still_running = flight.in_flight("dashboard")
+        tokens[1].cancel("disconnect")
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return still_running, [caller.exception() for caller in callers]
+
+    still_running, errors = asyncio.run(main())
+    assert still_running
+    assert all(isinstance(error, RequestCancelled) for error in errors)
+    assert not flight.in_flight("dashboard")
+    # Le calcul a son propre token, annulé au départ du dernier appelant
+    assert started[0].cancelled and started[0].reason == "abandoned"
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.core.conditional import conditional_response, etag_matches, resource_etag
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    updated_at = Column(DateTime, default=datetime(2025, 1, 1))
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Item(id=1, name="a"), Item(id=2, name="b")])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_etag_matches_weak_comparison():
+    """If-None-Match accepte listes, ETags faibles et *"""
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"xyz", "abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"xyz"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+
+
+def test_resource_etag_changes_with_updates_and_deletes(db):
+    """Le validateur change quand une ligne est modifiée ou supprimée"""
+    etag = resource_etag(db, Item)
+    assert resource_etag(db, Item) == etag
+
+    db.get(Item, 1).updated_at = datetime(2025, 1, 1) + timedelta(minutes=1)
+    db.commit()
+    updated = resource_etag(db, Item)
+    assert updated != etag
+
+    db.delete(db.get(Item, 2))
+    db.commit()
+    assert resource_etag(db, Item) != updated
+    assert resource_etag(db, (Item, Item.id == 1)) != resource_etag(db, Item, (Item, Item.id == 1))
+
+
+def test_not_modified_skips_loading(db):
+    """Un client à jour reçoit un 304 sans que les lignes soient chargées"""
+    app = FastAPI()
+    loads = []
+
+    def get_db():
+        yield db
+
+    @app.get("/items")
+    def list_items(request: Request, response: Response, session: Session = Depends(get_db)):
+        not_modified = conditional_response(request, response, resource_etag(session, Item))
+        if not_modified:
+            return not_modified
+        loads.append(1)
+        return [{"id": item.id} for item in session.query(Item).all()]
+
+    client = TestClient(app)
+    first = client.get("/items")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/items", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+    assert len(loads) == 1
+
+
+def test_etag_differs_per_negotiated_format(db):
+    """JSON et MessagePack : ETags distincts, 304 avec Vary: Accept"""
+    from api.core.negotiation import MSGPACK_MEDIA_TYPE, MessagePackMiddleware, NegotiatedResponse
+
+    app = FastAPI(default_response_class=NegotiatedResponse)
+    app.add_middleware(MessagePackMiddleware)
+
+    @app.get("/items")
+    def list_items(request: Request, response: Response):
+        not_modified = conditional_response(request, response, resource_etag(db, Item))
+        if not_modified:
+            return not_modified
+        return [{"id": item.id} for item in db.query(Item).all()]
+
+    client = TestClient(app)
+    msgpack_headers = {"Accept": MSGPACK_MEDIA_TYPE}
+    json_etag = client.get("/items").headers["etag"]
+    msgpack_etag = client.get("/items", headers=msgpack_headers).headers["etag"]
+
+    assert msgpack_etag != json_etag
+    assert msgpack_etag.endswith('-msgpack"')
+    # ETag de la représentation JSON présenté pour du MessagePack : réponse complète
+    assert client.get("/items", headers={**msgpack_headers, "If-None-Match": json_etag}).status_code == 200
+    not_modified = client.get("/items", headers={**msgpack_headers, "If-None-Match": msgpack_etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["vary"] == "Accept"
+    assert not_modified.headers["etag"] == msgpack_etag
@@ -0,0 +1,247 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.core.database import get_db
+from api.core.events import SessionEventBroker, format_sse
+from api.core.security import get_current_user
+from api.models.base import Base
+from api.models.session import CleaningLog, CleaningSession, LogStatus
+from api.models.user import User
+from api.routers import sessions
+from api.services.session_service import setup_session_counters
+
+
+def test_slow_subscriber_keeps_latest_events():
+    """Une file pleine écarte les événements les plus anciens sans bloquer la publication"""
+    async def main():
+        broker = SessionEventBroker(queue_size=2)
+        queue = broker.subscribe("session-1")
+        for index in range(5):
+            broker.publish("session-1", {"index": index})
+        received = [queue.get_nowait() for _ in range(queue.qsize())]
+        broker.unsubscribe("session-1", queue)
+        return received, broker.subscriber_count
+
+    received, remaining = asyncio.run(main())
+    assert received == [{"index": 3}, {"index": 4}]
+    assert remaining == 0
+
+
+def test_format_sse():
+    """Encodage text/event-stream"""
+    assert format_sse({"a": 1}, event="progress") == 'event: progress\ndata: {"a": 1}\n\n'
+
+
+# ===== FLUX /sessions/{id}/events =====
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def psubscribe(self, pattern):
+        self.redis.subscribers.append((pattern.rstrip("*"), self))
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def aclose(self):
+        self.redis.subscribers = [(prefix, sub) for prefix, sub in self.redis.subscribers if sub is not self]
+
+
+class FakeAsyncRedis:
+    """``redis.asyncio`` réduit au PUBLISH / PSUBSCRIBE"""
+
+    def __init__(self):
+        self.subscribers = []
+        self.published = []
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, message):
+        await asyncio.sleep(0)  # aller-retour réseau
+        self.published.append(channel)
+        for prefix, pubsub in self.subscribers:
+            if channel.startswith(prefix):
+                pubsub.messages.put_nowait({"type": "pmessage", "channel": channel, "data": message})
+        return len(self.subscribers)
+
+
+class SyncRedisForbidden:
+    def __getattr__(self, name):
+        raise AssertionError("client Redis synchrone appelé depuis la boucle d'événements")
+
+
+@pytest.fixture
+def db_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    setup_session_counters()
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def session_with_log(db_factory):
+    db = db_factory()
+    session = CleaningSession(date=date.today())
+    db.add(session)
+    db.flush()
+    log = CleaningLog(session_id=session.id, status=LogStatus.REPORTE)
+    db.add(log)
+    db.commit()
+    ids = session.id, log.id
+    db.close()
+    return ids
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = SessionEventBroker(queue_size=8)
+    monkeypatch.setattr("api.core.events.session_events", broker)
+    monkeypatch.setattr("api.core.config.settings.sse_heartbeat_interval", 0.05)
+    return broker
+
+
+@pytest.fixture
+def app(db_factory):
+    app = FastAPI()
+    app.include_router(sessions.router, prefix="/sessions")
+    app.dependency_overrides[get_db] = lambda: db_factory()
+    app.dependency_overrides[get_current_user] = lambda: User(firebase_uid="test", full_name="Test")
+    return app
+
+
+class EventStream:
+    """Requête SSE pilotée directement en ASGI (le flux ne se termine jamais seul)"""
+
+    def __init__(self, app, path):
+        self.app, self.path = app, path
+        self.chunks = []
+        self.status = None
+        self._received = asyncio.Event()
+        self._disconnected = asyncio.Event()
+
+    async def __aenter__(self):
+        scope = {
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": self.path, "raw_path": self.path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"test"), (b"accept", b"text/event-stream")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        self._task = asyncio.create_task(self.app(scope, self._receive, self._send))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._disconnected.set()
+        await asyncio.wait_for(self._task, timeout=2)
+
+    async def _receive(self):
+        if not getattr(self, "_requested", False):
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message.get("body"):
+            self.chunks.append(message["body"].decode())
+            self._received.set()
+
+    async def next_event(self, name):
+        """Attend le prochain message ``event: name`` (ou ``: heartbeat``) et le retourne"""
+        async def wait():
+            while True:
+                for index, chunk in enumerate(self.chunks):
+                    if chunk.startswith(f"event: {name}\n") or chunk == name:
+                        del self.chunks[:index + 1]
+                        return chunk
+                self._received.clear()
+                await self._received.wait()
+        chunk = await asyncio.wait_for(wait(), timeout=2)
+        return json.loads(chunk.split("data: ", 1)[1]) if chunk.startswith("event:") else chunk
+
+
+def mark_done(db_factory, log_id):
+    """Commit sur la boucle d'événements, comme dans un handler async"""
+    db = db_factory()
+    db.get(CleaningLog, log_id).status = LogStatus.FAIT
+    db.commit()
+    db.close()
+
+
+def test_event_stream_single_worker(app, broker, db_factory, session_with_log, monkeypatch):
+    """Sans Redis : snapshot, progression livrée par le broker local au commit, heartbeats"""
+    monkeypatch.setattr("api.core.cache.cache.redis_url", None)
+    session_id, log_id = session_with_log
+
+    async def scenario():
+        async with EventStream(app, f"/sessions/{session_id}/events") as stream:
+            snapshot = await stream.next_event("snapshot")
+            assert snapshot["counters"]["status"] == "en_cours"
+            assert broker.subscriber_count == 1
+
+            mark_done(db_factory, log_id)
+            progress = await stream.next_event("progress")
+            assert [log["status"] for log in progress["logs"]] == ["fait"]
+            assert progress["counters"]["status"] == "completee"
+
+            assert await stream.next_event(": heartbeat\n\n") == ": heartbeat\n\n"
+            assert stream.status == 200
+        return broker.subscriber_count
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_event_stream_redis_fan_out(app, broker, db_factory, session_with_log, monkeypatch):
+    """Avec Redis : publication async au commit, livraison par l'abonnement pub/sub (tous les workers)"""
+    from api.core.cache import cache
+
+    redis = FakeAsyncRedis()
+    monkeypatch.setattr(cache, "redis_url", "redis://test")
+    monkeypatch.setattr(cache, "_client", SyncRedisForbidden())
+    monkeypatch.setattr(cache, "_async_client", redis)
+    session_id, log_id = session_with_log
+    channel = f"session-events:{session_id}"
+
+    async def scenario():
+        listener = asyncio.create_task(broker.listen())
+        while not broker._listening:
+            await asyncio.sleep(0)
+        try:
+            async with EventStream(app, f"/sessions/{session_id}/events") as stream:
+                await stream.next_event("snapshot")
+
+                mark_done(db_factory, log_id)
+                assert redis.published == []  # rien d'envoyé pendant le commit
+                progress = await stream.next_event("progress")
+                assert redis.published == [channel]
+                assert [log["status"] for log in progress["logs"]] == ["fait"]
+
+                # Commit d'un autre worker, reçu par le seul canal pub/sub
+                await redis.publish(channel, json.dumps({"session_id": str(session_id), "logs": [], "counters": None}))
+                assert (await stream.next_event("progress"))["logs"] == []
+            await broker.drain()
+        finally:
+            listener.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await listener
+
+    asyncio.run(scenario())
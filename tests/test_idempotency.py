@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.testclient import TestClient
+
+from api.core.idempotency import BodyFingerprint, IdempotencyMiddleware, MemoryIdempotencyStore
+
+
+def verify_token(token: str) -> dict:
+    """Tokens de test ``<uid>.<version>`` : même ``sub`` après rafraîchissement"""
+    if token == "invalid":
+        raise ValueError("signature invalide")
+    return {"sub": token.split(".")[0]}
+
+
+def build_app():
+    app = FastAPI()
+    counter = itertools.count(1)
+    calls = []
+
+    @app.post("/sessions/today")
+    async def create_session(payload: dict):
+        calls.append(payload)
+        await asyncio.sleep(0.05)
+        return {"session": next(counter)}
+
+    @app.post("/uploads/photo")
+    async def upload_photo(file: UploadFile = File(...), task_id: str = Form(...)):
+        calls.append((task_id, await file.read()))
+        return {"photo": next(counter)}
+
+    app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore(), verify_token=verify_token)
+    return app, calls
+
+
+def test_retry_replays_stored_response():
+    """Une nouvelle tentative avec la même clé rejoue la réponse sans réexécuter"""
+    app, calls = build_app()
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "abc", "Authorization": "Bearer t"}
+
+    first = client.post("/sessions/today", json={"a": 1}, headers=headers)
+    retry = client.post("/sessions/today", json={"a": 1}, headers=headers)
+
+    assert len(calls) == 1
+    assert retry.content == first.content
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert client.post("/sessions/today", json={"a": 1}).json() == {"session": 2}
+
+
+def test_key_reused_with_other_body_is_rejected():
+    """Réutiliser une clé avec un autre body renvoie 422"""
+    app, calls = build_app()
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "abc"}
+
+    client.post("/sessions/today", json={"a": 1}, headers=headers)
+    response = client.post("/sessions/today", json={"a": 2}, headers=headers)
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_multipart_retry_ignores_boundary():
+    """Un upload rejoué (nouveau boundary aléatoire) est reconnu comme identique"""
+    app, calls = build_app()
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "photo-1", "Authorization": "Bearer u1.a"}
+    upload = {"files": {"file": ("a.jpg", b"\xff\xd8photo", "image/jpeg")}, "data": {"task_id": "t1"}}
+
+    first = client.post("/uploads/photo", headers=headers, **upload)
+    retry = client.post("/uploads/photo", headers=headers, **upload)
+    other = client.post(
+        "/uploads/photo", headers=headers,
+        files={"file": ("a.jpg", b"\xff\xd8autre", "image/jpeg")}, data={"task_id": "t1"}
+    )
+
+    assert first.status_code == 200
+    assert retry.status_code == 200 and retry.headers["idempotent-replayed"] == "true"
+    assert other.status_code == 422
+    assert len(calls) == 1
+
+
+def test_boundary_split_across_chunks():
+    boundary = b"abcdef0123456789"
+    body = b"--" + boundary + b"\r\nx\r\n--" + boundary + b"--\r\n"
+    content_type = b"multipart/form-data; boundary=" + boundary
+    whole = BodyFingerprint(content_type)
+    whole.update(body)
+    split = BodyFingerprint(content_type)
+    for start in range(0, len(body), 5):
+        split.update(body[start:start + 5])
+    other = BodyFingerprint(b"multipart/form-data; boundary=zz" + boundary)
+    other.update(body.replace(boundary, b"zz" + boundary))
+
+    assert split.hexdigest() == whole.hexdigest() == other.hexdigest()
+
+
+def test_keys_scoped_by_token_subject():
+    """Même utilisateur après rafraîchissement du token : rejoué ; autre utilisateur : exécuté"""
+    app, calls = build_app()
+    client = TestClient(app)
+
+    client.post("/sessions/today", json={"a": 1}, headers={"Idempotency-Key": "k", "Authorization": "Bearer u1.a"})
+    refreshed = client.post(
+        "/sessions/today", json={"a": 1}, headers={"Idempotency-Key": "k", "Authorization": "Bearer u1.b"}
+    )
+    other_user = client.post(
+        "/sessions/today", json={"a": 1}, headers={"Idempotency-Key": "k", "Authorization": "Bearer u2.a"}
+    )
+    invalid = client.post(
+        "/sessions/today", json={"a": 1}, headers={"Idempotency-Key": "k", "Authorization": "Bearer invalid"}
+    )
+
+    assert refreshed.headers.get("idempotent-replayed") == "true"
+    assert "idempotent-replayed" not in other_user.headers
+    assert "idempotent-replayed" not in invalid.headers
+    assert len(calls) == 3
+
+
+def test_falls_back_to_memory_when_redis_fails(monkeypatch):
+    """Redis en erreur : marqué indisponible et clés conservées en mémoire du worker"""
+    from api.core import idempotency
+    from api.core.cache import cache
+
+    class BrokenRedis:
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis down")
+
+    failures = []
+    monkeypatch.setattr(cache, "_async_client", BrokenRedis())
+    monkeypatch.setattr(cache, "mark_async_unavailable", lambda e: (failures.append(e), setattr(cache, "_async_client", None)))
+    monkeypatch.setattr(idempotency, "_memory_store", MemoryIdempotencyStore())
+    monkeypatch.setattr(cache, "_async_retry_at", float("inf"))
+
+    app = FastAPI()
+    calls = []
+
+    @app.post("/sessions/today")
+    async def create_session(payload: dict):
+        calls.append(payload)
+        return {"session": len(calls)}
+
+    app.add_middleware(IdempotencyMiddleware, verify_token=verify_token)
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "k", "Authorization": "Bearer u1.a"}
+
+    client.post("/sessions/today", json={"a": 1}, headers=headers)
+    retry = client.post("/sessions/today", json={"a": 1}, headers=headers)
+
+    assert len(failures) == 1
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+
+def test_token_verified_once_per_request(monkeypatch):
+    """Claims vérifiés par le middleware réutilisés par get_current_user (pas de seconde vérification)"""
+    from fastapi import Depends
+
+    from api.core.database import get_db
+    from api.core.security import get_current_user
+    from api.models.user import User
+
+    verified = []
+
+    def verify_id_token(token):
+        verified.append(token)
+        return {"sub": "u1", "uid": "u1"}
+
+    class OneUserDB:
+        def query(self, model):
+            return self
+
+        def filter(self, *criteria):
+            return self
+
+        def first(self):
+            return User(firebase_uid="u1", full_name="Marie")
+
+    monkeypatch.setattr("api.core.security.verify_id_token", verify_id_token)
+    app = FastAPI()
+
+    @app.post("/sessions/today")
+    async def create_session(payload: dict, user: User = Depends(get_current_user)):
+        return {"user": user.firebase_uid}
+
+    app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore())
+    app.dependency_overrides[get_db] = OneUserDB
+    client = TestClient(app)
+
+    response = client.post("/sessions/today", json={}, headers={"Idempotency-Key": "k", "Authorization": "Bearer t1"})
+    assert response.json() == {"user": "u1"}
+    assert verified == ["t1"]
+
+    # Sans clé d'idempotence, la route vérifie elle-même le token
+    client.post("/sessions/today", json={}, headers={"Authorization": "Bearer t2"})
+    assert verified == ["t1", "t2"]
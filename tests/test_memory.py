@@ -0,0 +1,85 @@
+"""
+Diagnostic mémoire : relevé RSS/GC et snapshots tracemalloc par ligne et par route.
+"""
+
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.core.auth_dependencies import require_admin
+from api.core.memory import (
+    gc_collections,
+    memory_sampler,
+    memory_tracer,
+    process_resident_memory,
+)
+from api.core.metrics import registry
+from api.routers import profiling
+
+# Retenu entre les requêtes : la fuite à retrouver
+_leaked = []
+
+
+def test_sampler_exports_rss_and_gc_metrics():
+    import gc
+
+    memory_sampler.sample()
+    before = gc_collections.value(generation=0)
+    gc.collect(0)
+    values = memory_sampler.sample()
+
+    assert values["rss_bytes"] > 0
+    assert process_resident_memory.value() == values["rss_bytes"]
+    assert gc_collections.value(generation=0) >= before + 1
+    assert "python_gc_objects_tracked{generation=\"2\"}" in registry.render()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(profiling.router, prefix="/debug")
+    app.dependency_overrides[require_admin] = lambda: None
+
+    @app.post("/leak")
+    def leak():
+        _leaked.append(bytearray(256 * 1024))
+        return {}
+
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        memory_tracer.stop()
+        _leaked.clear()
+
+
+def test_snapshot_groups_growth_by_line_and_route(client):
+    assert client.post("/debug/memory/snapshot").status_code == 409
+
+    assert client.post("/debug/memory/start", params={"frames": 40}).json() == {"tracing": True, "frames": 40}
+    assert client.post("/debug/memory/start").status_code == 409
+    assert client.get("/debug/memory").json()["tracemalloc"]["tracing"] is True
+
+    for _ in range(4):
+        client.post("/leak")
+    snapshot = client.post("/debug/memory/snapshot").json()
+
+    top_line = snapshot["top_lines"][0]
+    assert top_line["file"].endswith("test_memory.py")
+    assert top_line["size_diff"] >= 4 * 256 * 1024
+    routes = {entry["route"]: entry for entry in snapshot["top_routes"]}
+    assert routes["POST /leak"]["size_diff"] >= 4 * 256 * 1024
+    assert snapshot["top_routes"][0]["route"] == "POST /leak"
+
+    # Rien de nouveau retenu depuis le snapshot précédent
+    second = client.post("/debug/memory/snapshot").json()
+    assert second["compared_to"] == "snapshot 1"
+    assert all(entry["size_diff"] < 256 * 1024 for entry in second["top_routes"])
+    # Comparé à la référence, la fuite reste visible
+    cumulative = client.post("/debug/memory/snapshot", params={"compare_to": "start"}).json()
+    assert cumulative["top_routes"][0]["route"] == "POST /leak"
+
+    assert client.post("/debug/memory/stop").json() == {"tracing": False}
+    assert not tracemalloc.is_tracing()
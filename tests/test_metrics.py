@@ -0,0 +1,36 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.core.metrics import MetricsMiddleware, MetricsRegistry, http_request_duration
+
+
+def test_histogram_rendering():
+    """Les buckets de l'histogramme sont cumulatifs"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latence", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/rooms")
+    histogram.observe(0.5, route="/rooms")
+    histogram.observe(5, route="/rooms")
+
+    output = registry.render()
+    assert 'latency_seconds_bucket{route="/rooms",le="0.1"} 1' in output
+    assert 'latency_seconds_bucket{route="/rooms",le="1"} 2' in output
+    assert 'latency_seconds_bucket{route="/rooms",le="+Inf"} 3' in output
+    assert 'latency_seconds_count{route="/rooms"} 3' in output
+
+
+def test_middleware_labels_by_route_template():
+    """La latence est labellisée par template de route, pas par chemin brut"""
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+
+    output = http_request_duration.render()
+    assert 'route="/items/{item_id}",status="200",le="+Inf"} 2' in output
+    assert "/items/1" not in output
@@ -0,0 +1,75 @@
+"""
+Mise à niveau du schéma : historique Alembic linéaire, base vide créée puis
+enregistrée à la tête, base créée sans Alembic reconnue.
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from api.core.migrations import UNVERSIONED_BASE_REVISION, alembic_config, unversioned_revision, upgrade_database
+from api.core.startup import alembic_heads, check_schema
+
+HEAD = "008_partition_cleaning_logs"
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+
+def revision_of(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def test_alembic_resolves_a_single_head():
+    """L'historique se charge dans Alembic (plus de parent manquant ni de seconde racine)"""
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(alembic_config())
+    assert script.get_heads() == [HEAD]
+    assert set(script.get_heads()) == alembic_heads()
+    assert [revision.revision for revision in script.walk_revisions()][-1] == "add_roles_001_add_admin_manager_roles"
+
+
+def test_empty_database_is_created_and_stamped(engine):
+    assert upgrade_database(engine) == "created"
+
+    assert revision_of(engine) == HEAD
+    with engine.connect() as connection:
+        tables = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+    assert {"users", "cleaning_sessions", "cleaning_logs", "enterprises"} <= tables
+    assert check_schema(engine, "strict") is None
+    # Deuxième passage (redémarrage du conteneur) : rien à migrer
+    assert upgrade_database(engine) == "upgraded"
+    assert revision_of(engine) == HEAD
+
+
+def test_unversioned_database_is_stamped_at_its_schema(engine):
+    """Base créée par l'ancien init_db.py au schéma courant : enregistrée à la tête, sans DDL"""
+    import api.models  # noqa: F401
+    from api.models.base import Base
+
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        assert unversioned_revision(connection) == HEAD
+
+    assert upgrade_database(engine) == "stamped+upgraded"
+    assert revision_of(engine) == HEAD
+
+
+def test_unversioned_revision_falls_back_to_pre_migration_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id CHAR(32) PRIMARY KEY)"))
+        connection.execute(text("CREATE TABLE cleaning_logs (id CHAR(32) PRIMARY KEY)"))
+        assert unversioned_revision(connection) == UNVERSIONED_BASE_REVISION
+
+        connection.execute(text("ALTER TABLE cleaning_logs ADD COLUMN updated_at DATETIME"))
+        assert unversioned_revision(connection) == "004_cleaning_logs_updated_at"
@@ -0,0 +1,119 @@
+"""
+Négociation JSON / MessagePack : choix du format d'après Accept, conventions
+d'encodage, bodies MessagePack et documentation OpenAPI.
+"""
+
+import enum
+import uuid
+from datetime import datetime
+from typing import Any, Dict
+
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.core.negotiation import (
+    MSGPACK_MEDIA_TYPE, MessagePackMiddleware, NegotiatedResponse, accepts_msgpack, document_msgpack, packb
+)
+
+ITEM_ID = uuid.UUID("12345678-1234-5678-1234-567812345678")
+
+
+class Status(enum.Enum):
+    FAIT = "fait"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI(default_response_class=NegotiatedResponse)
+    app.add_middleware(MessagePackMiddleware)
+
+    @app.get("/items")
+    async def items():
+        return [{"id": ITEM_ID, "status": Status.FAIT, "at": datetime(2024, 5, 1, 8, 30)}]
+
+    @app.post("/sessions/{session_id}/finalize")
+    async def finalize(session_id: str, payload: Dict[str, Any]):
+        return payload
+
+    @app.post("/other")
+    async def other(payload: Dict[str, Any]):
+        return payload
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack, */*;q=0.1", True),
+    ("application/json, application/msgpack;q=0.5", False),
+    ("application/msgpack;q=0", False),
+])
+def test_accept_header(accept, expected):
+    assert accepts_msgpack(accept) is expected
+
+
+def test_json_by_default(client):
+    response = client.get("/items")
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["vary"] == "Accept"
+
+
+def test_msgpack_uses_json_conventions(client):
+    as_json = client.get("/items").json()
+    response = client.get("/items", headers={"Accept": MSGPACK_MEDIA_TYPE})
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(response.content, raw=False) == as_json
+    assert as_json[0] == {"id": str(ITEM_ID), "status": "fait", "at": "2024-05-01T08:30:00"}
+
+
+def test_msgpack_body_on_allowed_route(client):
+    response = client.post(
+        f"/sessions/{ITEM_ID}/finalize",
+        content=packb({"task_statuses": [{"task_id": ITEM_ID, "status": {"status": "done"}}]}),
+        headers={"Content-Type": MSGPACK_MEDIA_TYPE}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"task_statuses": [{"task_id": str(ITEM_ID), "status": {"status": "done"}}]}
+
+
+def test_msgpack_body_keeps_route_for_outer_middlewares(client):
+    """La route résolue reste visible des métriques et du profileur (montés autour)"""
+    from api.core.metrics import route_label
+
+    labels = []
+    inner = client.app
+
+    async def outer(scope, receive, send):
+        await inner(scope, receive, send)
+        if scope["type"] == "http":
+            labels.append(route_label(scope))
+
+    response = TestClient(outer).post(
+        f"/sessions/{ITEM_ID}/finalize", content=packb({}), headers={"Content-Type": MSGPACK_MEDIA_TYPE}
+    )
+    assert response.status_code == 200
+    assert labels == ["/sessions/{session_id}/finalize"]
+
+
+def test_msgpack_body_rejected_elsewhere(client):
+    response = client.post("/other", content=packb({}), headers={"Content-Type": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 415
+
+
+def test_invalid_msgpack_body(client):
+    response = client.post(
+        f"/sessions/{ITEM_ID}/finalize", content=b"\xc1", headers={"Content-Type": MSGPACK_MEDIA_TYPE}
+    )
+    assert response.status_code == 400
+
+
+def test_openapi_documents_msgpack(client):
+    schema = document_msgpack(client.app.openapi())
+    assert MSGPACK_MEDIA_TYPE in schema["paths"]["/items"]["get"]["responses"]["200"]["content"]
+    finalize = schema["paths"]["/sessions/{session_id}/finalize"]["post"]
+    assert MSGPACK_MEDIA_TYPE in finalize["requestBody"]["content"]
+    assert MSGPACK_MEDIA_TYPE not in schema["paths"]["/other"]["post"]["requestBody"]["content"]
@@ -0,0 +1,94 @@
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.services.partition_service import add_months, ensure_log_partitions, partition_name
+
+
+def test_add_months_crosses_year_boundary():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_partition_name_is_chronologically_sortable():
+    assert partition_name(date(2026, 3, 1)) == "cleaning_logs_y2026m03"
+    assert partition_name(date(2026, 3, 1)) < partition_name(date(2026, 10, 1))
+
+
+def test_ensure_partitions_is_noop_without_postgresql():
+    """Base non partitionnée (SQLite) : aucune partition créée"""
+    with Session(create_engine("sqlite://")) as db:
+        assert ensure_log_partitions(db, months_ahead=2) == []
+
+
+def test_months_waiting_in_default_partition_get_their_own(monkeypatch):
+    """Logs d'un mois passé rangés dans DEFAULT : partition créée puis lignes déplacées et attachées"""
+    from api.services import partition_service
+
+    statements = []
+
+    class RecordingSession:
+        def execute(self, statement, params=None):
+            statements.append(str(statement))
+
+        def commit(self):
+            pass
+
+    monkeypatch.setattr(partition_service, "is_partitioned", lambda db: True)
+    monkeypatch.setattr(partition_service, "list_log_partitions", lambda db: ["cleaning_logs_y2026m10"])
+    monkeypatch.setattr(partition_service, "_default_partition_months", lambda db: [date(2024, 2, 1)])
+
+    created = ensure_log_partitions(RecordingSession(), months_ahead=1, today=date(2026, 10, 19))
+
+    # Workers sérialisés : verrou pris avant de relire les partitions existantes
+    assert "pg_advisory_xact_lock" in statements[0]
+    assert created == ["cleaning_logs_y2024m02", "cleaning_logs_y2026m11"]
+    moved = [sql for sql in statements if "cleaning_logs_y2024m02" in sql]
+    assert "DELETE FROM cleaning_logs_default" in moved[1]
+    assert moved[2].startswith("ALTER TABLE cleaning_logs ATTACH PARTITION cleaning_logs_y2024m02")
+    assert any("cleaning_logs_y2026m11 PARTITION OF cleaning_logs" in sql for sql in statements)
+
+
+def test_session_date_set_on_insert_without_service_setup():
+    """Clé de partition renseignée par le modèle lui-même, sans setup_session_counters()"""
+    from sqlalchemy.dialects.postgresql import UUID
+    from sqlalchemy.ext.compiler import compiles
+
+    from api.models.base import Base
+    from api.models.session import CleaningLog, CleaningSession
+
+    @compiles(UUID, "sqlite")
+    def _uuid_on_sqlite(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        session = CleaningSession(date=date(2024, 2, 14))
+        db.add(session)
+        db.flush()
+        log = CleaningLog(session_id=session.id)
+        db.add(log)
+        db.flush()
+        assert log.session_date == date(2024, 2, 14)
+
+
+def test_create_all_adds_default_partition_on_postgresql():
+    """Schéma créé sans la migration (init_db.py) : partition DEFAULT créée avec la table"""
+    from sqlalchemy import create_mock_engine
+
+    from api.models.base import Base
+    from api.models.session import CleaningLog  # noqa: F401  (tables enregistrées dans Base)
+
+    statements = []
+    engine = create_mock_engine(
+        "postgresql://", lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=engine.dialect)))
+    )
+    Base.metadata.create_all(engine, checkfirst=False)
+
+    parent = next(i for i, sql in enumerate(statements) if sql.strip().startswith("CREATE TABLE cleaning_logs ("))
+    assert "PARTITION BY RANGE (session_date)" in statements[parent]
+    default = next(i for i, sql in enumerate(statements) if "cleaning_logs_default" in sql)
+    assert default > parent
+    assert statements[default] == "CREATE TABLE IF NOT EXISTS cleaning_logs_default PARTITION OF cleaning_logs DEFAULT"
@@ -0,0 +1,293 @@
+"""
+Nombre de requêtes SQL par service et par endpoint, en mode de chargement
+strict : un accès implicite à une relation non chargée fait échouer le test.
+"""
+
+import asyncio
+import json
+from datetime import date, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.core.query_profiler import install_query_profiler, query_budget, setup_strict_loading, teardown_strict_loading
+from api.models.base import Base
+from api.models.performer import Performer
+from api.models.room import Room
+from api.models.session import CleaningLog, CleaningSession, LogStatus
+from api.models.task import AssignedTask, TaskTemplate
+from api.models.user import User
+from api.schemas.task import AssignedTaskResponse
+from api.schemas.sync import NormalizedSessionLogs
+from api.services.session_service import NORMALIZED_LOG_RELATIONS, normalize_session_logs, setup_session_counters
+from api.services import task_scheduler
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+TASK_COUNT = 6
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    install_query_profiler(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    setup_session_counters()
+    setup_strict_loading()
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        teardown_strict_loading()
+
+
+@pytest.fixture
+def data(db):
+    """Tâches quotidiennes réparties sur deux pièces, une semaine de sessions"""
+    performer = Performer(name="Marie")
+    rooms = [Room(name="Cuisine"), Room(name="Salon")]
+    template = TaskTemplate(name="Sols", default_duration=20)
+    db.add_all([performer, *rooms, template])
+    db.flush()
+
+    tasks = [
+        AssignedTask(
+            task_template_id=template.id,
+            room_id=rooms[i % 2].id,
+            default_performer_id=performer.id,
+            frequency={"type": "daily", "times_per_day": 1},
+            order_in_room=i,
+            is_active=True
+        )
+        for i in range(TASK_COUNT)
+    ]
+    db.add_all(tasks)
+    db.flush()
+
+    for days_ago in range(7):
+        session = CleaningSession(date=date.today() - timedelta(days=days_ago))
+        db.add(session)
+        db.flush()
+        db.add_all([
+            CleaningLog(session_id=session.id, assigned_task_id=task.id, status=LogStatus.REPORTE)
+            for task in tasks
+        ])
+    ids = {"performer_id": performer.id, "task_ids": [task.id for task in tasks]}
+    db.commit()
+    db.expunge_all()
+    return ids
+
+
+# ===== SERVICES =====
+
+def test_suggested_schedule_single_query(db, data):
+    with query_budget(max_queries=1):
+        schedule = task_scheduler.get_suggested_schedule(db, date.today())
+    assert len(schedule) == TASK_COUNT
+    assert {item["performer_name"] for item in schedule} == {"Marie"}
+
+
+def test_optimized_schedule_single_query(db, data):
+    with query_budget(max_queries=1):
+        schedule = task_scheduler.optimize_task_schedule(db, date.today())
+    assert {item["room_name"] for item in schedule} == {"Cuisine", "Salon"}
+
+
+def test_workload_distribution_loads_tasks_once(db, data):
+    with query_budget(max_queries=1):
+        distribution = task_scheduler.calculate_workload_distribution(
+            db, date.today() - timedelta(days=6), date.today()
+        )
+    assert distribution[str(data["performer_id"])]["total_tasks"] == TASK_COUNT * 7
+
+
+def test_overdue_tasks_without_n_plus_one(db, data):
+    with query_budget(max_queries=2):
+        overdue = task_scheduler.get_overdue_tasks(db)
+    assert len(overdue) == TASK_COUNT
+    assert all(task["room_name"] in ("Cuisine", "Salon") for task in overdue)
+
+
+def test_strict_mode_rejects_implicit_lazy_load(db, data):
+    """Sans stratégie explicite, la sérialisation d'une tâche lève une erreur"""
+    task = db.query(AssignedTask).first()
+    with pytest.raises(InvalidRequestError):
+        AssignedTaskResponse.from_orm_model(task)
+
+
+def test_assigned_task_response_with_explicit_loading(db, data):
+    task = db.query(AssignedTask).options(*task_scheduler.ASSIGNED_TASK_RELATIONS).first()
+    with query_budget(max_queries=0):
+        response = AssignedTaskResponse.from_orm_model(task)
+    assert response.default_performer.name == "Marie"
+
+
+def test_normalized_logs_include_each_entity_once(db, data):
+    session_id = db.query(CleaningSession.id).filter(CleaningSession.date == date.today()).scalar()
+    with query_budget(max_queries=4, max_repeats=1):
+        logs = db.query(CleaningLog).options(*NORMALIZED_LOG_RELATIONS).filter(CleaningLog.session_id == session_id).all()
+    with query_budget(max_queries=0):
+        normalized = NormalizedSessionLogs.model_validate(normalize_session_logs(session_id, logs), from_attributes=True)
+    assert len(normalized.logs) == TASK_COUNT
+    assert len(normalized.included.assigned_tasks) == TASK_COUNT
+    assert {room.name for room in normalized.included.rooms.values()} == {"Cuisine", "Salon"}
+    assert len(normalized.included.task_templates) == 1
+    assert all(str(log.assigned_task_id) in normalized.included.assigned_tasks for log in normalized.logs)
+
+
+def test_repeated_status_change_counted_once(engine, db, data):
+    """Le même REPORTE -> FAIT appliqué par deux requêtes (rejeu) ne compte qu'une fois"""
+    session_id = db.query(CleaningSession.id).filter(CleaningSession.date == date.today()).scalar()
+    log_id = db.query(CleaningLog.id).filter(CleaningLog.session_id == session_id).first()[0]
+    db.rollback()
+
+    # Les deux requêtes chargent le log alors qu'il est encore REPORTE
+    first, retry = (sessionmaker(bind=engine, autoflush=False)() for _ in range(2))
+    logs = [session.get(CleaningLog, log_id) for session in (first, retry)]
+    assert {log.status for log in logs} == {LogStatus.REPORTE}
+    for session, log in zip((first, retry), logs):
+        log.status = LogStatus.FAIT
+        session.commit()
+        session.close()
+
+    counters = db.query(CleaningSession.fait_count, CleaningSession.reporte_count).filter(
+        CleaningSession.id == session_id
+    ).one()
+    assert tuple(counters) == (1, TASK_COUNT - 1)
+
+
+# ===== ENDPOINTS =====
+
+@pytest.fixture
+def client(engine, db, data, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.core.database import get_db
+    from api.core.security import get_current_user
+    from api.main import app
+
+    # Les agrégats (tableau de bord) ouvrent leur propre session
+    testing_session = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr("api.core.database.SessionLocal", testing_session)
+
+    def override_get_db():
+        session = testing_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: User(firebase_uid="test", full_name="Test")
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path, max_queries", [
+    ("/assigned-tasks", 2),       # validateur ETag + tâches avec relations
+    ("/sessions/{session_id}/logs", 3),  # validateur ETag + session + logs avec relations
+    ("/sessions/{session_id}/logs?format=normalized", 6),  # + une requête IN par relation
+    ("/assigned-tasks?fields=id,room,times_per_day", 2),
+    ("/sessions?fields=id,date,status", 1),
+    ("/logs?fields=id,status,timestamp", 1),
+    ("/performers?fields=id,name", 2),
+    ("/dashboard", 5),
+    ("/dashboard/metrics?period=month", 1),
+])
+def test_endpoint_query_count(client, db, path, max_queries):
+    session_id = db.query(CleaningSession.id).filter(CleaningSession.date == date.today()).scalar()
+    with query_budget(max_queries=max_queries, max_repeats=1):
+        response = client.get(path.format(session_id=session_id))
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("stream_threshold", [1 << 20, 0])
+def test_finalize_query_count(client, db, data, monkeypatch, stream_threshold):
+    monkeypatch.setattr("api.core.config.settings.finalize_stream_threshold", stream_threshold)
+    session_id = db.query(CleaningSession.id).filter(CleaningSession.date == date.today()).scalar()
+    payload = {"task_statuses": [
+        {"task_id": str(task_id), "status": {"status": "done", "performed_by": "Marie"}}
+        for task_id in data["task_ids"]
+    ]}
+    # session, logs, exécutants, verrou des logs modifiés, UPDATE des logs, UPDATE des compteurs
+    with query_budget(max_queries=6, max_repeats=2):
+        response = client.post(f"/sessions/{session_id}/finalize", json=payload)
+    assert response.status_code == 200, response.text
+    assert response.json()["logs_updated"] == TASK_COUNT
+    statuses = db.query(CleaningLog.status).filter(CleaningLog.session_id == session_id).all()
+    assert {status for status, in statuses} == {LogStatus.FAIT}
+
+
+@pytest.mark.parametrize("stream_threshold", [1 << 20, 0])
+def test_finalize_rejects_invalid_item(client, db, data, monkeypatch, stream_threshold):
+    monkeypatch.setattr("api.core.config.settings.finalize_stream_threshold", stream_threshold)
+    session_id = db.query(CleaningSession.id).filter(CleaningSession.date == date.today()).scalar()
+    payload = {"task_statuses": [
+        {"task_id": str(data["task_ids"][0]), "status": {"status": "done"}},
+        {"task_id": str(data["task_ids"][1]), "status": {"status": "inconnu"}},
+    ]}
+    response = client.post(f"/sessions/{session_id}/finalize", json=payload)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][:3] == ["body", "task_statuses", 1]
+    statuses = db.query(CleaningLog.status).filter(CleaningLog.session_id == session_id).all()
+    assert {status for status, in statuses} == {LogStatus.REPORTE}
+
+
+def test_idempotent_finalize_is_streamed(client, db, data, monkeypatch):
+    """Avec Idempotency-Key, le body de finalisation arrive toujours par morceaux à la route"""
+    from api.routers import sessions
+
+    monkeypatch.setattr("api.core.config.settings.finalize_stream_threshold", 0)
+    chunk_sizes = []
+    iter_json_array = sessions.iter_json_array
+
+    async def spying_iter_json_array(chunks, key):
+        async def counted():
+            async for chunk in chunks:
+                chunk_sizes.append(len(chunk))
+                yield chunk
+        async for element in iter_json_array(counted(), key):
+            yield element
+
+    monkeypatch.setattr(sessions, "iter_json_array", spying_iter_json_array)
+    session_id = db.query(CleaningSession.id).filter(CleaningSession.date == date.today()).scalar()
+    body = json.dumps({"task_statuses": [
+        {"task_id": str(task_id), "status": {"status": "done", "performed_by": "Marie"}}
+        for task_id in data["task_ids"]
+    ]}).encode()
+
+    async def post():
+        async def chunks():
+            for start in range(0, len(body), 64):
+                yield body[start:start + 64]
+
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post(
+                f"/sessions/{session_id}/finalize", content=chunks(), headers={"Idempotency-Key": "finalize-1"}
+            )
+
+    first = asyncio.run(post())
+    assert first.status_code == 200, first.text
+    assert len(chunk_sizes) > 1 and max(chunk_sizes) <= 64
+
+    retry = asyncio.run(post())
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.content == first.content
@@ -0,0 +1,68 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from api.core.query_profiler import (
+    QueryBudgetExceeded,
+    QueryProfilerMiddleware,
+    fingerprint,
+    install_query_profiler,
+    query_budget,
+)
+
+
+@pytest.fixture
+def profiled_engine():
+    engine = create_engine("sqlite:///:memory:")
+    install_query_profiler(engine)
+    return engine
+
+
+def test_fingerprint_ignores_values():
+    """Deux requêtes ne différant que par leurs valeurs ont la même forme"""
+    assert fingerprint("SELECT * FROM rooms WHERE id = 12") == fingerprint(
+        "SELECT *  FROM rooms\n WHERE id = 42"
+    )
+    assert fingerprint("SELECT * FROM rooms WHERE name = 'a'") == "SELECT * FROM rooms WHERE name = ?"
+    assert fingerprint("SELECT * FROM rooms WHERE id IN (?, ?, ?)") == "SELECT * FROM rooms WHERE id IN (?)"
+
+
+def test_query_budget_counts_queries(profiled_engine):
+    """Le budget compte les requêtes exécutées dans le bloc"""
+    with profiled_engine.connect() as conn:
+        with query_budget(max_queries=2) as stats:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    assert stats.count == 2
+    assert stats.total_time >= 0
+
+
+def test_query_budget_detects_n_plus_one(profiled_engine):
+    """Une même forme de requête répétée fait échouer le budget"""
+    with profiled_engine.connect() as conn:
+        conn.execute(text("CREATE TABLE rooms (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO rooms (id, name) VALUES (1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')"))
+
+        with pytest.raises(QueryBudgetExceeded):
+            with query_budget(max_repeats=2):
+                for room_id in range(1, 5):
+                    conn.execute(text("SELECT name FROM rooms WHERE id = :id"), {"id": room_id})
+
+        with query_budget(max_queries=1, max_repeats=1):
+            conn.execute(text("SELECT name FROM rooms WHERE id IN (1, 2, 3, 4)"))
+
+
+def test_middleware_sets_server_timing(profiled_engine):
+    """Le middleware expose le temps DB dans Server-Timing"""
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        with profiled_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    app.add_middleware(QueryProfilerMiddleware, engine=profiled_engine)
+    response = TestClient(app).get("/ping")
+    assert response.status_code == 200
+    assert 'desc="1 queries"' in response.headers["server-timing"]
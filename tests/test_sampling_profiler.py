@@ -0,0 +1,89 @@
+"""
+Profileur par échantillonnage : signaux, thread de relevé et rattachement aux routes.
+"""
+
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.core.auth_dependencies import require_admin
+from api.core.config import settings
+from api.core.middlewares import RequestIDMiddleware
+from api.core.sampling_profiler import NO_REQUEST, SamplingProfiler
+from api.routers import profiling
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_signal_sampler_in_main_thread():
+    idle = threading.Event()
+    sleeper = threading.Thread(target=idle.wait)
+    sleeper.start()
+    profiler = SamplingProfiler(interval=0.005, mode="cpu")
+    profiler.start()
+    try:
+        spin(0.3)
+    finally:
+        profiler.stop()
+        idle.set()
+        sleeper.join()
+
+    assert profiler.method == "signal"
+    assert profiler.samples > 10
+    collapsed = profiler.collapsed()
+    assert f"{NO_REQUEST};" in collapsed
+    assert "spin (" in collapsed
+    # Thread au repos (Event.wait) jamais compté
+    assert all(stack[-1][0] != "wait" for _, stack in profiler.stacks)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(RequestIDMiddleware)
+    app.include_router(profiling.router, prefix="/debug")
+    app.dependency_overrides[require_admin] = lambda: None
+
+    @app.get("/busy/{item_id}")
+    def busy(item_id: str):
+        spin(0.6)
+        return {}
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_endpoint_tags_samples_by_route(client):
+    worker = threading.Thread(target=client.get, args=("/busy/1",))
+    worker.start()
+    time.sleep(0.05)
+    response = client.post("/debug/profile", params={"seconds": 0.3, "interval_ms": 5, "mode": "wall"})
+    worker.join()
+
+    assert response.status_code == 200
+    assert response.headers["X-Profile-Method"] == "thread"  # TestClient : app hors du thread principal
+    profile = response.json()
+    routes = {entry["name"]: entry for entry in profile["profiles"]}
+    busy = routes["GET /busy/{item_id}"]
+    frames = profile["shared"]["frames"]
+    assert any(frames[sample[-1]]["name"] == "spin" for sample in busy["samples"])
+    assert len(busy["samples"]) == len(busy["weights"])
+
+
+def test_endpoint_limits(client, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_max_seconds", 1.0)
+    assert client.post("/debug/profile", params={"seconds": 2}).status_code == 400
+
+    first = threading.Thread(target=client.post, args=("/debug/profile",), kwargs={"params": {"seconds": 0.3}})
+    first.start()
+    time.sleep(0.1)
+    response = client.post("/debug/profile", params={"seconds": 0.1, "format": "collapsed"})
+    first.join()
+    assert response.status_code == 409
@@ -0,0 +1,123 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, literal, select, update
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.models.base import Base
+from api.models.session import CleaningLog, CleaningSession, LogStatus, SessionStatus
+from api.routers.sessions import load_session_statistics
+from api.services.session_service import (
+    compute_session_statistics,
+    persist_session_statistics,
+    session_status_case,
+    setup_session_counters,
+)
+
+
+def derive(fait, impossible, reporte, total):
+    engine = create_engine("sqlite://")
+    expression = session_status_case(literal(fait), literal(impossible), literal(reporte), literal(total))
+    with engine.connect() as conn:
+        return conn.execute(select(expression)).scalar()
+
+
+def test_session_completed_when_all_logs_finished():
+    """Fait + impossible couvrant tous les logs : session complétée"""
+    assert derive(fait=28, impossible=2, reporte=0, total=30) == SessionStatus.COMPLETEE
+
+
+def test_session_in_progress_when_everything_postponed():
+    """Aucun log traité : session en cours"""
+    assert derive(fait=0, impossible=0, reporte=30, total=30) == SessionStatus.EN_COURS
+
+
+def test_session_incomplete_otherwise():
+    """Mélange de statuts : session incomplète"""
+    assert derive(fait=10, impossible=0, reporte=15, total=30) == SessionStatus.INCOMPLETE
+
+
+# ===== STATISTIQUES PERSISTÉES =====
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    setup_session_counters()
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def completed_session(db):
+    session = CleaningSession(date=date.today())
+    db.add(session)
+    db.flush()
+    db.add_all([CleaningLog(session_id=session.id, status=LogStatus.FAIT) for _ in range(2)])
+    db.commit()
+    # updated_at écrit depuis Python : même format SQLite que les paramètres comparés
+    db.execute(update(CleaningSession).where(CleaningSession.id == session.id).values(updated_at=datetime(2026, 1, 1)))
+    db.commit()
+    db.refresh(session)
+    assert session.status == SessionStatus.COMPLETEE
+    return session
+
+
+def test_completed_session_statistics_persisted_and_reused(db, completed_session, monkeypatch):
+    """Calculées une fois à la complétion, puis relues sans recalcul"""
+    first = load_session_statistics(db, completed_session.id)
+    db.expire_all()
+    assert completed_session.statistics == first
+
+    def fail(*args):
+        raise AssertionError("statistiques recalculées")
+
+    monkeypatch.setattr("api.routers.sessions.compute_session_statistics", fail)
+    assert load_session_statistics(db, completed_session.id) == first
+
+
+def test_stale_statistics_not_persisted(db, completed_session):
+    """Session modifiée depuis le calcul (updated_at différent) : rien n'est figé"""
+    statistics = compute_session_statistics(db, completed_session)
+    db.expunge(completed_session)  # instance chargée avant la modification concurrente
+    db.execute(
+        update(CleaningSession).where(CleaningSession.id == completed_session.id)
+        .values(updated_at=datetime(2030, 1, 1))
+    )
+    db.commit()
+
+    persist_session_statistics(db, completed_session, statistics)
+    assert db.get(CleaningSession, completed_session.id).statistics is None
+
+
+def test_statistics_cleared_on_reopen(db, completed_session):
+    load_session_statistics(db, completed_session.id)
+    db.expire_all()
+    assert completed_session.statistics is not None
+
+    completed_session.status = SessionStatus.EN_COURS
+    db.commit()
+    db.expire_all()
+    assert completed_session.statistics is None
+
+
+def test_statistics_cleared_on_counter_change(db, completed_session):
+    load_session_statistics(db, completed_session.id)
+    log = db.query(CleaningLog).filter(CleaningLog.session_id == completed_session.id).first()
+    log.status = LogStatus.REPORTE
+    db.commit()
+    db.expire_all()
+
+    assert completed_session.statistics is None
+    assert completed_session.status != SessionStatus.COMPLETEE
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from api.core.cache import cache
+from api.core.single_flight import RELEASE_LOCK_SCRIPT, AggregateCache, SingleFlight
+
+
+def test_single_flight_shares_one_computation():
+    """Les appels concurrents d'une même clé attendent le même calcul"""
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"total": 42}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("dashboard", compute) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"total": 42}] * 10
+    assert not flight.in_flight("dashboard")
+
+
+def test_aggregate_cache_coalesces_threadpool_computations():
+    """Un calcul SQL synchrone n'est exécuté qu'une fois pour des requêtes simultanées"""
+    aggregates = AggregateCache()
+    calls = []
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            calls.append(1)
+        time.sleep(0.05)
+        return {"completion_rate": 80}
+
+    async def main():
+        return await asyncio.gather(*(
+            aggregates.get_or_compute("sessions", ("statistics", "s1"), compute)
+            for _ in range(5)
+        ))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result == {"completion_rate": 80} for result in results)
+
+
+# ===== STALE-WHILE-REVALIDATE ET VERROU INTER-WORKERS =====
+
+KEY = "agg:sessions:statistics:s1"
+
+
+class FakeAsyncRedis:
+    """``redis.asyncio`` réduit aux commandes du cache et du verrou"""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def delete(self, key):
+        self.commands.append(("delete", key))
+        return int(self.data.pop(key, None) is not None)
+
+    async def eval(self, script, numkeys, *args):
+        self.commands.append(("eval", *args))
+        assert script == RELEASE_LOCK_SCRIPT
+        (key,), (token,) = args[:numkeys], args[numkeys:]
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeAsyncRedis()
+    monkeypatch.setattr(cache, "redis_url", "redis://test")
+    monkeypatch.setattr(cache, "_async_client", redis)
+    monkeypatch.setattr(cache, "_listening", False)
+    return redis
+
+
+def entry(value, age=0):
+    return json.dumps({"value": value, "computed_at": time.time() - age, "version": 0})
+
+
+def test_stale_aggregate_served_while_one_refresh_runs(redis):
+    """Entrée périmée servie tout de suite à tous ; un seul recalcul en arrière-plan"""
+    aggregates = AggregateCache()
+    redis.data[KEY] = entry({"completion_rate": 50}, age=3600)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"completion_rate": 80}
+
+    async def main():
+        results = await asyncio.gather(*(
+            aggregates.get_or_compute("sessions", ("statistics", "s1"), compute) for _ in range(5)
+        ))
+        await asyncio.gather(*aggregates._background)
+        return results
+
+    assert asyncio.run(main()) == [{"completion_rate": 50}] * 5
+    assert len(calls) == 1
+    assert json.loads(redis.data[KEY])["value"] == {"completion_rate": 80}
+    assert f"lock:{KEY}" not in redis.data
+
+
+def test_waits_for_peer_lock_instead_of_recomputing(redis):
+    """Verrou Redis tenu par un autre worker : son résultat est attendu, pas recalculé"""
+    aggregates = AggregateCache()
+    redis.data[f"lock:{KEY}"] = "peer-token"
+
+    def compute():
+        raise AssertionError("agrégat recalculé alors qu'un autre worker le calcule")
+
+    async def peer():
+        await asyncio.sleep(0.1)
+        redis.data[KEY] = entry({"completion_rate": 80})
+        del redis.data[f"lock:{KEY}"]
+
+    async def main():
+        peer_task = asyncio.create_task(peer())
+        value = await aggregates.get_or_compute("sessions", ("statistics", "s1"), compute)
+        await peer_task
+        return value
+
+    assert asyncio.run(main()) == {"completion_rate": 80}
+    assert redis.commands == []
+
+
+def test_lock_released_only_by_its_owner(redis):
+    """Verrou expiré puis repris par un pair : la libération (compare-and-delete atomique) le laisse en place"""
+    aggregates = AggregateCache()
+    redis.data[f"lock:{KEY}"] = "peer-token"
+
+    asyncio.run(aggregates._release_lock(KEY, "expired-token"))
+    assert redis.data[f"lock:{KEY}"] == "peer-token"
+
+    asyncio.run(aggregates._release_lock(KEY, "peer-token"))
+    assert f"lock:{KEY}" not in redis.data
+    assert [command[0] for command in redis.commands] == ["eval", "eval"]
@@ -0,0 +1,95 @@
+"""
+Sparse fieldsets : validation des champs, SELECT projeté et sérialisation
+sans chargement d'attribut supplémentaire.
+"""
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.core.query_profiler import install_query_profiler, query_budget
+from api.core.sparse_fields import SparseFieldset
+from api.models.base import Base
+from api.models.performer import Performer
+from api.models.room import Room
+from api.models.task import AssignedTask, TaskTemplate
+from api.schemas.performer import PerformerResponse
+from api.schemas.task import AssignedTaskResponse
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+PERFORMER_FIELDS = SparseFieldset(Performer, PerformerResponse)
+TASK_FIELDS = SparseFieldset(
+    AssignedTask,
+    AssignedTaskResponse,
+    sources={"times_per_day": (AssignedTask.frequency,)},
+    getters={"times_per_day": lambda task: (task.frequency or {}).get("times_per_day", 1)}
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    install_query_profiler(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    session = sessionmaker(bind=engine)()
+    room, template = Room(name="Cuisine"), TaskTemplate(name="Sols")
+    session.add_all([Performer(name="Marie"), room, template])
+    session.flush()
+    session.add(AssignedTask(room_id=room.id, task_template_id=template.id, frequency={"times_per_day": 2}))
+    session.commit()
+    session.expunge_all()
+    statements.clear()
+    session.statements = statements
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def test_no_fields_means_full_response():
+    assert PERFORMER_FIELDS.parse(None) is None
+    assert PERFORMER_FIELDS.parse(" ") is None
+
+
+def test_unknown_field_rejected():
+    with pytest.raises(HTTPException) as exc_info:
+        PERFORMER_FIELDS.parse("name,salary")
+    assert exc_info.value.status_code == 400
+    assert "salary" in exc_info.value.detail
+
+
+def test_projection_selects_only_requested_columns(db):
+    selected = PERFORMER_FIELDS.parse("name")
+    with query_budget(max_queries=1):
+        rows = [
+            PERFORMER_FIELDS.serialize(p, selected)
+            for p in db.query(Performer).options(*PERFORMER_FIELDS.options(selected)).all()
+        ]
+    assert list(rows[0]) == ["id", "name"]
+    assert rows[0]["name"] == "Marie"
+    assert "is_active" not in db.statements[0] and "created_at" not in db.statements[0]
+
+
+def test_projection_joins_only_requested_relations(db):
+    selected = TASK_FIELDS.parse("room,times_per_day")
+    with query_budget(max_queries=1):
+        rows = [
+            TASK_FIELDS.serialize(task, selected)
+            for task in db.query(AssignedTask).options(*TASK_FIELDS.options(selected)).all()
+        ]
+    assert set(rows[0]) == {"id", "room", "times_per_day"}
+    assert rows[0]["room"]["name"] == "Cuisine"
+    assert rows[0]["times_per_day"] == 2
+    assert "task_templates" not in db.statements[0]
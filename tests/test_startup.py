@@ -0,0 +1,102 @@
+"""
+Démarrage rapide : budget d'import de l'application, dépendances lourdes
+différées et vérification de la révision Alembic sans DDL.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from api.core.startup import StartupTimer, alembic_heads, check_schema
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Temps max d'``import api.main`` dans un interpréteur neuf (secondes)
+IMPORT_BUDGET = 3.0
+
+# Chargés au premier usage seulement
+DEFERRED_MODULES = ("firebase_admin", "google.auth", "PIL", "reportlab", "weasyprint", "bleach", "apscheduler", "alembic")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import api.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def test_app_import_is_fast_and_defers_heavy_dependencies():
+    # Sans configuration Firebase : l'import ne doit plus l'exiger
+    env = {key: value for key, value in os.environ.items() if not key.startswith("FIREBASE_")}
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    assert probe["loaded"] == []
+    assert probe["elapsed"] < IMPORT_BUDGET, f"import api.main: {probe['elapsed']:.2f} s"
+
+
+def test_startup_timer_records_phases():
+    timer = StartupTimer()
+    with timer.phase("schema"):
+        pass
+    timer.record("imports", 0.25)
+    assert [name for name, _ in timer.phases] == ["schema", "imports"]
+    assert "imports 250 ms" in timer.summary()
+
+
+# ===== VÉRIFICATION DU SCHÉMA =====
+
+@pytest.fixture
+def versions_dir(tmp_path):
+    (tmp_path / "001_initial.py").write_text("revision = '001'\ndown_revision = None\n")
+    (tmp_path / "002_next.py").write_text("revision: str = '002'\ndown_revision: Union[str, None] = '001'\n")
+    return tmp_path
+
+
+def engine_at(revision=None):
+    engine = create_engine("sqlite://")
+    if revision is not None:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+            connection.execute(text("INSERT INTO alembic_version VALUES (:revision)"), {"revision": revision})
+    return engine
+
+
+def test_heads_read_from_version_files(versions_dir):
+    assert alembic_heads(versions_dir) == {"002"}
+
+
+def test_repository_history_has_a_single_head():
+    assert alembic_heads() == {"008_partition_cleaning_logs"}
+
+
+def test_up_to_date_database(versions_dir):
+    assert check_schema(engine_at("002"), "strict", versions_dir) is None
+
+
+def test_outdated_database_warns(versions_dir):
+    assert "001" in check_schema(engine_at("001"), "warn", versions_dir)
+
+
+def test_outdated_database_refused_in_strict_mode(versions_dir):
+    with pytest.raises(RuntimeError, match="scripts/migrate_db.py"):
+        check_schema(engine_at("001"), "strict", versions_dir)
+
+
+def test_unversioned_database(versions_dir):
+    assert check_schema(engine_at(), "warn", versions_dir) == "base non versionnée par Alembic"
+    assert check_schema(engine_at(), "off", versions_dir) is None
+
+
+def test_unreachable_database_does_not_block_startup(versions_dir):
+    engine = create_engine("sqlite:////nonexistent/directory/db.sqlite")
+    assert check_schema(engine, "warn", versions_dir).startswith("base injoignable")
@@ -0,0 +1,109 @@
+"""
+Parsing incrémental d'un tableau JSON et limite de taille des bodies.
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from api.core.body_limit import BodyLimitMiddleware, body_limit
+from api.core.config import settings
+from api.core.streaming_json import iter_batches, iter_json_array
+
+
+def parse(body: str, chunk_size: int, key: str = "task_statuses"):
+    data = body.encode("utf-8")
+
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def collect():
+        return [item async for item in iter_json_array(chunks(), key)]
+
+    return asyncio.run(collect())
+
+
+BODY = json.dumps({
+    "session": {"notes": "début", "items": [1, 2]},
+    "task_statuses": [{"task_id": f"t{i}", "status": {"status": "done", "notes": "Évier nettoyé ✓"}} for i in range(5)],
+    "count": 12345,
+}, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 10_000])
+def test_elements_independent_of_chunking(chunk_size):
+    assert parse(BODY, chunk_size) == json.loads(BODY)["task_statuses"]
+
+
+@pytest.mark.parametrize("body, expected", [
+    ('{}', []),
+    ('{"task_statuses": []}', []),
+    ('  {"other": 123456789, "task_statuses" : [ 1 , 2.5 ,null ] }  ', [1, 2.5, None]),
+])
+def test_edge_cases(body, expected):
+    assert parse(body, 2) == expected
+
+
+@pytest.mark.parametrize("body", [
+    '{"task_statuses": [{"a": 1}',
+    '{"task_statuses": [1 2]}',
+    '{"task_statuses": [1]} trailing',
+    '[1, 2]',
+])
+def test_invalid_json(body):
+    with pytest.raises(json.JSONDecodeError):
+        parse(body, 4)
+
+
+def test_batches():
+    async def numbers():
+        for number in range(7):
+            yield number
+
+    async def collect():
+        return [batch async for batch in iter_batches(numbers(), 3)]
+
+    assert asyncio.run(collect()) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+# ===== LIMITE DE TAILLE =====
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "max_request_body_size", 100)
+    app = FastAPI()
+    app.add_middleware(BodyLimitMiddleware)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_route_specific_limits():
+    assert body_limit("POST", "/sessions/abc/finalize") == settings.finalize_max_body_size
+    assert body_limit("POST", "/uploads/photos") > body_limit("POST", "/uploads/photo") > settings.max_file_size
+    assert body_limit("POST", "/performers") == settings.max_request_body_size
+
+
+def test_body_under_limit(client):
+    assert client.post("/echo", content=b"x" * 100).json() == {"size": 100}
+
+
+def test_content_length_over_limit(client):
+    response = client.post("/echo", content=b"x" * 101)
+    assert response.status_code == 413
+
+
+def test_chunked_body_over_limit(client):
+    def chunks():
+        for _ in range(5):
+            yield b"x" * 40
+
+    response = client.post("/echo", content=chunks())
+    assert response.status_code == 413
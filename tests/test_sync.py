@@ -0,0 +1,133 @@
+"""
+Synchronisation différentielle : jeton, fenêtre de recouvrement, suppressions
+logiques et instantané complet.
+"""
+
+import base64
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.core.database import get_db
+from api.core.security import get_current_user
+from api.models.base import Base
+from api.models.room import Room
+from api.models.session import CleaningLog, CleaningSession, LogStatus
+from api.models.user import User
+from api.routers import sync
+from api.routers.sync import decode_sync_token, encode_sync_token
+from api.services.session_service import setup_session_counters
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def test_token_round_trip():
+    watermark = datetime(2026, 3, 14, 9, 26, 53, 589793)
+    token = encode_sync_token(watermark)
+
+    assert "=" not in token
+    assert decode_sync_token(token) == watermark
+
+
+@pytest.mark.parametrize("token", [
+    "pas-un-jeton",
+    base64.urlsafe_b64encode(b"v2:2026-03-14T09:26:53").decode(),  # autre version
+    base64.urlsafe_b64encode(b"v1:hier").decode(),
+    encode_sync_token(datetime(2026, 3, 14))[:-3] + "!!!",  # altéré
+])
+def test_invalid_token_asks_for_full_sync(token):
+    with pytest.raises(HTTPException) as error:
+        decode_sync_token(token)
+    assert error.value.status_code == 400
+    assert "complète" in error.value.detail
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    setup_session_counters()
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(sync.router, prefix="/sync")
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: User(firebase_uid="test", full_name="Test")
+    return TestClient(app)
+
+
+@pytest.fixture
+def data(db):
+    """Pièces modifiées à différents moments avant ``now`` (horloge de la base)"""
+    rooms = {name: Room(name=name) for name in ("ancienne", "avant-recouvrement", "recouvrement", "desactivee")}
+    rooms["desactivee"].is_active = False
+    session = CleaningSession(date=date.today())
+    db.add_all([*rooms.values(), session])
+    db.flush()
+    log = CleaningLog(session_id=session.id, status=LogStatus.REPORTE)
+    db.add(log)
+    db.commit()
+
+    now = db.execute(select(func.now())).scalar()
+    updated_at = {
+        "ancienne": now - timedelta(hours=1),
+        "avant-recouvrement": now - timedelta(seconds=70),
+        "recouvrement": now - timedelta(seconds=62),
+        "desactivee": now - timedelta(seconds=10),
+    }
+    for name, moment in updated_at.items():
+        db.execute(update(Room).where(Room.id == rooms[name].id).values(updated_at=moment))
+    db.execute(update(CleaningSession).values(updated_at=now - timedelta(hours=1)))
+    db.execute(update(CleaningLog).values(updated_at=now - timedelta(seconds=10)))
+    db.commit()
+    return {"now": now, "rooms": {name: room.id for name, room in rooms.items()}, "log_id": log.id}
+
+
+def test_full_sync_without_token(client, data):
+    """Sans jeton : instantané complet des lignes actives et de la session du jour"""
+    body = client.get("/sync").json()
+
+    assert body["full"] is True
+    names = {room["name"] for room in body["changes"]["rooms"]}
+    assert names == {"ancienne", "avant-recouvrement", "recouvrement"}
+    assert len(body["changes"]["sessions"]) == 1
+    assert [log["id"] for log in body["changes"]["logs"]] == [str(data["log_id"])]
+    assert body["deleted"]["rooms"] == []
+    assert decode_sync_token(body["token"]) >= data["now"]
+
+
+def test_delta_sync_with_overlap_and_deletions(client, data, monkeypatch):
+    """Avec jeton : lignes modifiées depuis (recouvrement compris), désactivations dans ``deleted``"""
+    monkeypatch.setattr("api.core.config.settings.sync_overlap_seconds", 5)
+    since = encode_sync_token(data["now"] - timedelta(seconds=60))
+
+    body = client.get("/sync", params={"since": since}).json()
+
+    assert body["full"] is False
+    # Modifiée 2 s avant le jeton : renvoyée grâce au recouvrement de 5 s
+    assert [room["name"] for room in body["changes"]["rooms"]] == ["recouvrement"]
+    assert body["deleted"]["rooms"] == [str(data["rooms"]["desactivee"])]
+    assert body["changes"]["sessions"] == []
+    assert [log["id"] for log in body["changes"]["logs"]] == [str(data["log_id"])]
+
+
+def test_invalid_token_returns_400(client, data):
+    response = client.get("/sync", params={"since": "pas-un-jeton"})
+    assert response.status_code == 400